@@ -376,3 +376,87 @@ class VecAttGRUCell(RNNCell):
         new_h = u * state + (1 - u) * c
 
         return new_h, new_h
+
+
+class ProjectedGRUCell(RNNCell):
+    """Gated Recurrent Unit cell whose input-to-hidden projections are computed outside of the recurrent loop.
+
+    The inputs of each step are the precomputed ``x * W_x + b`` of the reset gate, update gate and candidate,
+    concatenated to a ``3 * num_units`` vector, so each step only does the ``num_units x num_units`` recurrent matmuls.
+
+    Args:
+
+      num_units: int, The number of units in the GRU cell.
+
+      gate_kernel: the ``(num_units, 2 * num_units)`` recurrent kernel of the reset and update gates.
+
+      candidate_kernel: the ``(num_units, num_units)`` recurrent kernel of the candidate.
+
+      gru_type: str, ``'GRU'`` , ``'AGRU'`` (cf. ``QAAttGRUCell``) or ``'AUGRU'`` (cf. ``VecAttGRUCell``).
+
+      activation: Nonlinearity to use.  Default: `tanh`.
+
+    """
+
+    def __init__(self,
+
+                 num_units,
+
+                 gate_kernel,
+
+                 candidate_kernel,
+
+                 gru_type='GRU',
+
+                 activation=None,
+
+                 reuse=None):
+
+        super(ProjectedGRUCell, self).__init__(_reuse=reuse)
+
+        self._num_units = num_units
+
+        self._gate_kernel = gate_kernel
+
+        self._candidate_kernel = candidate_kernel
+
+        self._gru_type = gru_type
+
+        self._activation = activation or math_ops.tanh
+
+    @property
+    def state_size(self):
+
+        return self._num_units
+
+    @property
+    def output_size(self):
+
+        return self._num_units
+
+    def __call__(self, inputs, state, att_score=None):
+
+        return self.call(inputs, state, att_score)
+
+    def call(self, inputs, state, att_score=None):
+        """Gated recurrent unit (GRU) with nunits cells."""
+
+        gate_inputs, candidate_inputs = array_ops.split(value=inputs, num_or_size_splits=[2 * self._num_units,
+                                                                                          self._num_units], axis=1)
+
+        value = math_ops.sigmoid(gate_inputs + math_ops.matmul(state, self._gate_kernel))
+
+        r, u = array_ops.split(value=value, num_or_size_splits=2, axis=1)
+
+        r_state = r * state
+
+        c = self._activation(candidate_inputs + math_ops.matmul(r_state, self._candidate_kernel))
+
+        if self._gru_type == 'AGRU':
+            new_h = (1. - att_score) * state + att_score * c
+        else:
+            if self._gru_type == 'AUGRU':
+                u = (1.0 - att_score) * u
+            new_h = u * state + (1 - u) * c
+
+        return new_h, new_h
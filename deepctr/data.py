@@ -0,0 +1,621 @@
+# -*- coding:utf-8 -*-
+"""
+Input pipelines for DeepCTR models.
+
+Sequence features declared as ``VarLenSparseFeat(..., maxlen=None)`` are fed to the model with a variable time
+dimension, so each batch only needs to be padded to its longest sequence. The helpers below group samples of
+similar length into the same batch to keep that padding small.
+
+``write_tfrecords`` converts a DataFrame, or the chunks of a large CSV file, to sharded TFRecord files of
+``tf.train.Example`` records, which ``deepctr.estimator.inputs.input_fn_tfrecord`` reads back with the parsing spec
+returned by ``build_feature_description`` . ``make_csv_dataset`` streams CSV or TSV files straight into the input
+dict of a Keras model, so the training data does not need to fit in memory. ``DenseFeatureStatistics`` computes the
+statistics of the dense features over the chunks of the data, and ``add_dense_normalization`` normalizes them in the
+model with a single layer.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.core.example import feature_pb2
+from tensorflow.python.keras.layers import Input
+from tensorflow.python.keras.models import Model
+from tensorflow.python.keras.utils.data_utils import Sequence
+from tensorflow.python.ops.parsing_ops import FixedLenFeature, FixedLenSequenceFeature
+
+from .feature_column import SparseFeat, DenseFeat, VarLenSparseFeat
+from .layers.normalization import DenseNormalization
+
+
+def _dynamic_varlen_columns(feature_columns):
+    return [fc for fc in feature_columns if isinstance(fc, VarLenSparseFeat) and fc.maxlen is None]
+
+
+def get_sequence_lengths(x, feature_columns):
+    """Returns the length of the longest variable length sequence of every sample in ``x``.
+
+    :param x: dict of numpy arrays, the model input with the sequences of ``VarLenSparseFeat(..., maxlen=None)`` padded with 0 at the end.
+    :param feature_columns: the feature columns of the model.
+    :return: 1D int numpy array.
+    """
+    lengths = []
+    for fc in _dynamic_varlen_columns(feature_columns):
+        if fc.length_name is not None and fc.length_name in x:
+            lengths.append(np.reshape(x[fc.length_name], (-1,)))
+        else:
+            values = np.asarray(x[fc.name])
+            # index after the last non-zero id
+            lengths.append(np.max((values != 0) * np.arange(1, values.shape[1] + 1), axis=1))
+    if not lengths:
+        raise ValueError("feature_columns must contain at least one VarLenSparseFeat with maxlen=None")
+    return np.max(lengths, axis=0).astype(np.int64)
+
+
+class BucketedSequence(Sequence):
+    """Keras ``Sequence`` that puts samples of similar sequence length into the same batch and pads each batch only to
+    its longest sequence. It can be passed to ``model.fit`` in place of ``x`` and ``y``.
+
+      Arguments
+        - **x**: dict of numpy arrays, the model input. The sequences (and weights) of ``VarLenSparseFeat(..., maxlen=None)`` are padded with 0 at the end to any common length.
+        - **y**: numpy array or list of numpy arrays, the labels, or None.
+        - **feature_columns**: the feature columns of the model.
+        - **batch_size**: int, the number of samples per batch.
+        - **bucket_boundaries**: list of increasing int. Samples whose longest sequence is in ``[bucket_boundaries[i-1], bucket_boundaries[i])`` are put into bucket ``i``.
+        - **shuffle**: bool. Whether or not shuffle the samples within each bucket and the order of the batches at the end of every epoch.
+        - **seed**: A Python integer to use as random seed.
+    """
+
+    def __init__(self, x, y, feature_columns, batch_size=256, bucket_boundaries=(8, 16, 32, 64, 128), shuffle=True,
+                 seed=1024):
+        self.x = x
+        self.y = y
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.random_state = np.random.RandomState(seed)
+        self.sequence_names = []
+        for fc in _dynamic_varlen_columns(feature_columns):
+            self.sequence_names.append(fc.name)
+            if fc.weight_name is not None:
+                self.sequence_names.append(fc.weight_name)
+        self.lengths = get_sequence_lengths(x, feature_columns)
+        bucket_ids = np.searchsorted(np.asarray(bucket_boundaries), self.lengths, side='right')
+        self.buckets = [np.where(bucket_ids == i)[0] for i in range(len(bucket_boundaries) + 1)]
+        self.batches = []
+        self.on_epoch_end()
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __getitem__(self, idx):
+        index = self.batches[idx]
+        max_len = max(int(self.lengths[index].max()), 1)
+        batch_x = {}
+        for name, value in self.x.items():
+            value = value[index]
+            if name in self.sequence_names:
+                value = value[:, :max_len]
+            batch_x[name] = value
+        if self.y is None:
+            return batch_x
+        if isinstance(self.y, (list, tuple)):
+            return batch_x, [y[index] for y in self.y]
+        return batch_x, self.y[index]
+
+    def on_epoch_end(self):
+        self.batches = []
+        for bucket in self.buckets:
+            if self.shuffle:
+                bucket = self.random_state.permutation(bucket)
+            self.batches.extend(bucket[i:i + self.batch_size] for i in range(0, len(bucket), self.batch_size))
+        if self.shuffle:
+            self.random_state.shuffle(self.batches)
+
+
+def bucket_by_sequence_length(feature_columns, batch_size=256, bucket_boundaries=(8, 16, 32, 64, 128),
+                              drop_remainder=False):
+    """Returns a ``tf.data`` transformation for ``dataset.apply`` that batches unbatched elements ``features`` or
+    ``(features, label)`` by the length of their longest sequence and pads each batch only to that length.
+
+    :param feature_columns: the feature columns of the model. The ``VarLenSparseFeat(..., maxlen=None)`` features of an element are 1D tensors of variable length, e.g. parsed with ``tf.io.FixedLenSequenceFeature(..., allow_missing=True)`` , and their weights are 2D tensors with shape ``(length, 1)`` .
+    :param batch_size: int, the number of elements per batch.
+    :param bucket_boundaries: list of increasing int, the upper length boundaries of the buckets.
+    :param drop_remainder: bool. Whether or not drop the last batch of each bucket if it has less than ``batch_size`` elements.
+    :return: A function from ``tf.data.Dataset`` to ``tf.data.Dataset``.
+    """
+    sequence_names = [fc.name for fc in _dynamic_varlen_columns(feature_columns)]
+    if not sequence_names:
+        raise ValueError("feature_columns must contain at least one VarLenSparseFeat with maxlen=None")
+
+    def element_length_func(features, *label):
+        return tf.reduce_max(tf.stack([tf.shape(features[name])[0] for name in sequence_names]))
+
+    try:
+        bucket_fn = tf.data.experimental.bucket_by_sequence_length
+    except AttributeError:
+        bucket_fn = tf.contrib.data.bucket_by_sequence_length
+    return bucket_fn(element_length_func, list(bucket_boundaries), [batch_size] * (len(bucket_boundaries) + 1),
+                     drop_remainder=drop_remainder)
+
+
+class DenseFeatureStatistics(object):
+    """Computes the statistics of the ``DenseFeat`` of a dataset in a single streaming pass over its chunks, e.g. the
+    chunks of ``pd.read_csv(..., chunksize=100000)`` , and returns the ``DenseNormalization`` layer that normalizes
+    them in the model.
+
+    The mean, standard deviation, min and max are exact. The quantiles are computed on a uniform sample of
+    ``sample_size`` rows of the dataset.
+
+      Arguments
+        - **feature_columns**: the feature columns of the model, only the ``DenseFeat`` are used.
+        - **num_quantiles**: int, the number of quantile buckets of the ``"quantile"`` normalization, 0 to not sample the rows.
+        - **sample_size**: int, the number of rows sampled to compute the quantiles.
+        - **seed**: A Python integer to use as random seed.
+    """
+
+    def __init__(self, feature_columns, num_quantiles=100, sample_size=100000, seed=1024):
+        self.feature_columns = [fc for fc in feature_columns if isinstance(fc, DenseFeat)]
+        self.feature_names = [fc.name for fc in self.feature_columns]
+        self.num_quantiles = num_quantiles
+        self.sample_size = sample_size
+        self.random_state = np.random.RandomState(seed)
+        num_columns = sum(fc.dimension for fc in self.feature_columns)
+        self.count = 0
+        self.mean = np.zeros(num_columns)
+        self.m2 = np.zeros(num_columns)
+        self.min = np.full(num_columns, np.inf)
+        self.max = np.full(num_columns, -np.inf)
+        self.sample = np.zeros((0, num_columns))
+        self.sample_keys = np.zeros(0)
+
+    def update(self, data):
+        """Updates the statistics with a chunk of the dataset.
+
+        :param data: DataFrame or dict of numpy arrays with the ``DenseFeat`` columns. A column of ``DenseFeat`` with ``dimension > 1`` holds a list or an array of length ``dimension`` per row.
+        :return: self.
+        """
+        columns = []
+        for fc in self.feature_columns:
+            values = np.asarray(data[fc.name])
+            if values.dtype == object:
+                values = np.stack(values)
+            columns.append(values.reshape(len(values), fc.dimension).astype(np.float64))
+        x = np.concatenate(columns, axis=1)
+        if len(x) == 0:
+            return self
+        # merges the moments of the chunk with the running ones (Chan et al.)
+        count = self.count + len(x)
+        mean = x.mean(axis=0)
+        delta = mean - self.mean
+        self.m2 += ((x - mean) ** 2).sum(axis=0) + delta ** 2 * self.count * len(x) / count
+        self.mean += delta * len(x) / count
+        self.count = count
+        self.min = np.minimum(self.min, x.min(axis=0))
+        self.max = np.maximum(self.max, x.max(axis=0))
+        if self.num_quantiles:
+            # keeps the rows with the smallest random keys, a uniform sample of all the rows seen so far
+            keys = np.concatenate([self.sample_keys, self.random_state.random_sample(len(x))])
+            sample = np.concatenate([self.sample, x])
+            if len(keys) > self.sample_size:
+                kept = np.argpartition(keys, self.sample_size)[:self.sample_size]
+                keys, sample = keys[kept], sample[kept]
+            self.sample_keys, self.sample = keys, sample
+        return self
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / max(self.count, 1))
+
+    def get_layer(self, method='standard', clip=None, name='dense_normalization'):
+        """Returns the normalization layer of the dense features.
+
+        :param method: str, ``"standard"`` to subtract the mean and divide by the standard deviation, ``"minmax"`` to scale the values to [0, 1], or ``"quantile"`` to map the values to their quantile, in [0, 1].
+        :param clip: None or a tuple ``(min_value, max_value)`` , the normalized values are clipped to it.
+        :param name: str, the name of the layer.
+        :return: a ``DenseNormalization`` layer, to call on the list of the inputs of ``feature_names`` .
+        """
+        if self.count == 0:
+            raise ValueError("the statistics are empty, call update first")
+        if method == 'standard':
+            std = self.std
+            return DenseNormalization(self.mean, np.where(std > 0, std, 1.0), clip=clip, name=name)
+        if method == 'minmax':
+            value_range = self.max - self.min
+            return DenseNormalization(self.min, np.where(value_range > 0, value_range, 1.0), clip=clip, name=name)
+        if method == 'quantile':
+            if not self.num_quantiles:
+                raise ValueError("the quantile normalization needs num_quantiles > 0")
+            quantiles = np.linspace(0, 1, self.num_quantiles + 1)[1:-1]
+            return DenseNormalization(boundaries=np.quantile(self.sample, quantiles, axis=0).T, clip=clip, name=name)
+        raise ValueError("method must be standard, minmax or quantile, got %s" % method)
+
+
+def add_dense_normalization(model, statistics, method='standard', clip=None):
+    """Returns a model with the same inputs and outputs as ``model`` , which normalizes its ``DenseFeat`` inputs with
+    a single ``DenseNormalization`` layer before passing them to ``model`` . The returned model shares its layers and
+    weights with ``model`` , and the statistics are saved with it. It can be packed with
+    ``deepctr.feature_column.pack_model_inputs`` .
+
+    :param model: a Keras model built on the feature columns of ``statistics`` . The ``DenseFeat`` must not have a ``transform_fn`` , which the model applies after the normalization: drop it from the feature columns the model is built on.
+    :param statistics: a ``DenseFeatureStatistics`` , updated with the training data.
+    :param method: str, ``"standard"`` , ``"minmax"`` or ``"quantile"`` , see ``DenseFeatureStatistics.get_layer`` .
+    :param clip: None or a tuple ``(min_value, max_value)`` , the normalized values are clipped to it.
+    :return: a Keras model.
+    """
+    transformed = [fc.name for fc in statistics.feature_columns if fc.transform_fn is not None]
+    if transformed:
+        raise ValueError("the DenseFeat %s have a transform_fn, which the model would apply after the normalization, "
+                         "drop it from the feature columns" % ", ".join(transformed))
+    missing = [name for name in statistics.feature_names if name not in model.input_names]
+    if missing:
+        raise ValueError("the model has no input %s" % ", ".join(missing))
+    inputs = [Input(shape=x.shape[1:], name=name, dtype=x.dtype) for name, x in zip(model.input_names, model.inputs)]
+    views = dict(zip(model.input_names, inputs))
+    normalized = statistics.get_layer(method, clip)([views[name] for name in statistics.feature_names])
+    views.update(zip(statistics.feature_names, normalized))
+    return Model(inputs=inputs, outputs=model([views[name] for name in model.input_names]))
+
+
+def build_feature_description(feature_columns, label=None):
+    """Returns the parsing spec of the ``tf.train.Example`` records of the features of a model, e.g. the
+    ``feature_description`` of ``input_fn_tfrecord`` .
+
+    :param feature_columns: list of DeepCTR feature columns ( ``SparseFeat`` , ``DenseFeat`` , ``VarLenSparseFeat`` ) or TensorFlow feature columns, or a mix of both.
+    :param label: str, list of str or None, the names of the labels, parsed as float scalars.
+    :return: dict, the parsing spec of each feature, for ``tf.io.parse_example`` .
+    """
+    feature_description = {}
+    tf_feature_columns = []
+    for fc in feature_columns:
+        if isinstance(fc, SparseFeat):
+            feature_description[fc.name] = FixedLenFeature((1,), _example_dtype(fc.dtype))
+        elif isinstance(fc, DenseFeat):
+            feature_description[fc.name] = FixedLenFeature((fc.dimension,), tf.float32)
+        elif isinstance(fc, VarLenSparseFeat):
+            if fc.maxlen is None:
+                # padded with 0 to the longest sequence of the batch
+                feature_description[fc.name] = FixedLenSequenceFeature((), _example_dtype(fc.dtype), allow_missing=True)
+                if fc.weight_name is not None:
+                    feature_description[fc.weight_name] = FixedLenSequenceFeature((1,), tf.float32, allow_missing=True)
+            else:
+                feature_description[fc.name] = FixedLenFeature((fc.maxlen,), _example_dtype(fc.dtype))
+                if fc.weight_name is not None:
+                    feature_description[fc.weight_name] = FixedLenFeature((fc.maxlen, 1), tf.float32)
+            if fc.length_name is not None:
+                feature_description[fc.length_name] = FixedLenFeature((1,), tf.int64)
+        else:
+            tf_feature_columns.append(fc)
+    if tf_feature_columns:
+        feature_description.update(tf.feature_column.make_parse_example_spec(tf_feature_columns))
+    for name in _label_names(label):
+        if name not in feature_description:
+            feature_description[name] = FixedLenFeature((1,), tf.float32)
+    return feature_description
+
+
+def _example_dtype(dtype):
+    # tf.train.Example only stores int64, float32 and string values
+    dtype = tf.as_dtype(dtype)
+    if dtype.is_integer:
+        return tf.int64
+    if dtype.is_floating:
+        return tf.float32
+    return tf.string
+
+
+def _label_names(label):
+    if label is None:
+        return []
+    if isinstance(label, str):
+        return [label]
+    return list(label)
+
+
+def write_tfrecords(data, feature_columns, path_prefix, label=None, num_shards=1, chunk_size=100000,
+                    num_workers=0):
+    """Writes the rows of a DataFrame as ``tf.train.Example`` records to sharded TFRecord files.
+
+    The chunks of rows can be serialized in parallel by a pool of processes. Within a chunk, the records are assembled
+    column by column: every distinct value of a sparse feature and every fixed length float row is encoded once, so
+    only the variable length sequences are encoded row by row. Each feature is encoded by protobuf, and the records
+    are the same bytes as ``tf.train.Example.SerializeToString(deterministic=True)`` , with the features sorted by name.
+
+    :param data: pandas DataFrame, or an iterable of DataFrames, e.g. ``pd.read_csv(path, chunksize=chunk_size)`` . The cells of a ``VarLenSparseFeat`` and of its weights are lists or 1D arrays. Sequences longer than ``maxlen`` are truncated and shorter ones padded with 0 at the end. A missing ``length_name`` column is computed from the sequence lengths. Integer ids must not be missing: ``pd.read_csv`` reads an integer column with missing values as floats with NaN, fill them first, e.g. with ``fillna(0)`` .
+    :param feature_columns: list of DeepCTR feature columns.
+    :param path_prefix: str, the files are named ``path_prefix + "-00000-of-00004.tfrecords"`` and so on.
+    :param label: str, list of str or None, the label columns, written as floats.
+    :param num_shards: int, the number of files. The records of every chunk are spread evenly over them.
+    :param chunk_size: int, the number of rows of each chunk a DataFrame is split into.
+    :param num_workers: int, the number of processes serializing the chunks, 0 to serialize them in the current process. The processes are forked from the current one, so keep it small once TensorFlow has started threads.
+    :return: the list of written files and their parsing spec from ``build_feature_description`` .
+    """
+    feature_description = build_feature_description(feature_columns, label)
+    record_spec = _get_record_spec(feature_columns, label)
+    if hasattr(data, 'iloc'):
+        # a DataFrame, checked without importing pandas, which deepctr does not require
+        chunks = (data.iloc[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    else:
+        chunks = (chunk for chunk in data if len(chunk) > 0)
+
+    filenames = ['%s-%05d-of-%05d.tfrecords' % (path_prefix, i, num_shards) for i in range(num_shards)]
+    writers = [tf.io.TFRecordWriter(filename) for filename in filenames]
+
+    num_records = [0]
+
+    def write(records):
+        for i, record in enumerate(records, num_records[0]):
+            writers[i % num_shards].write(record)
+        num_records[0] += len(records)
+
+    try:
+        if num_workers == 0:
+            for chunk in chunks:
+                write(_serialize_chunk(_get_chunk_columns(chunk, record_spec), record_spec))
+        else:
+            with ProcessPoolExecutor(num_workers) as executor:
+                # at most two chunks per process in flight, written in order
+                futures = []
+                for chunk in chunks:
+                    futures.append(executor.submit(_serialize_chunk, _get_chunk_columns(chunk, record_spec),
+                                                   record_spec))
+                    if len(futures) >= 2 * num_workers:
+                        write(futures.pop(0).result())
+                for future in futures:
+                    write(future.result())
+    finally:
+        for writer in writers:
+            writer.close()
+    return filenames, feature_description
+
+
+def _get_record_spec(feature_columns, label=None):
+    # (name, kind, width, maxlen of the sequence a missing length column is computed from), kind is "int64", "float"
+    # or "bytes" and width the number of values of every row, None for sequences of any length. Sorted by name, the
+    # order of the features of a deterministically serialized tf.train.Example
+    record_spec = []
+    for fc in feature_columns:
+        if isinstance(fc, SparseFeat):
+            record_spec.append((fc.name, _record_kind(fc.dtype), 1, None))
+        elif isinstance(fc, DenseFeat):
+            record_spec.append((fc.name, "float", fc.dimension, None))
+        elif isinstance(fc, VarLenSparseFeat):
+            record_spec.append((fc.name, _record_kind(fc.dtype), fc.maxlen, None))
+            if fc.weight_name is not None:
+                record_spec.append((fc.weight_name, "float", fc.maxlen, None))
+            if fc.length_name is not None:
+                record_spec.append((fc.length_name, "int64", 1, (fc.name, fc.maxlen)))
+        else:
+            raise ValueError("write_tfrecords only supports DeepCTR feature columns, got %s" % (fc,))
+    record_spec.extend((name, "float", 1, None) for name in _label_names(label))
+    return sorted(record_spec, key=lambda spec: spec[0].encode("utf-8"))
+
+
+def _record_kind(dtype):
+    return {tf.int64: "int64", tf.float32: "float", tf.string: "bytes"}[_example_dtype(dtype)]
+
+
+def _get_chunk_columns(chunk, record_spec):
+    # numpy arrays for the scalar columns, lists for the columns of lists
+    columns = {}
+    for name, _, _, sequence in record_spec:
+        if name not in chunk and sequence is not None:
+            sequence_name, maxlen = sequence
+            lengths = np.array([len(value) for value in chunk[sequence_name]], dtype=np.int64)
+            columns[name] = lengths if maxlen is None else np.minimum(lengths, maxlen)
+        elif np.ndim(chunk[name].iloc[0]) == 0:
+            columns[name] = np.asarray(chunk[name])
+        else:
+            columns[name] = list(chunk[name])
+    return columns
+
+
+def _feature_entry(name, kind, values):
+    # a tf.train.Features with a single feature, the features of a record are the concatenation of these entries
+    if kind == "int64":
+        feature = feature_pb2.Feature(int64_list=feature_pb2.Int64List(value=values))
+    elif kind == "float":
+        feature = feature_pb2.Feature(float_list=feature_pb2.FloatList(value=values))
+    else:
+        values = [value.encode("utf-8") if isinstance(value, str) else value for value in values]
+        feature = feature_pb2.Feature(bytes_list=feature_pb2.BytesList(value=values))
+    return feature_pb2.Features(feature={name: feature}).SerializeToString()
+
+
+def _example(features):
+    # tf.train.Example with the serialized tf.train.Features as field 1, length delimited with a varint
+    length = bytearray()
+    value = len(features)
+    while value > 0x7f:
+        length.append((value & 0x7f) | 0x80)
+        value >>= 7
+    length.append(value)
+    return b"\x0a" + bytes(length) + features
+
+
+def _int64_values(name, values):
+    # pd.read_csv reads an integer column with missing values as floats with NaN
+    values = np.asarray(values)
+    if values.dtype.kind == "f":
+        if not np.isfinite(values).all() or (values != np.round(values)).any():
+            raise ValueError("the integer feature %s has missing or non integer values, fill them before writing the "
+                             "records, e.g. with fillna(0)" % name)
+        values = values.astype(np.int64)
+    return values
+
+
+def _pad(values, maxlen, dtype):
+    # string sequences are padded with "0" like the masked ids of the Hash layer
+    padded = np.full((len(values), maxlen), "0" if dtype == object else 0, dtype=dtype)
+    for i, value in enumerate(values):
+        value = np.reshape(value, (-1,))[:maxlen]
+        padded[i, :len(value)] = value
+    return padded
+
+
+class _FixedSizeEntries(object):
+    # the entries of the rows of a uint8 matrix as bytes
+
+    def __init__(self, matrix):
+        self.data = matrix.tobytes()
+        self.width = matrix.shape[1]
+
+    def __getitem__(self, i):
+        return self.data[i * self.width:(i + 1) * self.width]
+
+
+def _serialize_chunk(columns, record_spec):
+    num_rows = len(next(iter(columns.values())))
+    parts = []  # the entries of the rows of every feature, indexed by the row
+    for name, kind, width, _ in record_spec:
+        values = columns[name]
+        if kind == "float" and width is not None:
+            values = _pad(values, width, "<f4") if isinstance(values, list) else np.asarray(values, dtype="<f4")
+            values = np.reshape(values, (num_rows, width))
+            # the packed float values are the last bytes of the entry, the entries of every row have the same prefix
+            prefix = _feature_entry(name, kind, [0.0] * width)[:-4 * width]
+            matrix = np.empty((num_rows, len(prefix) + 4 * width), dtype=np.uint8)
+            matrix[:, :len(prefix)] = np.frombuffer(prefix, dtype=np.uint8)
+            matrix[:, len(prefix):] = values.view(np.uint8).reshape(num_rows, 4 * width)
+            parts.append(_FixedSizeEntries(matrix))
+        elif width == 1:
+            if kind == "int64":
+                values = _int64_values(name, values)
+            # encode every distinct value once
+            unique, inverse = np.unique(values.astype(np.str_) if kind == "bytes" else values, return_inverse=True)
+            # an object array, numpy bytes arrays drop trailing zero bytes
+            entries = np.empty(len(unique), dtype=object)
+            entries[:] = [_feature_entry(name, kind, [value.item()]) for value in unique]
+            parts.append(entries[inverse])
+        else:
+            if kind == "int64":
+                values = [_int64_values(name, value) for value in values]
+            if width is not None:
+                values = _pad(values, width, np.int64 if kind == "int64" else object)
+            parts.append([_feature_entry(name, kind, np.reshape(value, (-1,)).tolist()) for value in values])
+
+    return [_example(b"".join([part[i] for part in parts])) for i in range(num_rows)]
+
+
+def make_csv_dataset(filenames, feature_columns, label=None, batch_size=256, field_delim=',', column_names=None,
+                     sequence_delim='|', num_epochs=1, shuffle=True, shuffle_factor=10, seed=None,
+                     num_parallel_calls=None):
+    """Returns a ``tf.data.Dataset`` of batches read from CSV or TSV files, with exactly the input dict of a model
+    built on ``feature_columns`` .
+
+    The files are read in parallel, and each batch of lines is parsed with a single ``tf.io.decode_csv`` call. Only
+    the columns used by the model are parsed. The fields of ``VarLenSparseFeat`` sequences, of their weights and of
+    ``DenseFeat`` with ``dimension > 1`` hold their values separated by ``sequence_delim`` , e.g. ``"12|5|7"`` . The
+    sequences are truncated to ``maxlen`` and padded with 0 (``"0"`` for strings) at the end, or padded to the longest
+    sequence of the batch if ``maxlen`` is None. A ``length_name`` missing from the files is computed from the
+    sequence. The hashing and vocabulary lookups of ``use_hash`` features are applied by the model itself, so their
+    raw values are fed. Needs TensorFlow 2.2 or later.
+
+    :param filenames: str or list of str, the files, or a glob pattern of them, e.g. ``"train/part-*.csv"`` .
+    :param feature_columns: list of DeepCTR feature columns, the ones the model is built on.
+    :param label: str, list of str or None, the label columns, parsed as floats.
+    :param batch_size: int, the number of lines of each batch.
+    :param field_delim: str, the field delimiter, e.g. ``"\\t"`` for TSV files.
+    :param column_names: list of str or None, the names of the columns of the files. None to read them from the header line of the first file. Otherwise the files have no header line.
+    :param sequence_delim: str, the delimiter of the values within a field.
+    :param num_epochs: int, the number of passes over the files, None to repeat indefinitely.
+    :param shuffle: bool, whether to shuffle the files and the lines.
+    :param shuffle_factor: int, the shuffle buffer holds ``batch_size * shuffle_factor`` lines.
+    :param seed: int or None, the random seed of the shuffle.
+    :param num_parallel_calls: int or None, the number of batches parsed in parallel. None to autotune it.
+    :return: a ``tf.data.Dataset`` of ``(x, y)`` , or of ``x`` if ``label`` is None, for ``model.fit`` .
+    """
+    autotune = tf.data.experimental.AUTOTUNE
+    if isinstance(filenames, str):
+        filenames = sorted(tf.io.gfile.glob(filenames))
+    filenames = list(filenames)
+    if not filenames:
+        raise ValueError("filenames must match at least one file")
+    header = column_names is None
+    if header:
+        with tf.io.gfile.GFile(filenames[0]) as f:
+            column_names = f.readline().rstrip("\r\n").split(field_delim)
+    column_index = {name: i for i, name in enumerate(column_names)}
+    label_names = _label_names(label)
+
+    # the fields decoded from the files, with the dtype decode_csv parses them to
+    field_dtypes = {}
+    for fc in feature_columns:
+        if isinstance(fc, SparseFeat):
+            field_dtypes[fc.name] = _example_dtype(fc.dtype)
+        elif isinstance(fc, DenseFeat):
+            field_dtypes[fc.name] = tf.float32 if fc.dimension == 1 else tf.string
+        elif isinstance(fc, VarLenSparseFeat):
+            field_dtypes[fc.name] = tf.string
+            if fc.weight_name is not None:
+                field_dtypes[fc.weight_name] = tf.string
+            if fc.length_name is not None and fc.length_name in column_index:
+                field_dtypes[fc.length_name] = tf.int64
+        else:
+            raise ValueError("make_csv_dataset only supports DeepCTR feature columns, got %s" % (fc,))
+    for name in label_names:
+        field_dtypes[name] = tf.float32
+    missing = [name for name in field_dtypes if name not in column_index]
+    if missing:
+        raise ValueError("the files have no column %s" % ", ".join(missing))
+    field_names = sorted(field_dtypes, key=lambda name: column_index[name])
+    record_defaults = [tf.constant([""]) if field_dtypes[name] == tf.string else
+                       tf.constant([0], dtype=field_dtypes[name]) for name in field_names]
+
+    def split(values, dtype):
+        tokens = tf.strings.split(values, sequence_delim)
+        tokens = tf.ragged.boolean_mask(tokens, tf.strings.length(tokens) > 0)
+        if dtype == tf.string:
+            return tokens
+        return tf.strings.to_number(tokens, out_type=tf.float32 if dtype.is_floating else tf.int64)
+
+    def pad(tokens, width, dtype):
+        default_value = "0" if dtype == tf.string else tf.cast(0, tokens.dtype)
+        padded = tokens.to_tensor(default_value=default_value, shape=None if width is None else [None, width])
+        return padded if dtype == tf.string else tf.cast(padded, dtype)
+
+    def parse(lines):
+        fields = dict(zip(field_names, tf.io.decode_csv(lines, record_defaults, field_delim=field_delim,
+                                                        select_cols=[column_index[name] for name in field_names])))
+        x = {}
+        for fc in feature_columns:
+            dtype = tf.as_dtype(fc.dtype)
+            if isinstance(fc, SparseFeat):
+                x[fc.name] = tf.reshape(tf.cast(fields[fc.name], dtype), [-1, 1])
+            elif isinstance(fc, DenseFeat) and fc.dimension == 1:
+                x[fc.name] = tf.reshape(tf.cast(fields[fc.name], dtype), [-1, 1])
+            elif isinstance(fc, DenseFeat):
+                x[fc.name] = pad(split(fields[fc.name], dtype), fc.dimension, dtype)
+            else:
+                tokens = split(fields[fc.name], dtype)
+                x[fc.name] = pad(tokens, fc.maxlen, dtype)
+                if fc.weight_name is not None:
+                    weights = pad(split(fields[fc.weight_name], tf.float32), fc.maxlen, tf.float32)
+                    x[fc.weight_name] = tf.expand_dims(weights, axis=-1)
+                if fc.length_name is not None and fc.length_name not in x:
+                    if fc.length_name in fields:
+                        length = fields[fc.length_name]
+                    else:
+                        length = tokens.row_lengths()
+                        if fc.maxlen is not None:
+                            length = tf.minimum(length, fc.maxlen)
+                    x[fc.length_name] = tf.reshape(tf.cast(length, tf.int32), [-1, 1])
+        if not label_names:
+            return x
+        if len(label_names) == 1:
+            return x, fields[label_names[0]]
+        return x, tuple(fields[name] for name in label_names)
+
+    dataset = tf.data.Dataset.from_tensor_slices(filenames)
+    if shuffle:
+        dataset = dataset.shuffle(len(filenames), seed=seed)
+    dataset = dataset.interleave(lambda filename: tf.data.TextLineDataset(filename).skip(1 if header else 0),
+                                 num_parallel_calls=autotune)
+    if shuffle:
+        dataset = dataset.shuffle(batch_size * shuffle_factor, seed=seed)
+        options = tf.data.Options()
+        # the lines are shuffled anyway, the files are read in the order they are ready
+        options.experimental_deterministic = False
+        dataset = dataset.with_options(options)
+    dataset = dataset.repeat(num_epochs).batch(batch_size)
+    dataset = dataset.map(parse, num_parallel_calls=num_parallel_calls or autotune)
+    return dataset.prefetch(autotune)
@@ -0,0 +1,161 @@
+# -*- coding:utf-8 -*-
+"""
+Distributed training of DeepCTR models.
+
+The model builders are used unchanged, the model is only built and compiled under the scope of the strategy returned
+by ``get_strategy`` :
+
+.. code-block:: python
+
+    strategy = get_strategy()
+    with strategy.scope():
+        model = DeepFM(linear_feature_columns, dnn_feature_columns)
+        model.compile("adam", "binary_crossentropy")
+    model.fit(create_dataset(x, y, strategy, batch_size=256), epochs=10, steps_per_epoch=100)
+
+Without parameter servers, every replica keeps a copy of all the weights and the gradients are all-reduced after every
+step (synchronous data-parallel training). With parameter servers, the weights live on the parameter servers and the
+embedding tables larger than ``min_shard_bytes`` are split by rows over them, so a table does not need to fit in the
+memory of a single task. The workers then train asynchronously, scheduled by the process that calls ``fit`` .
+
+These helpers need TensorFlow 2.5 or later.
+"""
+
+import multiprocessing
+import socket
+
+import tensorflow as tf
+
+try:
+    from tensorflow.python.keras.utils.dataset_creator import DatasetCreator
+except ImportError:
+    DatasetCreator = None
+
+
+def _check_version():
+    if DatasetCreator is None or not hasattr(tf.distribute.experimental, 'ParameterServerStrategy'):
+        raise ImportError("deepctr.distribute needs TensorFlow 2.5 or later, but the installed version is %s" %
+                          tf.__version__)
+
+
+def _pick_unused_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def _server_config(num_workers):
+    config = tf.compat.v1.ConfigProto()
+    if multiprocessing.cpu_count() < num_workers + 1:
+        # the servers of the in-process cluster share the CPUs, without enough inter-op threads they deadlock
+        config.inter_op_parallelism_threads = num_workers + 1
+    return config
+
+
+def create_local_cluster(num_workers=2, num_ps=1, protocol='grpc'):
+    """Starts the worker and parameter server tasks of a cluster in the current process, e.g. to test distributed
+    training on a single machine.
+
+    :param num_workers: int, the number of worker tasks.
+    :param num_ps: int, the number of parameter server tasks, 0 for a cluster without parameter servers.
+    :param protocol: str, the communication protocol of the servers.
+    :return: a ``tf.distribute.cluster_resolver.SimpleClusterResolver`` of the cluster, to pass to ``get_strategy`` .
+    """
+    _check_version()
+    cluster_dict = {'worker': ['localhost:%d' % _pick_unused_port() for _ in range(num_workers)]}
+    if num_ps > 0:
+        cluster_dict['ps'] = ['localhost:%d' % _pick_unused_port() for _ in range(num_ps)]
+    cluster_spec = tf.train.ClusterSpec(cluster_dict)
+    config = _server_config(num_workers)
+    for job_name, num_tasks in [('worker', num_workers), ('ps', num_ps)]:
+        for i in range(num_tasks):
+            tf.distribute.Server(cluster_spec, job_name=job_name, task_index=i, protocol=protocol, config=config,
+                                 start=True)
+    return tf.distribute.cluster_resolver.SimpleClusterResolver(cluster_spec, rpc_layer=protocol)
+
+
+def run_server(cluster_resolver=None):
+    """Runs the server of a worker or parameter server task of a parameter server cluster until the process is
+    killed. Every task but the one that builds and trains the model calls it.
+
+    :param cluster_resolver: a ``tf.distribute.cluster_resolver.ClusterResolver`` with the cluster and the type and
+        index of the current task. ``TFConfigClusterResolver()`` , which reads the ``TF_CONFIG`` environment variable,
+        by default.
+    """
+    _check_version()
+    if cluster_resolver is None:
+        cluster_resolver = tf.distribute.cluster_resolver.TFConfigClusterResolver()
+    if cluster_resolver.task_type not in ('worker', 'ps'):
+        raise ValueError("run_server is only for worker and ps tasks, the task type is %s" %
+                         cluster_resolver.task_type)
+    num_workers = len(cluster_resolver.cluster_spec().as_dict().get('worker', []))
+    server = tf.distribute.Server(cluster_resolver.cluster_spec(), job_name=cluster_resolver.task_type,
+                                  task_index=cluster_resolver.task_id, protocol=cluster_resolver.rpc_layer or 'grpc',
+                                  config=_server_config(num_workers), start=True)
+    server.join()
+
+
+def get_strategy(cluster_resolver=None, min_shard_bytes=1 << 20, max_shards=None):
+    """Returns the distribution strategy for the cluster.
+
+    - Without a cluster, a ``MirroredStrategy`` over the local devices.
+    - For a cluster without ``ps`` tasks, a ``MultiWorkerMirroredStrategy`` . Every worker runs the same program.
+    - For a cluster with ``ps`` tasks, a ``ParameterServerStrategy`` whose weights of at least ``min_shard_bytes`` bytes, which in CTR models are the embedding tables, are split by rows over the parameter servers. The workers and parameter servers call ``run_server`` and another task, the chief, runs the program.
+
+    :param cluster_resolver: a ``tf.distribute.cluster_resolver.ClusterResolver`` , e.g. the one returned by ``create_local_cluster`` . ``TFConfigClusterResolver()`` , which reads the ``TF_CONFIG`` environment variable, by default.
+    :param min_shard_bytes: int, the minimum size in bytes of each shard of a weight split over the parameter servers. Smaller weights are not split.
+    :param max_shards: int or None, the maximum number of shards of a weight. The number of parameter servers by default.
+    :return: a ``tf.distribute.Strategy`` .
+    """
+    _check_version()
+    if cluster_resolver is None:
+        cluster_resolver = tf.distribute.cluster_resolver.TFConfigClusterResolver()
+    cluster_dict = cluster_resolver.cluster_spec().as_dict()
+    if not cluster_dict:
+        return tf.distribute.MirroredStrategy()
+    num_ps = len(cluster_dict.get('ps', []))
+    if num_ps == 0:
+        return tf.distribute.experimental.MultiWorkerMirroredStrategy(cluster_resolver=cluster_resolver)
+    variable_partitioner = tf.distribute.experimental.partitioners.MinSizePartitioner(
+        min_shard_bytes=min_shard_bytes, max_shards=num_ps if max_shards is None else max_shards)
+    return tf.distribute.experimental.ParameterServerStrategy(cluster_resolver,
+                                                              variable_partitioner=variable_partitioner)
+
+
+def create_dataset(x, y, strategy, batch_size=256, shuffle=True, seed=1024):
+    """Returns the training input of ``model.fit`` for a model built under the scope of ``strategy`` .
+
+    Each worker reads its own shard of the samples. With a ``ParameterServerStrategy`` the input repeats indefinitely,
+    so ``steps_per_epoch`` must be passed to ``fit`` .
+
+    :param x: dict of numpy arrays, the model input.
+    :param y: numpy array or list of numpy arrays, the labels.
+    :param strategy: the ``tf.distribute.Strategy`` of the model.
+    :param batch_size: int, the global batch size, split over the replicas.
+    :param shuffle: bool, whether to shuffle the samples.
+    :param seed: int, the random seed of the shuffle.
+    :return: a ``tf.data.Dataset`` , or a ``DatasetCreator`` with a ``ParameterServerStrategy`` .
+    """
+    _check_version()
+
+    def create(num_shards=1, shard_index=0, per_replica_batch_size=batch_size):
+        dataset = tf.data.Dataset.from_tensor_slices((x, y))
+        if num_shards > 1:
+            dataset = dataset.shard(num_shards, shard_index)
+        if shuffle:
+            dataset = dataset.shuffle(10 * per_replica_batch_size, seed=seed)
+        return dataset
+
+    if isinstance(strategy, tf.distribute.experimental.ParameterServerStrategy):
+        def dataset_fn(input_context):
+            per_replica_batch_size = input_context.get_per_replica_batch_size(batch_size)
+            dataset = create(input_context.num_input_pipelines, input_context.input_pipeline_id,
+                             per_replica_batch_size)
+            return dataset.repeat().batch(per_replica_batch_size).prefetch(2)
+
+        return DatasetCreator(dataset_fn)
+
+    # fit splits the batches over the replicas, and over the workers by samples rather than by files
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.DATA
+    return create().batch(batch_size).prefetch(2).with_options(options)
@@ -1,7 +1,8 @@
 import tensorflow as tf
 from tensorflow.python.feature_column.feature_column import _EmbeddingColumn
 
-from .utils import LINEAR_SCOPE_NAME, variable_scope, get_collection, get_GraphKeys, input_layer, get_losses
+from .utils import LINEAR_SCOPE_NAME, variable_scope, get_variable_scope, get_collection, get_GraphKeys, input_layer, \
+    get_losses
 
 
 def linear_model(features, linear_feature_columns):
@@ -12,8 +13,8 @@ def linear_model(features, linear_feature_columns):
     return linear_logits
 
 
-def get_linear_logit(features, linear_feature_columns, l2_reg_linear=0):
-    with variable_scope(LINEAR_SCOPE_NAME):
+def get_linear_logit(features, linear_feature_columns, l2_reg_linear=0, partitioner=None):
+    with variable_scope(LINEAR_SCOPE_NAME, partitioner=partitioner):
         if not linear_feature_columns:
             linear_logits = tf.Variable([[0.0]], name='bias_weights')
         else:
@@ -27,23 +28,41 @@ def get_linear_logit(features, linear_feature_columns, l2_reg_linear=0):
     return linear_logits
 
 
-def input_from_feature_columns(features, feature_columns, l2_reg_embedding=0.0):
+def input_from_feature_columns(features, feature_columns, l2_reg_embedding=0.0, partitioner=None):
     dense_value_list = []
     sparse_emb_list = []
+    if not feature_columns:
+        return sparse_emb_list, dense_value_list
+    # one input_layer call shares the transformation cache of all the columns, it concatenates them sorted by name
+    sorted_columns = sorted(feature_columns, key=lambda x: x.name)
+    # reenter the current scope, the embedding weights keep their names and are only partitioned
+    with variable_scope(get_variable_scope(), partitioner=partitioner):
+        inputs = input_layer(features, sorted_columns)
+    widths = [get_column_width(feat) for feat in sorted_columns]
+    values = dict(zip([feat.name for feat in sorted_columns], tf.split(inputs, widths, axis=1)))
     for feat in feature_columns:
         if is_embedding(feat):
-            sparse_emb = tf.expand_dims(input_layer(features, [feat]), axis=1)
-            sparse_emb_list.append(sparse_emb)
-            if l2_reg_embedding > 0:
-                get_losses().add_loss(l2_reg_embedding * tf.nn.l2_loss(sparse_emb, name=feat.name + "_l2loss"),
-                                      get_GraphKeys().REGULARIZATION_LOSSES)
-
+            sparse_emb_list.append(tf.expand_dims(values[feat.name], axis=1))
         else:
-            dense_value_list.append(input_layer(features, [feat]))
+            dense_value_list.append(values[feat.name])
+
+    if l2_reg_embedding > 0 and sparse_emb_list:
+        embedding_mask = [is_embedding(feat) for feat, width in zip(sorted_columns, widths) for _ in range(width)]
+        embeddings = inputs if all(embedding_mask) else inputs * tf.constant(embedding_mask, dtype=inputs.dtype)
+        get_losses().add_loss(l2_reg_embedding * tf.nn.l2_loss(embeddings, name="embedding_l2loss"),
+                              get_GraphKeys().REGULARIZATION_LOSSES)
 
     return sparse_emb_list, dense_value_list
 
 
+def get_column_width(feature_column):
+    try:
+        variable_shape = feature_column.variable_shape
+    except AttributeError:
+        variable_shape = feature_column._variable_shape
+    return variable_shape.num_elements()
+
+
 def is_embedding(feature_column):
     try:
         from tensorflow.python.feature_column.feature_column_v2 import EmbeddingColumn
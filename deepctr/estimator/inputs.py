@@ -1,52 +1,149 @@
+import numpy as np
 import tensorflow as tf
+from tensorflow.python.training.session_run_hook import SessionRunHook
+
+from ..data import build_feature_description
+
+
+class _FeedInitializerHook(SessionRunHook):
+    # runs the initializer of the iterator of the last graph input_fn was called in, feeding the arrays
+
+    def __init__(self):
+        self.initializer = None
+        self.feed_dict = None
+
+    def after_create_session(self, session, coord):
+        session.run(self.initializer, feed_dict=self.feed_dict)
 
 
 def input_fn_pandas(df, features, label=None, batch_size=256, num_epochs=1, shuffle=False, queue_capacity_factor=10,
-                    num_threads=1):
-    if label is not None:
-        y = df[label]
-    else:
-        y = None
-    if tf.__version__ >= "2.0.0":
-        return tf.compat.v1.estimator.inputs.pandas_input_fn(df[features], y, batch_size=batch_size,
-                                                             num_epochs=num_epochs,
-                                                             shuffle=shuffle,
-                                                             queue_capacity=batch_size * queue_capacity_factor,
-                                                             num_threads=num_threads)
-
-    return tf.estimator.inputs.pandas_input_fn(df[features], y, batch_size=batch_size, num_epochs=num_epochs,
-                                               shuffle=shuffle, queue_capacity=batch_size * queue_capacity_factor,
-                                               num_threads=num_threads)
-
-
-def input_fn_tfrecord(filenames, feature_description, label=None, batch_size=256, num_epochs=1, num_parallel_calls=8,
-                      shuffle_factor=10, prefetch_factor=1,
-                      ):
+                    num_threads=None):
+    """Returns an ``input_fn`` reading batches of the rows of a DataFrame.
+
+    The columns are converted once to contiguous numpy arrays, which are a single dataset element, and each batch is
+    gathered from them with one ``tf.gather`` per column on the indices of its rows, so the pipeline runs in the
+    TensorFlow runtime without calling back into Python. Each feature is a tensor with shape ``(batch_size,)`` .
+
+    In eager mode ``input_fn`` returns a ``tf.data.Dataset`` . Called in a graph, e.g. by an Estimator, it returns the
+    next batch of an initializable iterator instead, and the arrays are not stored in the graph: they are fed to
+    placeholders when the session is created by the ``SessionRunHook`` ``input_fn.hook`` , which must be passed in
+    the ``hooks`` of ``train`` , ``evaluate`` or ``predict`` .
+
+    :param df: pandas DataFrame.
+    :param features: list of str, the feature columns of ``df`` .
+    :param label: str or None, the label column of ``df`` .
+    :param batch_size: int, the number of rows of each batch.
+    :param num_epochs: int, the number of passes over the rows, None to repeat indefinitely.
+    :param shuffle: bool, whether to shuffle the rows in every epoch.
+    :param queue_capacity_factor: int, the number of batches prefetched.
+    :param num_threads: int or None, the number of batches gathered in parallel. None to autotune it.
+    :return: an ``input_fn`` returning a ``tf.data.Dataset`` of ``(features, labels)`` , or of features if ``label`` is None, or the next element of an iterator over it in a graph.
+    """
+    features = list(features)
+    names = features if label is None else features + [label]
+    arrays = [np.ascontiguousarray(np.asarray(df[name])) for name in names]
+    num_samples = len(df)
+
+    def _get_batch(index, columns):
+        values = [tf.gather(column, index) for column in columns]
+        batch_features = dict(zip(features, values[:len(features)]))
+        if label is None:
+            return batch_features
+        return batch_features, values[-1]
+
+    def _epoch_index(_):
+        index = tf.range(num_samples, dtype=tf.int64)
+        if shuffle:
+            index = tf.random.shuffle(index)
+        return tf.data.Dataset.from_tensor_slices(index).batch(batch_size)
+
+    hook = _FeedInitializerHook()
+
+    def input_fn():
+        if tf.executing_eagerly():
+            columns = tuple(arrays)
+        else:
+            # in a graph the arrays would be constants of the GraphDef, they are fed by the hook instead
+            columns = tuple(tf.compat.v1.placeholder(tf.string if array.dtype == object else array.dtype,
+                                                     (None,) + array.shape[1:]) for array in arrays)
+        # the columns are one element repeated with every batch of indices, they are not copied
+        dataset = tf.data.Dataset.range(1).repeat(num_epochs).flat_map(_epoch_index)
+        dataset = tf.data.Dataset.zip((dataset, tf.data.Dataset.from_tensors(columns).repeat()))
+        dataset = dataset.map(_get_batch, num_parallel_calls=num_threads or tf.data.experimental.AUTOTUNE)
+        dataset = dataset.prefetch(queue_capacity_factor)
+        if tf.executing_eagerly():
+            return dataset
+        iterator = tf.compat.v1.data.make_initializable_iterator(dataset)
+        hook.initializer = iterator.initializer
+        hook.feed_dict = dict(zip(columns, arrays))
+        return iterator.get_next()
+
+    input_fn.hook = hook
+    return input_fn
+
+
+def input_fn_tfrecord(filenames, feature_description, label=None, batch_size=256, num_epochs=1, num_parallel_calls=None,
+                      shuffle_factor=10, prefetch_factor=1, cache=False, cycle_length=None):
+    """Returns an ``input_fn`` reading batches of ``tf.train.Example`` records from TFRecord files.
+
+    The files are read in parallel, and each batch of serialized records is parsed with a single
+    ``tf.io.parse_example`` call.
+
+    :param filenames: str or list of str, the TFRecord files, or a glob pattern of them, e.g. ``"train/part-*.tfrecords"`` .
+    :param feature_description: dict of the parsing spec of each feature, or a list of feature columns to derive it from with ``build_feature_description`` .
+    :param label: str or None, the name of the label feature, returned apart from the features.
+    :param batch_size: int, the number of records of each batch.
+    :param num_epochs: int, the number of passes over the files, None to repeat indefinitely.
+    :param num_parallel_calls: int or None, the number of batches parsed in parallel. None to autotune it.
+    :param shuffle_factor: int, the shuffle buffer holds ``batch_size * shuffle_factor`` records. 0 to read the records in order.
+    :param prefetch_factor: int, 0 to disable prefetching, otherwise the number of prefetched batches is autotuned.
+    :param cache: bool or str, whether to cache the parsed batches after the first epoch. True caches them in memory, a str caches them in files with this path prefix on local disk. The later epochs shuffle the order of the cached batches but not the records within a batch.
+    :param cycle_length: int or None, the number of files read in parallel. None to autotune it.
+    :return: an ``input_fn`` returning a ``tf.data.Dataset`` of ``(features, labels)`` , or of features if ``label`` is None.
+    """
+    if not isinstance(feature_description, dict):
+        feature_description = build_feature_description(feature_description, label)
+    autotune = tf.data.experimental.AUTOTUNE
+    shuffle = shuffle_factor > 0
+
     def _parse_examples(serial_exmp):
         try:
-            features = tf.parse_single_example(serial_exmp, features=feature_description)
+            features = tf.parse_example(serial_exmp, features=feature_description)
         except AttributeError:
-            features = tf.io.parse_single_example(serial_exmp, features=feature_description)
+            features = tf.io.parse_example(serial_exmp, features=feature_description)
         if label is not None:
             labels = features.pop(label)
             return features, labels
         return features
 
     def input_fn():
-        dataset = tf.data.TFRecordDataset(filenames)
-        dataset = dataset.map(_parse_examples, num_parallel_calls=num_parallel_calls)
-        if shuffle_factor > 0:
+        if isinstance(filenames, str):
+            files = tf.data.Dataset.list_files(filenames, shuffle=shuffle)
+        else:
+            files = tf.data.Dataset.from_tensor_slices(list(filenames))
+            if shuffle:
+                files = files.shuffle(len(filenames))
+        dataset = files.interleave(tf.data.TFRecordDataset, cycle_length=cycle_length or autotune,
+                                   num_parallel_calls=autotune)
+        if shuffle:
             dataset = dataset.shuffle(buffer_size=batch_size * shuffle_factor)
+            options = tf.data.Options()
+            # the records are shuffled anyway, the files are read in the order they are ready
+            options.experimental_deterministic = False
+            dataset = dataset.with_options(options)
 
-        dataset = dataset.repeat(num_epochs).batch(batch_size)
+        if cache:
+            dataset = dataset.batch(batch_size).map(_parse_examples, num_parallel_calls=num_parallel_calls or autotune)
+            dataset = dataset.cache(cache if isinstance(cache, str) else "")
+            if shuffle:
+                dataset = dataset.shuffle(buffer_size=shuffle_factor)
+            dataset = dataset.repeat(num_epochs)
+        else:
+            dataset = dataset.repeat(num_epochs).batch(batch_size)
+            dataset = dataset.map(_parse_examples, num_parallel_calls=num_parallel_calls or autotune)
 
         if prefetch_factor > 0:
-            dataset = dataset.prefetch(buffer_size=batch_size * prefetch_factor)
-        try:
-            iterator = dataset.make_one_shot_iterator()
-        except AttributeError:
-            iterator = tf.compat.v1.data.make_one_shot_iterator(dataset)
-
-        return iterator.get_next()
+            dataset = dataset.prefetch(buffer_size=autotune)
+        return dataset
 
     return input_fn
@@ -21,7 +21,7 @@ from ...layers.utils import concat_func
 def CCPMEstimator(linear_feature_columns, dnn_feature_columns, conv_kernel_width=(6, 5), conv_filters=(4, 4),
                   dnn_hidden_units=(128, 64), l2_reg_linear=1e-5, l2_reg_embedding=1e-5, l2_reg_dnn=0, dnn_dropout=0,
                   seed=1024, task='binary', model_dir=None, config=None, linear_optimizer='Ftrl',
-                  dnn_optimizer='Adagrad', training_chief_hooks=None):
+                  dnn_optimizer='Adagrad', training_chief_hooks=None, partitioner=None):
     """Instantiates the Convolutional Click Prediction Model architecture.
 
     :param linear_feature_columns: An iterable containing all the features used by linear part of the model.
@@ -45,6 +45,7 @@ def CCPMEstimator(linear_feature_columns, dnn_feature_columns, conv_kernel_width
         the deep part of the model. Defaults to Adagrad optimizer.
     :param training_chief_hooks: Iterable of `tf.train.SessionRunHook` objects to
         run on the chief worker during training.
+    :param partitioner: Optional variable partitioner for the embedding and linear weights, e.g. ``tf.compat.v1.fixed_size_partitioner`` .
     :return: A Tensorflow Estimator  instance.
 
     """
@@ -56,11 +57,13 @@ def CCPMEstimator(linear_feature_columns, dnn_feature_columns, conv_kernel_width
     def _model_fn(features, labels, mode, config):
         train_flag = (mode == tf.estimator.ModeKeys.TRAIN)
 
-        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear)
+        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear,
+                                         partitioner=partitioner)
 
         with variable_scope(DNN_SCOPE_NAME):
             sparse_embedding_list, _ = input_from_feature_columns(features, dnn_feature_columns,
-                                                                                 l2_reg_embedding=l2_reg_embedding)
+                                                                                 l2_reg_embedding=l2_reg_embedding,
+                                                                                 partitioner=partitioner)
             n = len(sparse_embedding_list)
             l = len(conv_filters)
 
@@ -20,7 +20,7 @@ def DCNEstimator(linear_feature_columns, dnn_feature_columns, cross_num=2, dnn_h
                  l2_reg_embedding=1e-5,
                  l2_reg_cross=1e-5, l2_reg_dnn=0, seed=1024, dnn_dropout=0, dnn_use_bn=False,
                  dnn_activation='relu', task='binary', model_dir=None, config=None, linear_optimizer='Ftrl',
-                 dnn_optimizer='Adagrad', training_chief_hooks=None):
+                 dnn_optimizer='Adagrad', training_chief_hooks=None, partitioner=None):
     """Instantiates the Deep&Cross Network architecture.
 
     :param linear_feature_columns: An iterable containing all the features used by linear part of the model.
@@ -45,6 +45,7 @@ def DCNEstimator(linear_feature_columns, dnn_feature_columns, cross_num=2, dnn_h
         the deep part of the model. Defaults to Adagrad optimizer.
     :param training_chief_hooks: Iterable of `tf.train.SessionRunHook` objects to
         run on the chief worker during training.
+    :param partitioner: Optional variable partitioner for the embedding and linear weights, e.g. ``tf.compat.v1.fixed_size_partitioner`` .
     :return: A Tensorflow Estimator  instance.
 
     """
@@ -54,11 +55,13 @@ def DCNEstimator(linear_feature_columns, dnn_feature_columns, cross_num=2, dnn_h
     def _model_fn(features, labels, mode, config):
         train_flag = (mode == tf.estimator.ModeKeys.TRAIN)
 
-        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear)
+        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear,
+                                         partitioner=partitioner)
 
         with variable_scope(DNN_SCOPE_NAME):
             sparse_embedding_list, dense_value_list = input_from_feature_columns(features, dnn_feature_columns,
-                                                                                 l2_reg_embedding=l2_reg_embedding)
+                                                                                 l2_reg_embedding=l2_reg_embedding,
+                                                                                 partitioner=partitioner)
 
             dnn_input = combined_dnn_input(sparse_embedding_list, dense_value_list)
 
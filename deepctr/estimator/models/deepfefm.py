@@ -22,7 +22,8 @@ def DeepFEFMEstimator(linear_feature_columns, dnn_feature_columns,
                       dnn_hidden_units=(256, 128, 64), l2_reg_linear=0.00001, l2_reg_embedding_feat=0.00001,
                       l2_reg_embedding_field=0.00001, l2_reg_dnn=0, seed=1024, dnn_dropout=0.0,
                       dnn_activation='relu', dnn_use_bn=False, task='binary', model_dir=None,
-                      config=None, linear_optimizer='Ftrl', dnn_optimizer='Adagrad', training_chief_hooks=None):
+                      config=None, linear_optimizer='Ftrl', dnn_optimizer='Adagrad', training_chief_hooks=None,
+                      partitioner=None):
     """Instantiates the DeepFEFM Network architecture or the shallow FEFM architecture (Ablation support not provided
     as estimator is meant for production, Ablation support provided in DeepFEFM implementation in models
 
@@ -48,18 +49,21 @@ def DeepFEFMEstimator(linear_feature_columns, dnn_feature_columns,
         the deep part of the model. Defaults to Adagrad optimizer.
     :param training_chief_hooks: Iterable of `tf.train.SessionRunHook` objects to
         run on the chief worker during training.
+    :param partitioner: Optional variable partitioner for the embedding and linear weights, e.g. ``tf.compat.v1.fixed_size_partitioner`` .
     :return: A Tensorflow Estimator  instance.
     """
 
     def _model_fn(features, labels, mode, config):
         train_flag = (mode == tf.estimator.ModeKeys.TRAIN)
 
-        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear)
+        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear,
+                                         partitioner=partitioner)
         final_logit_components = [linear_logits]
 
         with variable_scope(DNN_SCOPE_NAME):
             sparse_embedding_list, dense_value_list = input_from_feature_columns(features, dnn_feature_columns,
-                                                                                 l2_reg_embedding=l2_reg_embedding_feat)
+                                                                                 l2_reg_embedding=l2_reg_embedding_feat,
+                                                                                 partitioner=partitioner)
 
             fefm_interaction_embedding = FEFMLayer(
                 regularizer=l2_reg_embedding_field)(concat_func(sparse_embedding_list, axis=1))
@@ -21,7 +21,7 @@ def FiBiNETEstimator(linear_feature_columns, dnn_feature_columns, bilinear_type=
                      dnn_hidden_units=(256, 128, 64), l2_reg_linear=1e-5,
                      l2_reg_embedding=1e-5, l2_reg_dnn=0, seed=1024, dnn_dropout=0, dnn_activation='relu',
                      task='binary', model_dir=None, config=None, linear_optimizer='Ftrl',
-                     dnn_optimizer='Adagrad', training_chief_hooks=None):
+                     dnn_optimizer='Adagrad', training_chief_hooks=None, partitioner=None):
     """Instantiates the Feature Importance and Bilinear feature Interaction NETwork architecture.
 
     :param linear_feature_columns: An iterable containing all the features used by linear part of the model.
@@ -46,17 +46,20 @@ def FiBiNETEstimator(linear_feature_columns, dnn_feature_columns, bilinear_type=
         the deep part of the model. Defaults to Adagrad optimizer.
     :param training_chief_hooks: Iterable of `tf.train.SessionRunHook` objects to
         run on the chief worker during training.
+    :param partitioner: Optional variable partitioner for the embedding and linear weights, e.g. ``tf.compat.v1.fixed_size_partitioner`` .
     :return: A Tensorflow Estimator  instance.
     """
 
     def _model_fn(features, labels, mode, config):
         train_flag = (mode == tf.estimator.ModeKeys.TRAIN)
 
-        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear)
+        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear,
+                                         partitioner=partitioner)
 
         with variable_scope(DNN_SCOPE_NAME):
             sparse_embedding_list, dense_value_list = input_from_feature_columns(features, dnn_feature_columns,
-                                                                                 l2_reg_embedding=l2_reg_embedding)
+                                                                                 l2_reg_embedding=l2_reg_embedding,
+                                                                                 partitioner=partitioner)
 
             senet_embedding_list = SENETLayer(
                 reduction_ratio, seed)(sparse_embedding_list)
@@ -17,7 +17,7 @@ from ...layers.utils import combined_dnn_input
 def FNNEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_units=(256, 128, 64),
                  l2_reg_embedding=1e-5, l2_reg_linear=1e-5, l2_reg_dnn=0, seed=1024, dnn_dropout=0,
                  dnn_activation='relu', task='binary', model_dir=None, config=None, linear_optimizer='Ftrl',
-                 dnn_optimizer='Adagrad', training_chief_hooks=None):
+                 dnn_optimizer='Adagrad', training_chief_hooks=None, partitioner=None):
     """Instantiates the Factorization-supported Neural Network architecture.
 
     :param linear_feature_columns: An iterable containing all the features used by linear part of the model.
@@ -40,6 +40,7 @@ def FNNEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_units=(
         the deep part of the model. Defaults to Adagrad optimizer.
     :param training_chief_hooks: Iterable of `tf.train.SessionRunHook` objects to
         run on the chief worker during training.
+    :param partitioner: Optional variable partitioner for the embedding and linear weights, e.g. ``tf.compat.v1.fixed_size_partitioner`` .
     :return: A Tensorflow Estimator  instance.
 
     """
@@ -47,11 +48,13 @@ def FNNEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_units=(
     def _model_fn(features, labels, mode, config):
         train_flag = (mode == tf.estimator.ModeKeys.TRAIN)
 
-        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear)
+        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear,
+                                         partitioner=partitioner)
 
         with variable_scope(DNN_SCOPE_NAME):
             sparse_embedding_list, dense_value_list = input_from_feature_columns(features, dnn_feature_columns,
-                                                                                 l2_reg_embedding=l2_reg_embedding)
+                                                                                 l2_reg_embedding=l2_reg_embedding,
+                                                                                 partitioner=partitioner)
             dnn_input = combined_dnn_input(sparse_embedding_list, dense_value_list)
             deep_out = DNN(dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, False, seed=seed)(dnn_input, training=train_flag)
             dnn_logit = tf.keras.layers.Dense(
@@ -23,7 +23,7 @@ def FwFMEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_units=
                   l2_reg_linear=0.00001, l2_reg_embedding=0.00001, l2_reg_field_strength=0.00001, l2_reg_dnn=0,
                   seed=1024, dnn_dropout=0, dnn_activation='relu', dnn_use_bn=False, task='binary', model_dir=None,
                   config=None, linear_optimizer='Ftrl',
-                  dnn_optimizer='Adagrad', training_chief_hooks=None):
+                  dnn_optimizer='Adagrad', training_chief_hooks=None, partitioner=None):
     """Instantiates the DeepFwFM Network architecture.
 
     :param linear_feature_columns: An iterable containing all the features used by linear part of the model.
@@ -50,6 +50,7 @@ def FwFMEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_units=
         the deep part of the model. Defaults to Adagrad optimizer.
     :param training_chief_hooks: Iterable of `tf.train.SessionRunHook` objects to
         run on the chief worker during training.
+    :param partitioner: Optional variable partitioner for the embedding and linear weights, e.g. ``tf.compat.v1.fixed_size_partitioner`` .
     :return: A Tensorflow Estimator  instance.
 
     """
@@ -57,11 +58,13 @@ def FwFMEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_units=
     def _model_fn(features, labels, mode, config):
         train_flag = (mode == tf.estimator.ModeKeys.TRAIN)
 
-        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear)
+        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear,
+                                         partitioner=partitioner)
         final_logit_components = [linear_logits]
         with variable_scope(DNN_SCOPE_NAME):
             sparse_embedding_list, dense_value_list = input_from_feature_columns(features, dnn_feature_columns,
-                                                                                 l2_reg_embedding=l2_reg_embedding)
+                                                                                 l2_reg_embedding=l2_reg_embedding,
+                                                                                 partitioner=partitioner)
 
             fwfm_logit = FwFMLayer(num_fields=len(sparse_embedding_list), regularizer=l2_reg_field_strength)(
                 concat_func(sparse_embedding_list, axis=1))
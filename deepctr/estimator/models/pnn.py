@@ -20,7 +20,7 @@ def PNNEstimator(dnn_feature_columns, dnn_hidden_units=(256, 128, 64), l2_reg_em
                  seed=1024, dnn_dropout=0, dnn_activation='relu', use_inner=True, use_outter=False, kernel_type='mat',
                  task='binary', model_dir=None, config=None,
                  linear_optimizer='Ftrl',
-                 dnn_optimizer='Adagrad', training_chief_hooks=None):
+                 dnn_optimizer='Adagrad', training_chief_hooks=None, partitioner=None):
     """Instantiates the Product-based Neural Network architecture.
 
     :param dnn_feature_columns: An iterable containing all the features used by deep part of the model.
@@ -44,6 +44,7 @@ def PNNEstimator(dnn_feature_columns, dnn_hidden_units=(256, 128, 64), l2_reg_em
         the deep part of the model. Defaults to Adagrad optimizer.
     :param training_chief_hooks: Iterable of `tf.train.SessionRunHook` objects to
         run on the chief worker during training.
+    :param partitioner: Optional variable partitioner for the embedding weights, e.g. ``tf.compat.v1.fixed_size_partitioner`` .
     :return: A Tensorflow Estimator  instance.
 
     """
@@ -58,7 +59,8 @@ def PNNEstimator(dnn_feature_columns, dnn_hidden_units=(256, 128, 64), l2_reg_em
 
         with variable_scope(DNN_SCOPE_NAME):
             sparse_embedding_list, dense_value_list = input_from_feature_columns(features, dnn_feature_columns,
-                                                                                 l2_reg_embedding=l2_reg_embedding)
+                                                                                 l2_reg_embedding=l2_reg_embedding,
+                                                                                 partitioner=partitioner)
 
             inner_product = tf.keras.layers.Flatten()(
                 InnerProductLayer()(sparse_embedding_list))
@@ -20,7 +20,7 @@ def xDeepFMEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_uni
                      l2_reg_embedding=0.00001, l2_reg_dnn=0, l2_reg_cin=0, seed=1024, dnn_dropout=0,
                      dnn_activation='relu', dnn_use_bn=False, task='binary', model_dir=None, config=None,
                      linear_optimizer='Ftrl',
-                     dnn_optimizer='Adagrad', training_chief_hooks=None):
+                     dnn_optimizer='Adagrad', training_chief_hooks=None, partitioner=None):
     """Instantiates the xDeepFM architecture.
 
     :param linear_feature_columns: An iterable containing all the features used by linear part of the model.
@@ -48,6 +48,7 @@ def xDeepFMEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_uni
         the deep part of the model. Defaults to Adagrad optimizer.
     :param training_chief_hooks: Iterable of `tf.train.SessionRunHook` objects to
         run on the chief worker during training.
+    :param partitioner: Optional variable partitioner for the embedding and linear weights, e.g. ``tf.compat.v1.fixed_size_partitioner`` .
     :return: A Tensorflow Estimator  instance.
 
     """
@@ -55,12 +56,14 @@ def xDeepFMEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_uni
     def _model_fn(features, labels, mode, config):
         train_flag = (mode == tf.estimator.ModeKeys.TRAIN)
 
-        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear)
+        linear_logits = get_linear_logit(features, linear_feature_columns, l2_reg_linear=l2_reg_linear,
+                                         partitioner=partitioner)
         logits_list = [linear_logits]
 
         with variable_scope(DNN_SCOPE_NAME):
             sparse_embedding_list, dense_value_list = input_from_feature_columns(features, dnn_feature_columns,
-                                                                                 l2_reg_embedding=l2_reg_embedding)
+                                                                                 l2_reg_embedding=l2_reg_embedding,
+                                                                                 partitioner=partitioner)
             fm_input = concat_func(sparse_embedding_list, axis=1)
 
             dnn_input = combined_dnn_input(sparse_embedding_list, dense_value_list)
@@ -141,16 +141,13 @@ def get_train_op_fn(linear_optimizer, dnn_optimizer):
         linear_var_list = get_collection(get_GraphKeys().TRAINABLE_VARIABLES, LINEAR_SCOPE_NAME)
         dnn_var_list = get_collection(get_GraphKeys().TRAINABLE_VARIABLES, DNN_SCOPE_NAME)
 
-        if len(dnn_var_list) > 0:
-            train_ops.append(
-                dnn_optimizer.minimize(
-                    loss,
-                    var_list=dnn_var_list))
-        if len(linear_var_list) > 0:
-            train_ops.append(
-                linear_optimizer.minimize(
-                    loss,
-                    var_list=linear_var_list))
+        # one backward pass for the variables of both parts, each optimizer applies the gradients of its part
+        grads = tf.gradients(loss, dnn_var_list + linear_var_list)
+        for optimizer, var_list, var_grads in [(dnn_optimizer, dnn_var_list, grads[:len(dnn_var_list)]),
+                                               (linear_optimizer, linear_var_list, grads[len(dnn_var_list):])]:
+            grads_and_vars = [(g, v) for g, v in zip(var_grads, var_list) if g is not None]
+            if len(grads_and_vars) > 0:
+                train_ops.append(optimizer.apply_gradients(grads_and_vars))
 
         train_op = tf.group(*train_ops)
         with tf.control_dependencies([train_op]):
@@ -162,11 +159,19 @@ def get_train_op_fn(linear_optimizer, dnn_optimizer):
     return _train_op_fn
 
 
-def variable_scope(name_or_scope):
+def variable_scope(name_or_scope, partitioner=None):
     try:
-        return tf.variable_scope(name_or_scope)
+        return tf.variable_scope(name_or_scope, partitioner=partitioner)
     except AttributeError:
-        return tf.compat.v1.variable_scope(name_or_scope)
+        return tf.compat.v1.variable_scope(name_or_scope, partitioner=partitioner)
+
+
+def get_variable_scope():
+    try:
+        return tf.get_variable_scope()
+    except AttributeError:
+        return tf.compat.v1.get_variable_scope()
+
 
 def get_collection(key, scope=None):
     try:
@@ -1,3 +1,4 @@
+import numpy as np
 import tensorflow as tf
 from collections import namedtuple, OrderedDict
 from copy import copy
@@ -5,6 +6,7 @@ from itertools import chain
 
 from tensorflow.python.keras.initializers import RandomNormal, Zeros
 from tensorflow.python.keras.layers import Input, Lambda
+from tensorflow.python.keras.models import Model
 
 from .inputs import create_embedding_matrix, embedding_lookup, get_dense_input, varlen_embedding_lookup, \
     get_varlen_pooling_list, mergeDict
@@ -149,6 +151,87 @@ def build_input_features(feature_columns, prefix=''):
     return input_features
 
 
+PACKED_SPARSE_NAME = "packed_sparse"
+PACKED_DENSE_NAME = "packed_dense"
+
+
+def _packed_dtype(dtypes):
+    return max(dtypes, key=lambda dtype: dtype.size)
+
+
+def pack_model_inputs(model):
+    """Wraps a model built on ``build_input_features`` so that it is fed with two packed tensors instead of one
+    tensor per feature: a ``(batch_size, n_sparse)`` integer tensor ``"packed_sparse"`` with the scalar integer inputs,
+    i.e. the ``SparseFeat`` ids and the sequence lengths, and a ``(batch_size, n_dense)`` float tensor
+    ``"packed_dense"`` with the fixed size float inputs, i.e. the ``DenseFeat`` values. The per feature inputs of
+    ``model`` are sliced from them in the graph. The other inputs, e.g. the string ids and the sequences, are still
+    fed one by one. The returned model shares its layers and weights with ``model`` .
+
+    :param model: a Keras model.
+    :return: a tuple ``(packed_model, column_map)`` . ``column_map`` is an OrderedDict mapping the name of every packed input of ``model`` to a tuple ``(packed_name, start, stop)`` , its columns in the packed tensor. Pass it to ``pack_input_data`` to pack the data.
+    """
+    groups = OrderedDict([(PACKED_SPARSE_NAME, []), (PACKED_DENSE_NAME, [])])
+    for name, x in zip(model.input_names, model.inputs):
+        shape = x.shape.as_list()
+        if len(shape) != 2 or shape[1] is None:
+            continue
+        if x.dtype.is_integer and shape[1] == 1:
+            groups[PACKED_SPARSE_NAME].append((name, x))
+        elif x.dtype.is_floating:
+            groups[PACKED_DENSE_NAME].append((name, x))
+
+    column_map = OrderedDict()
+    views = {}
+    packed_inputs = []
+    for packed_name, group in groups.items():
+        if not group:
+            continue
+        sizes = [x.shape[1] for _, x in group]
+        packed_dtype = _packed_dtype([x.dtype for _, x in group])
+        packed_input = Input(shape=(sum(sizes),), name=packed_name, dtype=packed_dtype)
+        packed_inputs.append(packed_input)
+        # a single split gives the views of all the packed inputs
+        columns = Lambda(lambda x, sizes=sizes: tf.split(x, sizes, axis=1) if len(sizes) > 1 else [x],
+                         name=packed_name + '_split')(packed_input)
+        start = 0
+        for (name, x), size, column in zip(group, sizes, columns):
+            column_map[name] = (packed_name, start, start + size)
+            start += size
+            if x.dtype != packed_dtype:
+                column = Lambda(lambda c, dtype=x.dtype: tf.cast(c, dtype))(column)
+            views[name] = column
+
+    inputs = []
+    for name, x in zip(model.input_names, model.inputs):
+        if name not in views:
+            views[name] = Input(shape=x.shape[1:], name=name, dtype=x.dtype)
+            inputs.append(views[name])
+    outputs = model([views[name] for name in model.input_names])
+    return Model(inputs=packed_inputs + inputs, outputs=outputs), column_map
+
+
+def pack_input_data(x, column_map):
+    """Packs the model input ``x`` , a dict of numpy arrays keyed by input name, for the model returned by
+    ``pack_model_inputs`` . The inputs which are not in ``column_map`` are kept as they are.
+
+    :param x: dict of numpy arrays, the input of the model before packing.
+    :param column_map: the column map returned by ``pack_model_inputs`` .
+    :return: dict of numpy arrays, the input of the packed model.
+    """
+    packed = OrderedDict()
+    for name, (packed_name, start, stop) in column_map.items():
+        packed.setdefault(packed_name, []).append(np.asarray(x[name]).reshape(-1, stop - start))
+    for packed_name, columns in packed.items():
+        dtype = np.result_type(*columns)
+        if packed_name == PACKED_DENSE_NAME and not np.issubdtype(dtype, np.floating):
+            dtype = np.float32
+        packed[packed_name] = np.ascontiguousarray(np.concatenate(columns, axis=1), dtype=dtype)
+    for name, value in x.items():
+        if name not in column_map:
+            packed[name] = value
+    return packed
+
+
 def get_linear_logit(features, feature_columns, units=1, use_bias=False, seed=1024, prefix='linear',
                      l2_reg=0, sparse_feat_refine_weight=None):
     linear_feature_columns = copy(feature_columns)
@@ -6,14 +6,14 @@ Author:
 
 """
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from itertools import chain
 
 from tensorflow.python.keras.layers import Embedding, Lambda
 from tensorflow.python.keras.regularizers import l2
 
 from .layers.sequence import SequencePoolingLayer, WeightedSequenceLayer
-from .layers.utils import Hash
+from .layers.utils import Hash, BroadcastToBatch
 
 
 def get_inputs_list(inputs):
@@ -146,6 +146,27 @@ def get_dense_input(features, feature_columns):
     return dense_input_list
 
 
+def get_candidate_scoring_features(features, candidate_feature_list, history_feature_columns):
+    """Broadcasts the user side inputs of a model which scores ``n_candidates`` items for one user.
+
+    The features in ``candidate_feature_list`` are fed with ``n_candidates`` rows and the history features, with
+    their length and weight inputs, keep a single row so that they are only processed once. All other features are
+    fed with a single row and broadcast to ``n_candidates`` rows right after the input.
+    """
+    reference = features[candidate_feature_list[0]]
+    shared_names = set(candidate_feature_list)
+    for fc in history_feature_columns:
+        shared_names.update([fc.name, fc.length_name, fc.weight_name])
+
+    candidate_features = OrderedDict()
+    for name, value in features.items():
+        if name in shared_names:
+            candidate_features[name] = value
+        else:
+            candidate_features[name] = BroadcastToBatch()([value, reference])
+    return candidate_features
+
+
 def mergeDict(a, b):
     c = defaultdict(list)
     for k, v in a.items():
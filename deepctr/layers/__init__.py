@@ -1,21 +1,22 @@
 import tensorflow as tf
 
 from .activation import Dice
-from .core import DNN, LocalActivationUnit, PredictionLayer, RegulationModule
+from .core import DNN, ExpertBank, LocalActivationUnit, PredictionLayer, RegulationModule
 from .interaction import (CIN, FM, AFMLayer, BiInteractionPooling, CrossNet, CrossNetMix,
                           InnerProductLayer, InteractingLayer,
                           OutterProductLayer, FGCNNLayer, SENETLayer, BilinearInteraction,
                           FieldWiseBiInteraction, FwFMLayer, FEFMLayer, BridgeModule)
-from .normalization import LayerNormalization
+from .normalization import LayerNormalization, DenseNormalization
 from .sequence import (AttentionSequencePoolingLayer, BiasEncoding, BiLSTM,
                        KMaxPooling, SequencePoolingLayer, WeightedSequenceLayer,
                        Transformer, DynamicGRU, PositionEncoding)
-from .utils import NoMask, Hash, Linear, _Add, combined_dnn_input, softmax, reduce_sum, Concat
+from .utils import NoMask, Hash, Linear, _Add, combined_dnn_input, softmax, reduce_sum, Concat, BroadcastToBatch
 
 custom_objects = {'tf': tf,
                   'InnerProductLayer': InnerProductLayer,
                   'OutterProductLayer': OutterProductLayer,
                   'DNN': DNN,
+                  'ExpertBank': ExpertBank,
                   'PredictionLayer': PredictionLayer,
                   'FM': FM,
                   'AFMLayer': AFMLayer,
@@ -29,6 +30,7 @@ custom_objects = {'tf': tf,
                   'CIN': CIN,
                   'InteractingLayer': InteractingLayer,
                   'LayerNormalization': LayerNormalization,
+                  'DenseNormalization': DenseNormalization,
                   'BiLSTM': BiLSTM,
                   'Transformer': Transformer,
                   'NoMask': NoMask,
@@ -50,5 +52,6 @@ custom_objects = {'tf': tf,
                   'reduce_sum': reduce_sum,
                   'PositionEncoding': PositionEncoding,
                   'RegulationModule': RegulationModule,
-                  'BridgeModule': BridgeModule
+                  'BridgeModule': BridgeModule,
+                  'BroadcastToBatch': BroadcastToBatch
                   }
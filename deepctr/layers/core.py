@@ -6,6 +6,7 @@ Author:
 
 """
 
+import numpy as np
 import tensorflow as tf
 from tensorflow.python.keras import backend as K
 
@@ -20,9 +21,15 @@ try:
     from tensorflow.python.keras.layers import BatchNormalization
 except ImportError:
     BatchNormalization = tf.keras.layers.BatchNormalization
+# the backend of the Keras stack of BatchNormalization, whose global learning phase the layer reads
+if BatchNormalization.__module__.startswith('tensorflow.python.keras'):
+    _bn_backend = K
+else:
+    _bn_backend = tf.keras.backend
 from tensorflow.python.keras.regularizers import l2
 
 from .activation import activation_layer
+from .utils import get_dim, reduce_mean
 
 
 class LocalActivationUnit(Layer):
@@ -48,18 +55,21 @@ class LocalActivationUnit(Layer):
 
         - **seed**: A Python integer to use as random seed.
 
+        - **decompose_input**: bool. Whether compute the first linear layer of attention net on query and keys separately instead of on the concatenation ``[query, keys, query - keys, query * keys]``. The weights are the same in both cases, but the query is projected once per sample instead of ``T`` times and the ``(batch_size, T, 4 * embedding_size)`` input is never built.
+
       References
         - [Zhou G, Zhu X, Song C, et al. Deep interest network for click-through rate prediction[C]//Proceedings of the 24th ACM SIGKDD International Conference on Knowledge Discovery & Data Mining. ACM, 2018: 1059-1068.](https://arxiv.org/pdf/1706.06978.pdf)
     """
 
     def __init__(self, hidden_units=(64, 32), activation='sigmoid', l2_reg=0, dropout_rate=0, use_bn=False, seed=1024,
-                 **kwargs):
+                 decompose_input=False, **kwargs):
         self.hidden_units = hidden_units
         self.activation = activation
         self.l2_reg = l2_reg
         self.dropout_rate = dropout_rate
         self.use_bn = use_bn
         self.seed = seed
+        self.decompose_input = decompose_input
         super(LocalActivationUnit, self).__init__(**kwargs)
         self.supports_masking = True
 
@@ -95,8 +105,14 @@ class LocalActivationUnit(Layer):
 
         query, keys = inputs
 
-        keys_len = keys.get_shape()[1]
-        queries = K.repeat_elements(query, keys_len, 1)
+        if self.decompose_input:
+            return self._decomposed_call(query, keys, training=training)
+
+        keys_len = get_dim(keys)
+        if isinstance(keys_len, int):
+            queries = K.repeat_elements(query, keys_len, 1)
+        else:
+            queries = tf.tile(query, [1, keys_len, 1])
 
         att_input = tf.concat(
             [queries, keys, queries - keys, queries * keys], axis=-1)
@@ -107,6 +123,26 @@ class LocalActivationUnit(Layer):
 
         return attention_score
 
+    def _decomposed_call(self, query, keys, training=None):
+        if len(self.hidden_units) == 0:
+            return tf.nn.bias_add(self._decomposed_tensordot(query, keys, self.kernel), self.bias)
+
+        if not self.dnn.built:
+            embedding_size = int(query.get_shape()[-1])
+            self.dnn.build(tf.TensorShape([None, keys.get_shape()[1], 4 * embedding_size]))
+        fc = tf.nn.bias_add(self._decomposed_tensordot(query, keys, self.dnn.kernels[0]), self.dnn.bias[0])
+        att_out = self.dnn.call_from_first_layer(fc, training=training)
+
+        return tf.nn.bias_add(tf.tensordot(att_out, self.kernel, axes=(-1, 0)), self.bias)
+
+    @staticmethod
+    def _decomposed_tensordot(query, keys, kernel):
+        # [q, k, q - k, q * k] W = q (W_q + W_d) + k (W_k - W_d + diag(q) W_p)
+        w_q, w_k, w_d, w_p = tf.split(kernel, 4, axis=0)
+        query_term = tf.tensordot(query, w_q + w_d, axes=(-1, 0))  # (batch_size, 1, units)
+        keys_kernel = (w_k - w_d) + tf.transpose(query, (0, 2, 1)) * w_p  # (batch_size, embedding_size, units)
+        return tf.matmul(keys, keys_kernel) + query_term
+
     def compute_output_shape(self, input_shape):
         return input_shape[1][:2] + (1,)
 
@@ -115,7 +151,8 @@ class LocalActivationUnit(Layer):
 
     def get_config(self, ):
         config = {'activation': self.activation, 'hidden_units': self.hidden_units,
-                  'l2_reg': self.l2_reg, 'dropout_rate': self.dropout_rate, 'use_bn': self.use_bn, 'seed': self.seed}
+                  'l2_reg': self.l2_reg, 'dropout_rate': self.dropout_rate, 'use_bn': self.use_bn, 'seed': self.seed,
+                  'decompose_input': self.decompose_input}
         base_config = super(LocalActivationUnit, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
@@ -188,11 +225,22 @@ class DNN(Layer):
 
     def call(self, inputs, training=None, **kwargs):
 
-        deep_input = inputs
+        if len(self.hidden_units) == 0:
+            return inputs
+
+        fc = tf.nn.bias_add(tf.tensordot(
+            inputs, self.kernels[0], axes=(-1, 0)), self.bias[0])
+
+        return self.call_from_first_layer(fc, training=training)
+
+    def call_from_first_layer(self, fc, training=None):
+        """Runs the network given the pre-activation output ``fc`` of the first hidden layer."""
+        deep_input = fc
 
         for i in range(len(self.hidden_units)):
-            fc = tf.nn.bias_add(tf.tensordot(
-                deep_input, self.kernels[i], axes=(-1, 0)), self.bias[i])
+            if i > 0:
+                fc = tf.nn.bias_add(tf.tensordot(
+                    deep_input, self.kernels[i], axes=(-1, 0)), self.bias[i])
 
             if self.use_bn:
                 fc = self.bn_layers[i](fc, training=training)
@@ -223,6 +271,171 @@ class DNN(Layer):
         return dict(list(base_config.items()) + list(config.items()))
 
 
+class ExpertBank(Layer):
+    """A bank of ``num_experts`` DNN experts with the same hidden units. The weights of all experts are stacked, so that
+    each hidden layer of every expert is computed in one batched matmul.
+
+      Input shape
+        - 2D tensor with shape: ``(batch_size, input_dim)``, the input of every expert.
+        - or 3D tensor with shape: ``(batch_size, num_experts, input_dim)``, the input of each expert.
+
+      Output shape
+        - 3D tensor with shape: ``(batch_size, num_experts, hidden_units[-1])``, or ``(batch_size, len(expert_index), hidden_units[-1])`` if ``expert_index`` is set.
+
+      Arguments
+        - **num_experts**: positive integer, the number of experts.
+
+        - **hidden_units**:list of positive integer, the layer number and units in each layer of every expert.
+
+        - **activation**: Activation function to use.
+
+        - **l2_reg**: float between 0 and 1. L2 regularizer strength applied to the kernel weights matrix.
+
+        - **dropout_rate**: float in [0,1). Fraction of the units to dropout.
+
+        - **use_bn**: bool. Whether use BatchNormalization before activation or not. The statistics are kept per expert. If ``expert_index`` is set, the batch statistics of the computed experts are used in training and only their moving statistics are updated.
+
+        - **seed**: A Python integer to use as random seed. The kernel of expert ``i`` is initialized with ``seed + i``.
+
+        - **expert_index**: list of int or None. If set, only these experts are computed, and a 3D input has one row per computed expert. The weights of all ``num_experts`` experts are still created, so that the weights of a bank computing every expert can be loaded.
+    """
+
+    def __init__(self, num_experts, hidden_units, activation='relu', l2_reg=0, dropout_rate=0, use_bn=False, seed=1024,
+                 expert_index=None, **kwargs):
+        if num_experts <= 0:
+            raise ValueError("num_experts must be a positive integer")
+        if expert_index is not None and not all(0 <= i < num_experts for i in expert_index):
+            raise ValueError("expert_index must be in [0, num_experts)")
+        self.num_experts = num_experts
+        self.hidden_units = hidden_units
+        self.activation = activation
+        self.l2_reg = l2_reg
+        self.dropout_rate = dropout_rate
+        self.use_bn = use_bn
+        self.seed = seed
+        self.expert_index = list(expert_index) if expert_index is not None else None
+
+        super(ExpertBank, self).__init__(**kwargs)
+
+    def _kernel_initializer(self, shape, dtype=None, **kwargs):
+        return tf.stack([glorot_normal(seed=self.seed + i)(shape[1:], dtype=dtype) for i in range(shape[0])])
+
+    def build(self, input_shape):
+        input_size = input_shape[-1]
+        hidden_units = [int(input_size)] + list(self.hidden_units)
+        self.kernels = [self.add_weight(name='kernel' + str(i),
+                                        shape=(self.num_experts, hidden_units[i], hidden_units[i + 1]),
+                                        initializer=self._kernel_initializer,
+                                        regularizer=l2(self.l2_reg),
+                                        trainable=True) for i in range(len(self.hidden_units))]
+        self.bias = [self.add_weight(name='bias' + str(i),
+                                     shape=(self.num_experts, self.hidden_units[i]),
+                                     initializer=Zeros(),
+                                     trainable=True) for i in range(len(self.hidden_units))]
+        if self.use_bn:
+            self.bn_layers = [BatchNormalization(axis=[1, 2]) for _ in range(len(self.hidden_units))]
+            for bn_layer, units in zip(self.bn_layers, self.hidden_units):
+                bn_layer.build((None, self.num_experts, units))
+
+        self.dropout_layers = [Dropout(self.dropout_rate, seed=self.seed + i) for i in
+                               range(len(self.hidden_units))]
+
+        self.activation_layers = [activation_layer(self.activation) for _ in range(len(self.hidden_units))]
+
+        super(ExpertBank, self).build(input_shape)  # Be sure to call this somewhere!
+
+    def call(self, inputs, training=None, **kwargs):
+
+        shared_input = len(inputs.get_shape()) == 2
+        num_experts = self.num_experts if self.expert_index is None else len(self.expert_index)
+        if len(self.hidden_units) == 0:
+            if shared_input:
+                return tf.tile(tf.expand_dims(inputs, axis=1), [1, num_experts, 1])
+            return inputs
+
+        if training is None and self.use_bn:
+            # the BatchNormalization of all the experts and of a subset of them follow the same learning phase
+            training = _bn_backend.learning_phase()
+
+        deep_input = inputs
+        for i in range(len(self.hidden_units)):
+            kernel, bias = self.kernels[i], self.bias[i]
+            if self.expert_index is not None:
+                kernel, bias = tf.gather(kernel, self.expert_index), tf.gather(bias, self.expert_index)
+            if i == 0 and shared_input:
+                # the shared input is multiplied with the kernels of all experts at once
+                fc = tf.einsum('bi,eio->beo', deep_input, kernel)
+            else:
+                fc = tf.einsum('bei,eio->beo', deep_input, kernel)
+            fc = fc + bias
+
+            if self.use_bn and self.expert_index is not None:
+                fc = self._subset_batch_normalization(self.bn_layers[i], fc, training=training)
+            elif self.use_bn:
+                fc = self.bn_layers[i](fc, training=training)
+            try:
+                fc = self.activation_layers[i](fc, training=training)
+            except TypeError as e:  # TypeError: call() got an unexpected keyword argument 'training'
+                print("make sure the activation function use training flag properly", e)
+                fc = self.activation_layers[i](fc)
+
+            fc = self.dropout_layers[i](fc, training=training)
+            deep_input = fc
+
+        return deep_input
+
+    def _subset_batch_normalization(self, bn_layer, inputs, training=None):
+        # the BatchNormalization of the computed experts only, the statistics of the other experts are not changed
+        def gather(weight):
+            return tf.gather(weight, self.expert_index, axis=-2)
+
+        moving_mean, moving_variance = gather(bn_layer.moving_mean), gather(bn_layer.moving_variance)
+        mean = reduce_mean(inputs, axis=0, keep_dims=True)
+        variance = reduce_mean(tf.square(inputs - mean), axis=0, keep_dims=True)
+        mean = K.in_train_phase(mean, moving_mean, training=training)
+        variance = K.in_train_phase(variance, moving_variance, training=training)
+
+        # the moving statistics move towards the batch ones at the computed experts, out of training the step is zero
+        selection = tf.one_hot(self.expert_index, self.num_experts)
+        for weight, moving_value, value in [(bn_layer.moving_mean, moving_mean, mean),
+                                            (bn_layer.moving_variance, moving_variance, variance)]:
+            step = (moving_value - tf.stop_gradient(value)) * (1 - bn_layer.momentum)
+            step = tf.einsum('ke,bku->beu', selection, step)
+            self.add_update(K.update_sub(weight, step))
+
+        return tf.nn.batch_normalization(inputs, mean, variance, gather(bn_layer.beta), gather(bn_layer.gamma),
+                                         bn_layer.epsilon)
+
+    def set_dnn_weights(self, dnn_weights):
+        """Sets the weights of the bank from the weights of ``num_experts`` separate ``DNN`` layers with the same
+        arguments, e.g. the experts of a MMOE, PLE or SharedBottom model saved before their experts were stacked in
+        banks. The bank must be built.
+
+        :param dnn_weights: list of ``num_experts`` lists of numpy arrays, the ``get_weights()`` of each ``DNN`` in the order of the experts.
+        """
+        if len(dnn_weights) != self.num_experts:
+            raise ValueError("expected the weights of %d DNN, got %d" % (self.num_experts, len(dnn_weights)))
+        weights = self.get_weights()
+        if any(len(expert_weights) != len(weights) for expert_weights in dnn_weights):
+            raise ValueError("the DNN have other hidden units or use_bn than the bank")
+        # the DNN and the bank list their weights in the same order, the kernels, biases and BatchNormalization
+        # weights of the bank are the ones of the experts stacked
+        self.set_weights([np.reshape(np.stack(values), weight.shape)
+                          for weight, values in zip(weights, zip(*dnn_weights))])
+
+    def compute_output_shape(self, input_shape):
+        output_size = self.hidden_units[-1] if len(self.hidden_units) > 0 else input_shape[-1]
+        num_experts = self.num_experts if self.expert_index is None else len(self.expert_index)
+        return (input_shape[0], num_experts, output_size)
+
+    def get_config(self, ):
+        config = {'num_experts': self.num_experts, 'hidden_units': self.hidden_units, 'activation': self.activation,
+                  'l2_reg': self.l2_reg, 'use_bn': self.use_bn, 'dropout_rate': self.dropout_rate, 'seed': self.seed,
+                  'expert_index': self.expert_index}
+        base_config = super(ExpertBank, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+
 class PredictionLayer(Layer):
     """
       Arguments
@@ -6,13 +6,15 @@ Author:
 
 """
 
+import numpy as np
+import tensorflow as tf
 from tensorflow.python.keras import backend as K
 from tensorflow.python.keras.layers import Layer
 
 try:
-    from tensorflow.python.ops.init_ops import Zeros, Ones
+    from tensorflow.python.ops.init_ops import Zeros, Ones, Constant
 except ImportError:
-    from tensorflow.python.ops.init_ops_v2 import Zeros, Ones
+    from tensorflow.python.ops.init_ops_v2 import Zeros, Ones, Constant
 
 
 class LayerNormalization(Layer):
@@ -49,3 +51,83 @@ class LayerNormalization(Layer):
         config = {'axis': self.axis, 'eps': self.eps, 'center': self.center, 'scale': self.scale}
         base_config = super(LayerNormalization, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
+
+
+class DenseNormalization(Layer):
+    """Normalizes all the dense features of a model in one vectorized op, with statistics computed beforehand,
+    e.g. by ``deepctr.data.DenseFeatureStatistics`` . The statistics are non-trainable weights of the layer, so they
+    are saved with the model.
+
+      Input shape
+        - A 2D tensor with shape: ``(batch_size, n_columns)`` or a list of 2D tensors with shape: ``(batch_size, dim_i)`` , where the ``dim_i`` sum up to ``n_columns`` .
+
+      Output shape
+        - The same as the input.
+
+      Arguments
+        - **offset**: list of float with length ``n_columns`` , the outputs are ``(inputs - offset) / scale`` .
+
+        - **scale**: list of float with length ``n_columns`` .
+
+        - **boundaries**: list of ``n_columns`` lists of ``num_boundaries`` sorted floats, e.g. the quantiles of the columns. If set, the outputs are the fraction of the boundaries of the column below the input, in [0, 1], and ``offset`` and ``scale`` are not used.
+
+        - **clip**: None or a tuple ``(min_value, max_value)`` , the outputs are clipped to it, e.g. to bound the values outside of the range seen when computing the statistics.
+    """
+
+    def __init__(self, offset=None, scale=None, boundaries=None, clip=None, **kwargs):
+        if boundaries is None and (offset is None or scale is None):
+            raise ValueError("DenseNormalization needs offset and scale, or boundaries")
+        # lists rather than arrays, so that the config is serializable
+        self.offset = None if offset is None else np.asarray(offset, dtype=float).tolist()
+        self.scale = None if scale is None else np.asarray(scale, dtype=float).tolist()
+        self.boundaries = None if boundaries is None else np.asarray(boundaries, dtype=float).tolist()
+        self.clip = clip
+        super(DenseNormalization, self).__init__(**kwargs)
+
+    def build(self, input_shape):
+        if isinstance(input_shape, list):
+            self.dims = [int(shape[-1]) for shape in input_shape]
+        else:
+            self.dims = None
+        if self.boundaries is not None:
+            boundaries = np.asarray(self.boundaries, dtype=np.float32)
+            self.boundaries_weight = self.add_weight(name='boundaries', shape=boundaries.shape,
+                                                     initializer=Constant(boundaries), trainable=False)
+        else:
+            self.offset_weight = self.add_weight(name='offset', shape=(len(self.offset),),
+                                                 initializer=Constant(np.asarray(self.offset, dtype=np.float32)),
+                                                 trainable=False)
+            # the inverse of the scale, to multiply instead of divide
+            self.inverse_scale = self.add_weight(
+                name='inverse_scale', shape=(len(self.scale),),
+                initializer=Constant(1.0 / np.asarray(self.scale, dtype=np.float32)), trainable=False)
+        super(DenseNormalization, self).build(input_shape)
+
+    def call(self, inputs, **kwargs):
+        # the statistics are float32, the DenseFeat may be float64
+        if self.dims is not None:
+            x = tf.concat([tf.cast(x, tf.float32) for x in inputs], axis=-1)
+        else:
+            x = tf.cast(inputs, tf.float32)
+        if self.boundaries is not None:
+            # one binary search per column over its boundaries
+            ranks = tf.searchsorted(self.boundaries_weight, tf.transpose(x), side='right')
+            outputs = tf.transpose(tf.cast(ranks, tf.float32)) / float(len(self.boundaries[0]))
+        else:
+            outputs = (x - self.offset_weight) * self.inverse_scale
+        if self.clip is not None:
+            outputs = tf.clip_by_value(outputs, self.clip[0], self.clip[1])
+        if self.dims is not None:
+            return tf.split(outputs, self.dims, axis=-1)
+        return outputs
+
+    def compute_output_shape(self, input_shape):
+        return input_shape
+
+    def compute_mask(self, inputs, mask=None):
+        return None if self.dims is None else [None] * len(self.dims)
+
+    def get_config(self, ):
+        config = {'offset': self.offset, 'scale': self.scale, 'boundaries': self.boundaries, 'clip': self.clip}
+        base_config = super(DenseNormalization, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
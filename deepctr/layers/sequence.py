@@ -6,16 +6,17 @@ Author:
 
 """
 
+import warnings
+
 import numpy as np
 import tensorflow as tf
-from tensorflow.python.keras import backend as K
 
 try:
     from tensorflow.python.ops.init_ops import TruncatedNormal, Constant, glorot_uniform_initializer as glorot_uniform
 except ImportError:
     from tensorflow.python.ops.init_ops_v2 import TruncatedNormal, Constant, glorot_uniform
 
-from tensorflow.python.keras.layers import LSTM, Lambda, Layer, Dropout
+from tensorflow.python.keras.layers import LSTM, Layer, Dropout
 
 from .core import LocalActivationUnit
 from .normalization import LayerNormalization
@@ -24,8 +25,8 @@ if tf.__version__ >= '2.0.0':
     from ..contrib.rnn_v2 import dynamic_rnn
 else:
     from ..contrib.rnn import dynamic_rnn
-from ..contrib.utils import QAAttGRUCell, VecAttGRUCell
-from .utils import reduce_sum, reduce_max, div, softmax, reduce_mean
+from ..contrib.utils import ProjectedGRUCell
+from .utils import reduce_sum, reduce_max, div, softmax, reduce_mean, masked_fill, masked_softmax, get_dim
 
 
 class SequencePoolingLayer(Layer):
@@ -57,12 +58,6 @@ class SequencePoolingLayer(Layer):
 
         self.supports_masking = supports_masking
 
-    def build(self, input_shape):
-        if not self.supports_masking:
-            self.seq_len_max = int(input_shape[0][1])
-        super(SequencePoolingLayer, self).build(
-            input_shape)  # Be sure to call this somewhere!
-
     def call(self, seq_value_len_list, mask=None, **kwargs):
         if self.supports_masking:
             if mask is None:
@@ -76,13 +71,10 @@ class SequencePoolingLayer(Layer):
             uiseq_embed_list, user_behavior_length = seq_value_len_list
 
             mask = tf.sequence_mask(user_behavior_length,
-                                    self.seq_len_max, dtype=tf.float32)
+                                    get_dim(uiseq_embed_list), dtype=tf.float32)
             mask = tf.transpose(mask, (0, 2, 1))
 
-        embedding_size = uiseq_embed_list.shape[-1]
-
-        mask = tf.tile(mask, [1, 1, embedding_size])
-
+        # mask is (batch_size, T, 1) and broadcasts over embedding_size
         if self.mode == "max":
             hist = uiseq_embed_list - (1 - mask) * 1e9
             return reduce_max(hist, 1, keep_dims=True)
@@ -136,12 +128,6 @@ class WeightedSequenceLayer(Layer):
         self.weight_normalization = weight_normalization
         self.supports_masking = supports_masking
 
-    def build(self, input_shape):
-        if not self.supports_masking:
-            self.seq_len_max = int(input_shape[0][1])
-        super(WeightedSequenceLayer, self).build(
-            input_shape)  # Be sure to call this somewhere!
-
     def call(self, input_list, mask=None, **kwargs):
         if self.supports_masking:
             if mask is None:
@@ -152,23 +138,19 @@ class WeightedSequenceLayer(Layer):
         else:
             key_input, key_length_input, value_input = input_list
             mask = tf.sequence_mask(key_length_input,
-                                    self.seq_len_max, dtype=tf.bool)
+                                    get_dim(key_input), dtype=tf.bool)
             mask = tf.transpose(mask, (0, 2, 1))
 
-        embedding_size = key_input.shape[-1]
-
         if self.weight_normalization:
-            paddings = tf.ones_like(value_input) * (-2 ** 32 + 1)
+            value_input = masked_fill(value_input, mask, -2 ** 32 + 1)
         else:
-            paddings = tf.zeros_like(value_input)
-        value_input = tf.where(mask, value_input, paddings)
+            value_input = masked_fill(value_input, mask, 0)
 
         if self.weight_normalization:
             value_input = softmax(value_input, dim=1)
 
         if len(value_input.shape) == 2:
             value_input = tf.expand_dims(value_input, axis=2)
-            value_input = tf.tile(value_input, [1, 1, embedding_size])
 
         return tf.multiply(key_input, value_input)
 
@@ -202,6 +184,9 @@ class AttentionSequencePoolingLayer(Layer):
       Output shape
         - 3D tensor with shape: ``(batch_size, 1, embedding_size)``.
 
+      When ``decompose_input=True``, keys and keys_length may also have a batch size of 1 while query has
+      ``n_candidates`` rows. The keys are then shared by every query and the output has ``n_candidates`` rows.
+
       Arguments
         - **att_hidden_units**:list of positive integer, the attention net layer number and units in each layer.
 
@@ -211,18 +196,21 @@ class AttentionSequencePoolingLayer(Layer):
 
         - **supports_masking**:If True,the input need to support masking.
 
+        - **decompose_input**: bool. Whether the local activation unit computes its first linear layer on query and keys separately instead of on their concatenated interactions.
+
       References
         - [Zhou G, Zhu X, Song C, et al. Deep interest network for click-through rate prediction[C]//Proceedings of the 24th ACM SIGKDD International Conference on Knowledge Discovery & Data Mining. ACM, 2018: 1059-1068.](https://arxiv.org/pdf/1706.06978.pdf)
     """
 
     def __init__(self, att_hidden_units=(80, 40), att_activation='sigmoid', weight_normalization=False,
                  return_score=False,
-                 supports_masking=False, **kwargs):
+                 supports_masking=False, decompose_input=False, **kwargs):
 
         self.att_hidden_units = att_hidden_units
         self.att_activation = att_activation
         self.weight_normalization = weight_normalization
         self.return_score = return_score
+        self.decompose_input = decompose_input
         super(AttentionSequencePoolingLayer, self).__init__(**kwargs)
         self.supports_masking = supports_masking
 
@@ -244,7 +232,8 @@ class AttentionSequencePoolingLayer(Layer):
         else:
             pass
         self.local_att = LocalActivationUnit(
-            self.att_hidden_units, self.att_activation, l2_reg=0, dropout_rate=0, use_bn=False, seed=1024, )
+            self.att_hidden_units, self.att_activation, l2_reg=0, dropout_rate=0, use_bn=False, seed=1024,
+            decompose_input=self.decompose_input)
         super(AttentionSequencePoolingLayer, self).build(
             input_shape)  # Be sure to call this somewhere!
 
@@ -260,19 +249,16 @@ class AttentionSequencePoolingLayer(Layer):
         else:
 
             queries, keys, keys_length = inputs
-            hist_len = keys.get_shape()[1]
-            key_masks = tf.sequence_mask(keys_length, hist_len)
+            key_masks = tf.sequence_mask(keys_length, get_dim(keys))
 
         attention_score = self.local_att([queries, keys], training=training)
 
         outputs = tf.transpose(attention_score, (0, 2, 1))
 
         if self.weight_normalization:
-            paddings = tf.ones_like(outputs) * (-2 ** 32 + 1)
+            outputs = masked_fill(outputs, key_masks, -2 ** 32 + 1)
         else:
-            paddings = tf.zeros_like(outputs)
-
-        outputs = tf.where(key_masks, outputs, paddings)
+            outputs = masked_fill(outputs, key_masks, 0)
 
         if self.weight_normalization:
             outputs = softmax(outputs)
@@ -300,7 +286,7 @@ class AttentionSequencePoolingLayer(Layer):
 
         config = {'att_hidden_units': self.att_hidden_units, 'att_activation': self.att_activation,
                   'weight_normalization': self.weight_normalization, 'return_score': self.return_score,
-                  'supports_masking': self.supports_masking}
+                  'supports_masking': self.supports_masking, 'decompose_input': self.decompose_input}
         base_config = super(AttentionSequencePoolingLayer, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
@@ -309,10 +295,11 @@ class BiLSTM(Layer):
     """A multiple layer Bidirectional Residual LSTM Layer.
 
       Input shape
-        - 3D tensor with shape ``(batch_size, timesteps, input_dim)``.
+        - 3D tensor with shape ``(batch_size, timesteps, input_dim)``, optionally with a mask.
+        - or a list of a 3D tensor with shape ``(batch_size, timesteps, input_dim)`` and a 2D tensor with shape ``(batch_size, 1)`` , the length of each sequence.
 
       Output shape
-        - 3D tensor with shape: ``(batch_size, timesteps, units)``.
+        - 3D tensor with shape: ``(batch_size, timesteps, units)``. The outputs after the length of each sequence are zeros.
 
       Arguments
         - **units**: Positive integer, dimensionality of the output space.
@@ -345,32 +332,46 @@ class BiLSTM(Layer):
         self.supports_masking = True
 
     def build(self, input_shape):
-
+        if isinstance(input_shape, list):
+            input_shape = input_shape[0]
         if len(input_shape) != 3:
             raise ValueError(
                 "Unexpected inputs dimensions %d, expect to be 3 dimensions" % (len(input_shape)))
+        # the LSTMs run as a loop over the time steps instead of being unrolled, the backward direction reverses each
+        # sequence within its length so that it starts at the last valid step
         self.fw_lstm = []
         self.bw_lstm = []
         for _ in range(self.layers):
             self.fw_lstm.append(
-                LSTM(self.units, dropout=self.dropout_rate, bias_initializer='ones', return_sequences=True,
-                     unroll=True))
+                LSTM(self.units, dropout=self.dropout_rate, bias_initializer='ones', return_sequences=True))
             self.bw_lstm.append(
-                LSTM(self.units, dropout=self.dropout_rate, bias_initializer='ones', return_sequences=True,
-                     go_backwards=True, unroll=True))
+                LSTM(self.units, dropout=self.dropout_rate, bias_initializer='ones', return_sequences=True))
 
         super(BiLSTM, self).build(
             input_shape)  # Be sure to call this somewhere!
 
-    def call(self, inputs, mask=None, **kwargs):
+    def call(self, inputs, mask=None, training=None, **kwargs):
+
+        if isinstance(inputs, list):
+            inputs, lengths = inputs
+            lengths = tf.reshape(tf.cast(lengths, tf.int32), [-1])
+        elif mask is not None:
+            lengths = tf.reduce_sum(tf.cast(mask, tf.int32), axis=-1)
+        else:
+            lengths = tf.fill([tf.shape(inputs)[0]], tf.shape(inputs)[1])
+        seq_len = get_dim(inputs)
+
+        # the steps after the longest sequence of the batch are not computed
+        max_len = tf.maximum(tf.reduce_max(lengths), 1)
+        lengths = tf.minimum(lengths, max_len)
+        inputs = inputs[:, :max_len]
+        step_mask = tf.sequence_mask(lengths, max_len)
 
         input_fw = inputs
-        input_bw = inputs
+        input_bw = tf.reverse_sequence(inputs, lengths, seq_axis=1, batch_axis=0)
         for i in range(self.layers):
-            output_fw = self.fw_lstm[i](input_fw)
-            output_bw = self.bw_lstm[i](input_bw)
-            output_bw = Lambda(lambda x: K.reverse(
-                x, 1), mask=lambda inputs, mask: mask)(output_bw)
+            output_fw = self.fw_lstm[i](input_fw, mask=step_mask, training=training)
+            output_bw = self.bw_lstm[i](input_bw, mask=step_mask, training=training)
 
             if i >= self.layers - self.res_layers:
                 output_fw += input_fw
@@ -378,8 +379,9 @@ class BiLSTM(Layer):
             input_fw = output_fw
             input_bw = output_bw
 
-        output_fw = input_fw
-        output_bw = input_bw
+        step_mask = tf.expand_dims(tf.cast(step_mask, tf.float32), axis=-1)
+        output_fw = input_fw * step_mask
+        output_bw = tf.reverse_sequence(input_bw, lengths, seq_axis=1, batch_axis=0) * step_mask
 
         if self.merge_mode == "fw":
             output = output_fw
@@ -396,10 +398,19 @@ class BiLSTM(Layer):
         elif self.merge_mode is None:
             output = [output_fw, output_bw]
 
-        return output
+        def pad(x):
+            x = tf.pad(x, [[0, 0], [0, seq_len - max_len], [0, 0]])
+            x.set_shape([None, seq_len if isinstance(seq_len, int) else None, x.get_shape()[-1]])
+            return x
+
+        if isinstance(output, list):
+            return [pad(x) for x in output]
+        return pad(output)
 
     def compute_output_shape(self, input_shape):
-        print(self.merge_mode)
+        if isinstance(input_shape, list):
+            input_shape = input_shape[0]
+        input_shape = tuple(input_shape[:-1]) + (self.units,)
         if self.merge_mode is None:
             return [input_shape, input_shape]
         elif self.merge_mode == 'concat':
@@ -408,6 +419,8 @@ class BiLSTM(Layer):
             return input_shape
 
     def compute_mask(self, inputs, mask):
+        if isinstance(inputs, list):
+            return None
         return mask
 
     def get_config(self, ):
@@ -424,10 +437,12 @@ class Transformer(Layer):
       Input shape
         - a list of two 3D tensor with shape ``(batch_size, timesteps, input_dim)`` if ``supports_masking=True`` .
         - a list of two 4 tensors, first two tensors with shape ``(batch_size, timesteps, input_dim)``,last two tensors with shape ``(batch_size, 1)`` if ``supports_masking=False`` .
+        - the inputs may also be packed groups of sequences, e.g. sessions, with shapes ``(batch_size, n, timesteps, input_dim)`` and ``(batch_size, n, 1)`` . All ``batch_size * n`` sequences go through one self-attention call.
 
 
       Output shape
         - 3D tensor with shape: ``(batch_size, 1, input_dim)``  if ``output_type='mean'`` or ``output_type='sum'`` , else  ``(batch_size, timesteps, input_dim)`` .
+        - 4D tensor with shape ``(batch_size, n, 1, input_dim)`` or ``(batch_size, n, timesteps, input_dim)`` for packed inputs.
 
 
       Arguments
@@ -441,8 +456,11 @@ class Transformer(Layer):
             - **blinding**: bool. Whether or not use blinding.
             - **seed**: A Python integer to use as random seed.
             - **supports_masking**:bool. Whether or not support masking.
-            - **attention_type**: str, Type of attention, the value must be one of { ``'scaled_dot_product'`` , ``'cos'`` , ``'ln'`` , ``'additive'`` }.
+            - **attention_type**: str, Type of attention, the value must be one of { ``'scaled_dot_product'`` , ``'cos'`` , ``'ln'`` , ``'additive'`` , ``'local'`` , ``'linear'`` , ``'memory'`` }. ``'local'`` restricts each query to the keys at most ``window_size`` positions away, ``'linear'`` uses the ``elu(x) + 1`` kernel feature map instead of the softmax, and ``'memory'`` attends to ``memory_size`` slots mean pooled from contiguous segments of the keys, so that their cost grows linearly with ``timesteps``. ``blinding`` is ignored by ``'memory'`` and ``'linear'`` ignores ``dropout_rate`` for the attention weights.
             - **output_type**: ``'mean'`` , ``'sum'`` or `None`. Whether or not use average/sum pooling for output.
+            - **window_size**: int. The number of positions on each side a query can attend to if ``attention_type='local'``.
+            - **memory_size**: int. The number of memory slots if ``attention_type='memory'``.
+            - **query_chunk_size**: int or None. If set, the attention scores are computed in a sequential loop over chunks of at most ``query_chunk_size`` queries, which bounds the ``(batch_size, head_num, timesteps, timesteps)`` score tensor of the forward pass to ``(batch_size, head_num, query_chunk_size, timesteps)`` for long sequences. The backward pass still keeps the scores of all the chunks.
 
       References
             - [Vaswani, Ashish, et al. "Attention is all you need." Advances in Neural Information Processing Systems. 2017.](https://papers.nips.cc/paper/7181-attention-is-all-you-need.pdf)
@@ -450,9 +468,14 @@ class Transformer(Layer):
 
     def __init__(self, att_embedding_size=1, head_num=8, dropout_rate=0.0, use_positional_encoding=True, use_res=True,
                  use_feed_forward=True, use_layer_norm=False, blinding=True, seed=1024, supports_masking=False,
-                 attention_type="scaled_dot_product", output_type="mean", **kwargs):
+                 attention_type="scaled_dot_product", output_type="mean", window_size=32, memory_size=32,
+                 query_chunk_size=None, **kwargs):
         if head_num <= 0:
             raise ValueError('head_num must be a int > 0')
+        if window_size < 0 or memory_size <= 0:
+            raise ValueError('window_size must be a int >= 0 and memory_size must be a int > 0')
+        if query_chunk_size is not None and query_chunk_size <= 0:
+            raise ValueError('query_chunk_size must be a int > 0 or None')
         self.att_embedding_size = att_embedding_size
         self.head_num = head_num
         self.num_units = att_embedding_size * head_num
@@ -465,6 +488,9 @@ class Transformer(Layer):
         self.blinding = blinding
         self.attention_type = attention_type
         self.output_type = output_type
+        self.window_size = window_size
+        self.memory_size = memory_size
+        self.query_chunk_size = query_chunk_size
         super(Transformer, self).__init__(**kwargs)
         self.supports_masking = supports_masking
 
@@ -474,7 +500,6 @@ class Transformer(Layer):
             raise ValueError(
                 "att_embedding_size * head_num must equal the last dimension size of inputs,got %d * %d != %d" % (
                     self.att_embedding_size, self.head_num, embedding_size))
-        self.seq_len_max = int(input_shape[0][-2])
         self.W_Query = self.add_weight(name='query', shape=[embedding_size, self.att_embedding_size * self.head_num],
                                        dtype=tf.float32,
                                        initializer=TruncatedNormal(seed=self.seed))
@@ -505,13 +530,19 @@ class Transformer(Layer):
             self.dropout_rate, seed=self.seed)
         self.ln = LayerNormalization()
         if self.use_positional_encoding:
-            self.query_pe = PositionEncoding()
-            self.key_pe = PositionEncoding()
+            # variable length sequences can only use the fixed sinusoid encoding
+            self.query_pe = PositionEncoding(
+                pos_embedding_trainable=tf.TensorShape(input_shape[0]).as_list()[-2] is not None)
+            self.key_pe = PositionEncoding(
+                pos_embedding_trainable=tf.TensorShape(input_shape[1]).as_list()[-2] is not None)
         # Be sure to call this somewhere!
         super(Transformer, self).build(input_shape)
 
     def call(self, inputs, mask=None, training=None, **kwargs):
 
+        if len(inputs[0].get_shape()) == 4:
+            return self._packed_call(inputs, mask=mask, training=training)
+
         if self.supports_masking:
             queries, keys = inputs
             query_masks, key_masks = mask
@@ -521,9 +552,9 @@ class Transformer(Layer):
             queries, keys, query_masks, key_masks = inputs
 
             query_masks = tf.sequence_mask(
-                query_masks, self.seq_len_max, dtype=tf.float32)
+                query_masks, get_dim(queries), dtype=tf.float32)
             key_masks = tf.sequence_mask(
-                key_masks, self.seq_len_max, dtype=tf.float32)
+                key_masks, get_dim(keys), dtype=tf.float32)
             query_masks = tf.squeeze(query_masks, axis=1)
             key_masks = tf.squeeze(key_masks, axis=1)
 
@@ -536,71 +567,39 @@ class Transformer(Layer):
         K = tf.tensordot(keys, self.W_key, axes=(-1, 0))
         V = tf.tensordot(keys, self.W_Value, axes=(-1, 0))
 
-        # h*N T_q D
-        Q_ = tf.concat(tf.split(Q, self.head_num, axis=2), axis=0)
-        K_ = tf.concat(tf.split(K, self.head_num, axis=2), axis=0)
-        V_ = tf.concat(tf.split(V, self.head_num, axis=2), axis=0)
-
-        if self.attention_type == "scaled_dot_product":
-            # h*N T_q T_k
-            outputs = tf.matmul(Q_, K_, transpose_b=True)
-
-            outputs = outputs / (K_.get_shape().as_list()[-1] ** 0.5)
-        elif self.attention_type == "cos":
-            Q_cos = tf.nn.l2_normalize(Q_, dim=-1)
-            K_cos = tf.nn.l2_normalize(K_, dim=-1)
-
-            outputs = tf.matmul(Q_cos, K_cos, transpose_b=True)  # h*N T_q T_k
+        # N h T_q D
+        Q_ = self._split_heads(Q)
+        K_ = self._split_heads(K)
+        V_ = self._split_heads(V)
 
-            outputs = outputs * 20  # Scale
-        elif self.attention_type == 'ln':
+        if self.attention_type == 'ln':
             Q_ = self.att_ln_q(Q_)
             K_ = self.att_ln_k(K_)
 
-            outputs = tf.matmul(Q_, K_, transpose_b=True)  # h*N T_q T_k
-            # Scale
-            outputs = outputs / (K_.get_shape().as_list()[-1] ** 0.5)
-        elif self.attention_type == "additive":
-            Q_reshaped = tf.expand_dims(Q_, axis=-2)
-            K_reshaped = tf.expand_dims(K_, axis=-3)
-            outputs = tf.tanh(tf.nn.bias_add(Q_reshaped + K_reshaped, self.b))
-            outputs = tf.squeeze(tf.tensordot(outputs, tf.expand_dims(self.v, axis=-1), axes=[-1, 0]), axis=-1)
+        if self.attention_type == 'linear':
+            result = self._linear_attention(Q_, K_, V_, key_masks, query_masks)
         else:
-            raise ValueError("attention_type must be [scaled_dot_product,cos,ln,additive]")
-
-        key_masks = tf.tile(key_masks, [self.head_num, 1])
-
-        # (h*N, T_q, T_k)
-        key_masks = tf.tile(tf.expand_dims(key_masks, 1),
-                            [1, tf.shape(queries)[1], 1])
-
-        paddings = tf.ones_like(outputs) * (-2 ** 32 + 1)
-
-        # (h*N, T_q, T_k)
-
-        outputs = tf.where(tf.equal(key_masks, 1), outputs, paddings, )
-        if self.blinding:
-            try:
-                outputs = tf.matrix_set_diag(outputs, tf.ones_like(outputs)[
-                                                      :, :, 0] * (-2 ** 32 + 1))
-            except AttributeError:
-                outputs = tf.compat.v1.matrix_set_diag(outputs, tf.ones_like(outputs)[
-                                                                :, :, 0] * (-2 ** 32 + 1))
-
-        outputs -= reduce_max(outputs, axis=-1, keep_dims=True)
-        outputs = softmax(outputs)
-        query_masks = tf.tile(query_masks, [self.head_num, 1])  # (h*N, T_q)
-        # (h*N, T_q, T_k)
-        query_masks = tf.tile(tf.expand_dims(
-            query_masks, -1), [1, 1, tf.shape(keys)[1]])
-
-        outputs *= query_masks
-
-        outputs = self.dropout(outputs, training=training)
-        # Weighted sum
-        # ( h*N, T_q, C/h)
-        result = tf.matmul(outputs, V_)
-        result = tf.concat(tf.split(result, self.head_num, axis=0), axis=2)
+            blinding = self.blinding
+            if self.attention_type == 'memory':
+                K_, V_, key_masks = self._pool_memory(K_, V_, key_masks)
+                blinding = False
+
+            # (N, 1, 1, T_k) and (N, 1, T_q, 1), broadcast over heads and positions
+            key_masks = tf.expand_dims(tf.expand_dims(key_masks, 1), 1)
+            query_masks = tf.expand_dims(tf.expand_dims(query_masks, 1), -1)
+
+            chunk_size = self.query_chunk_size
+            if self.attention_type == 'local' and chunk_size is None:
+                chunk_size = max(self.window_size, 1)
+            seq_len_q = Q_.get_shape().as_list()[2]
+            if chunk_size is None or seq_len_q is None or chunk_size >= seq_len_q:
+                result = self._attention(Q_, K_, V_, key_masks, query_masks, 0, 0, blinding, training=training)
+            else:
+                result = self._chunked_attention(Q_, K_, V_, key_masks, query_masks, chunk_size, seq_len_q,
+                                                 blinding, training=training)
+
+        # N T_q D*h
+        result = self._merge_heads(result)
 
         if self.use_res:
             # tf.tensordot(queries, self.W_Res, axes=(-1, 0))
@@ -624,6 +623,135 @@ class Transformer(Layer):
         else:
             return result
 
+    def _packed_call(self, inputs, mask=None, training=None):
+        # (batch_size, n, ...) -> (batch_size * n, ...)
+        def flatten(x):
+            return tf.reshape(x, [-1] + [get_dim(x, i) for i in range(2, len(x.get_shape()))])
+
+        queries = inputs[0]
+        result = self.call([flatten(x) for x in inputs], mask=None if mask is None else [flatten(m) for m in mask],
+                           training=training)
+        return tf.reshape(result, [-1, get_dim(queries), get_dim(result), self.num_units])
+
+    def _split_heads(self, x):
+        x = tf.reshape(x, [-1, tf.shape(x)[1], self.head_num, self.att_embedding_size])
+        return tf.transpose(x, [0, 2, 1, 3])
+
+    def _merge_heads(self, x):
+        x = tf.transpose(x, [0, 2, 1, 3])
+        return tf.reshape(x, [-1, tf.shape(x)[1], self.num_units])
+
+    def _chunked_attention(self, Q_, K_, V_, key_masks, query_masks, chunk_size, seq_len_q, blinding, training=None):
+        # the chunks are computed one after the other in a loop, so that only the (N, h, chunk_size, T_k) score tensor
+        # of the current chunk is alive in the forward pass
+        num_chunks = (seq_len_q + chunk_size - 1) // chunk_size
+        padding = num_chunks * chunk_size - seq_len_q
+        Q_ = tf.pad(Q_, [[0, 0], [0, 0], [0, padding], [0, 0]])
+        query_masks = tf.pad(query_masks, [[0, 0], [0, 0], [0, padding], [0, 0]])
+        if self.attention_type == 'local':
+            # only the chunk_size + 2 * window_size keys around a chunk can be attended to, the keys are padded so
+            # that this window has the same size for every chunk
+            window = self.window_size
+            key_padding = [window, tf.maximum(num_chunks * chunk_size + window - tf.shape(K_)[2], 0)]
+            K_ = tf.pad(K_, [[0, 0], [0, 0], key_padding, [0, 0]])
+            V_ = tf.pad(V_, [[0, 0], [0, 0], key_padding, [0, 0]])
+            key_masks = tf.pad(key_masks, [[0, 0], [0, 0], [0, 0], key_padding])
+
+        def chunk_attention(i):
+            start = i * chunk_size
+            query_slice = slice(start, start + chunk_size)
+            if self.attention_type == 'local':
+                key_slice, key_offset = slice(start, start + chunk_size + 2 * window), start - window
+            else:
+                key_slice, key_offset = slice(None), 0
+            return self._attention(Q_[:, :, query_slice], K_[:, :, key_slice], V_[:, :, key_slice],
+                                   key_masks[:, :, :, key_slice], query_masks[:, :, query_slice], start, key_offset,
+                                   blinding, training=training)
+
+        # (num_chunks, N, h, chunk_size, D) -> (N, h, T_q, D)
+        result = tf.map_fn(chunk_attention, tf.range(num_chunks), dtype=tf.float32, parallel_iterations=1)
+        result = tf.transpose(result, [1, 2, 0, 3, 4])
+        result = tf.reshape(result, [-1, self.head_num, num_chunks * chunk_size, self.att_embedding_size])
+        return result[:, :, :seq_len_q]
+
+    def _attention(self, Q_, K_, V_, key_masks, query_masks, query_offset, key_offset, blinding, training=None):
+        if self.attention_type in ("scaled_dot_product", "ln", "local", "memory"):
+            # N h T_q T_k
+            outputs = tf.matmul(Q_, K_, transpose_b=True)
+
+            outputs = outputs / (self.att_embedding_size ** 0.5)
+        elif self.attention_type == "cos":
+            Q_cos = tf.nn.l2_normalize(Q_, dim=-1)
+            K_cos = tf.nn.l2_normalize(K_, dim=-1)
+
+            outputs = tf.matmul(Q_cos, K_cos, transpose_b=True)  # N h T_q T_k
+
+            outputs = outputs * 20  # Scale
+        elif self.attention_type == "additive":
+            Q_reshaped = tf.expand_dims(Q_, axis=-2)
+            K_reshaped = tf.expand_dims(K_, axis=-3)
+            outputs = tf.tanh(tf.nn.bias_add(Q_reshaped + K_reshaped, self.b))
+            outputs = tf.squeeze(tf.tensordot(outputs, tf.expand_dims(self.v, axis=-1), axes=[-1, 0]), axis=-1)
+        else:
+            raise ValueError("attention_type must be [scaled_dot_product,cos,ln,additive,local,linear,memory]")
+
+        # absolute positions of the queries and keys of this chunk
+        query_pos = tf.range(query_offset, query_offset + tf.shape(Q_)[2])
+        key_pos = tf.range(key_offset, key_offset + tf.shape(K_)[2])
+        if self.attention_type == "local":
+            band = tf.abs(tf.expand_dims(query_pos, 1) - tf.expand_dims(key_pos, 0)) <= self.window_size
+            key_masks = key_masks * tf.cast(band, tf.float32)
+        if blinding:
+            # rows query_offset, query_offset + 1, ... of the (T_q, T_k) identity matrix
+            diag = tf.one_hot(query_pos - key_offset, tf.shape(K_)[2])
+            key_masks = key_masks * (1 - diag)
+
+        outputs = masked_softmax(outputs, key_masks)
+        if self.attention_type == "local":
+            # queries without any valid key in their window attend to nothing
+            query_masks = query_masks * reduce_max(key_masks, axis=-1, keep_dims=True)
+        outputs *= query_masks
+
+        outputs = self.dropout(outputs, training=training)
+        # Weighted sum
+        # ( N, h, T_q, C/h)
+        return tf.matmul(outputs, V_)
+
+    def _linear_attention(self, Q_, K_, V_, key_masks, query_masks):
+        # elu(x) + 1 feature map, softmax(QK^T)V is approximated by phi(Q)(phi(K)^T V) in O(T * D^2)
+        Q_ = tf.nn.elu(Q_) + 1
+        K_ = (tf.nn.elu(K_) + 1) * tf.expand_dims(tf.expand_dims(key_masks, 1), -1)
+        # (N, h, T_q, D) and (N, h, T_q, 1)
+        numerator = tf.matmul(Q_, tf.matmul(K_, V_, transpose_a=True))
+        denominator = tf.matmul(Q_, reduce_sum(K_, axis=2, keep_dims=True), transpose_b=True)
+        key_count = reduce_sum(key_masks, axis=-1, keep_dims=True)
+        if self.blinding:
+            # remove the contribution of the key at the same position as the query
+            self_weights = reduce_sum(Q_ * K_, axis=-1, keep_dims=True)
+            numerator -= self_weights * V_
+            denominator -= self_weights
+            key_count -= key_masks
+        # queries without any key to attend to output zeros
+        has_keys = tf.cast(tf.expand_dims(tf.expand_dims(key_count, 1), -1) > 0, tf.float32)
+        outputs = numerator / (denominator + 1 - has_keys) * has_keys
+        return outputs * tf.expand_dims(tf.expand_dims(query_masks, 1), -1)
+
+    def _pool_memory(self, K_, V_, key_masks):
+        # mean pool the valid keys and values of memory_size contiguous segments into memory slots
+        seq_len = tf.shape(K_)[2]
+        slot_len = (seq_len + self.memory_size - 1) // self.memory_size
+        padding = slot_len * self.memory_size - seq_len
+        key_masks = tf.reshape(tf.pad(key_masks, [[0, 0], [0, padding]]), [-1, self.memory_size, slot_len])
+        slot_masks = tf.expand_dims(tf.expand_dims(key_masks, 1), -1)
+        slot_count = tf.maximum(reduce_sum(slot_masks, axis=3), 1)
+
+        def pool(x):
+            x = tf.pad(x, [[0, 0], [0, 0], [0, padding], [0, 0]])
+            x = tf.reshape(x, [-1, self.head_num, self.memory_size, slot_len, self.att_embedding_size])
+            return reduce_sum(x * slot_masks, axis=3) / slot_count
+
+        return pool(K_), pool(V_), tf.cast(reduce_sum(key_masks, axis=-1) > 0, tf.float32)
+
     def compute_output_shape(self, input_shape):
 
         return (None, 1, self.att_embedding_size * self.head_num)
@@ -636,7 +764,9 @@ class Transformer(Layer):
                   'dropout_rate': self.dropout_rate, 'use_res': self.use_res,
                   'use_positional_encoding': self.use_positional_encoding, 'use_feed_forward': self.use_feed_forward,
                   'use_layer_norm': self.use_layer_norm, 'seed': self.seed, 'supports_masking': self.supports_masking,
-                  'blinding': self.blinding, 'attention_type': self.attention_type, 'output_type': self.output_type}
+                  'blinding': self.blinding, 'attention_type': self.attention_type, 'output_type': self.output_type,
+                  'window_size': self.window_size, 'memory_size': self.memory_size,
+                  'query_chunk_size': self.query_chunk_size}
         base_config = super(Transformer, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
@@ -653,6 +783,14 @@ class PositionEncoding(Layer):
     def build(self, input_shape):
         # Create a trainable weight variable for this layer.
         _, T, num_units = input_shape.as_list()  # inputs.get_shape().as_list()
+        if T is None:
+            # variable length sequences use the fixed sinusoid encoding computed in call
+            if self.pos_embedding_trainable:
+                warnings.warn("PositionEncoding of variable length sequences uses the fixed sinusoid encoding, "
+                              "pos_embedding_trainable=True is ignored. Set a maxlen to train the encoding.")
+            self.lookup_table = None
+            super(PositionEncoding, self).build(input_shape)
+            return
         # First part of the PE function: sin and cos argument
         position_enc = np.array([
             [pos / np.power(10000, 2. * (i // 2) / num_units) for i in range(num_units)]
@@ -672,12 +810,25 @@ class PositionEncoding(Layer):
 
     def call(self, inputs, mask=None):
         _, T, num_units = inputs.get_shape().as_list()
-        position_ind = tf.expand_dims(tf.range(T), 0)
-        outputs = tf.nn.embedding_lookup(self.lookup_table, position_ind)
+        if self.lookup_table is None:
+            outputs = tf.expand_dims(self._sinusoid_encoding(tf.shape(inputs)[1], num_units), 0)
+        else:
+            position_ind = tf.expand_dims(tf.range(T), 0)
+            outputs = tf.nn.embedding_lookup(self.lookup_table, position_ind)
         if self.scale:
             outputs = outputs * num_units ** 0.5
         return outputs + inputs
 
+    def _sinusoid_encoding(self, T, num_units):
+        position = tf.cast(tf.expand_dims(tf.range(T), 1), tf.float32)
+        position_enc = position / np.power(10000, 2. * (np.arange(num_units) // 2) / num_units).astype(np.float32)
+        # sin for dim 2i and cos for dim 2i+1
+        even = (np.arange(num_units) % 2 == 0).astype(np.float32)
+        position_enc = tf.sin(position_enc) * even + tf.cos(position_enc) * (1 - even)
+        if self.zero_pad:
+            position_enc *= tf.cast(position > 0, tf.float32)
+        return position_enc
+
     def compute_output_shape(self, input_shape):
 
         return input_shape
@@ -702,16 +853,10 @@ class BiasEncoding(Layer):
     def build(self, input_shape):
         # Create a trainable weight variable for this layer.
 
-        if self.sess_max_count == 1:
-            embed_size = input_shape[2].value
-            seq_len_max = input_shape[1].value
-        else:
-            try:
-                embed_size = input_shape[0][2].value
-                seq_len_max = input_shape[0][1].value
-            except AttributeError:
-                embed_size = input_shape[0][2]
-                seq_len_max = input_shape[0][1]
+        if isinstance(input_shape, list):
+            input_shape = input_shape[0]
+        # (batch_size, sess_max_count, seq_len_max, embed_size) if packed, else (batch_size, seq_len_max, embed_size)
+        seq_len_max, embed_size = tf.TensorShape(input_shape).as_list()[-2:]
 
         self.sess_bias_embedding = self.add_weight('sess_bias_embedding', shape=(self.sess_max_count, 1, 1),
                                                    initializer=TruncatedNormal(
@@ -731,10 +876,13 @@ class BiasEncoding(Layer):
         :param concated_embeds_value: None * field_size * embedding_size
         :return: None*1
         """
+        bias = self.item_bias_embedding + self.seq_bias_embedding
+        if not isinstance(inputs, list):
+            # packed sessions, the (sess_max_count, 1, 1) session bias broadcasts over the sessions axis
+            return inputs + bias + self.sess_bias_embedding
         transformer_out = []
         for i in range(self.sess_max_count):
-            transformer_out.append(
-                inputs[i] + self.item_bias_embedding + self.seq_bias_embedding + self.sess_bias_embedding[i])
+            transformer_out.append(inputs[i] + bias + self.sess_bias_embedding[i])
         return transformer_out
 
     def compute_output_shape(self, input_shape):
@@ -764,15 +912,20 @@ class DynamicGRU(Layer):
         input_seq_shape = input_shape[0]
         if self.num_units is None:
             self.num_units = input_seq_shape.as_list()[-1]
-        if self.gru_type == "AGRU":
-            self.gru_cell = QAAttGRUCell(self.num_units)
-        elif self.gru_type == "AUGRU":
-            self.gru_cell = VecAttGRUCell(self.num_units)
-        else:
-            try:
-                self.gru_cell = tf.nn.rnn_cell.GRUCell(self.num_units)  # GRUCell
-            except AttributeError:
-                self.gru_cell = tf.compat.v1.nn.rnn_cell.GRUCell(self.num_units)
+        input_size = int(input_seq_shape[-1])
+        # same variables as GRUCell/QAAttGRUCell/VecAttGRUCell: the first input_size rows of each kernel project the
+        # inputs and the remaining num_units rows the state
+        prefix = 'gru_cell/' if self.gru_type in ("GRU", "AIGRU") else ''
+        self.gate_kernel = self.add_weight(name=prefix + 'gates/kernel',
+                                           shape=[input_size + self.num_units, 2 * self.num_units],
+                                           initializer=glorot_uniform())
+        self.gate_bias = self.add_weight(name=prefix + 'gates/bias', shape=[2 * self.num_units],
+                                         initializer=Constant(1.0))
+        self.candidate_kernel = self.add_weight(name=prefix + 'candidate/kernel',
+                                                shape=[input_size + self.num_units, self.num_units],
+                                                initializer=glorot_uniform())
+        self.candidate_bias = self.add_weight(name=prefix + 'candidate/bias', shape=[self.num_units],
+                                              initializer=Constant(0.0))
 
         # Be sure to call this somewhere!
         super(DynamicGRU, self).build(input_shape)
@@ -783,14 +936,27 @@ class DynamicGRU(Layer):
         :return: None*1
         """
         if self.gru_type == "GRU" or self.gru_type == "AIGRU":
-            rnn_input, sequence_length = input_list
+            rnn_input, sequence_length = input_list[:2]
             att_score = None
+            initial_state = input_list[2:]
         else:
-            rnn_input, sequence_length, att_score = input_list
-
-        rnn_output, hidden_state = dynamic_rnn(self.gru_cell, inputs=rnn_input, att_scores=att_score,
-                                               sequence_length=tf.squeeze(sequence_length,
-                                                                          ), dtype=tf.float32, scope=self.name)
+            rnn_input, sequence_length, att_score = input_list[:3]
+            initial_state = input_list[3:]
+        # an optional trailing input with shape (batch_size, num_units) continues the recurrence from a previous state
+        initial_state = tf.reshape(initial_state[0], [-1, self.num_units]) if initial_state else None
+
+        # the input-to-hidden projections of all steps in one matmul, the recurrent loop only multiplies the state
+        input_size = int(rnn_input.get_shape()[-1])
+        input_kernel = tf.concat([self.gate_kernel[:input_size], self.candidate_kernel[:input_size]], axis=1)
+        input_bias = tf.concat([self.gate_bias, self.candidate_bias], axis=0)
+        projected_input = tf.nn.bias_add(tf.tensordot(rnn_input, input_kernel, axes=(-1, 0)), input_bias)
+        gru_cell = ProjectedGRUCell(self.num_units, self.gate_kernel[input_size:],
+                                    self.candidate_kernel[input_size:],
+                                    gru_type="GRU" if self.gru_type == "AIGRU" else self.gru_type)
+
+        rnn_output, hidden_state = dynamic_rnn(gru_cell, inputs=projected_input, att_scores=att_score,
+                                               sequence_length=tf.squeeze(sequence_length, axis=-1),
+                                               initial_state=initial_state, dtype=tf.float32, scope=self.name)
         if self.return_sequence:
             return rnn_output
         else:
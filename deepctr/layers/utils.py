@@ -310,6 +310,53 @@ def softmax(logits, dim=-1, name=None):
         return tf.nn.softmax(logits, axis=dim, name=name)
 
 
+def get_dim(inputs, axis=1):
+    """Static size of ``axis`` of ``inputs`` if it is known, else its dynamic size, e.g. for sequences padded per batch."""
+    dim = inputs.get_shape().as_list()[axis]
+    return dim if dim is not None else tf.shape(inputs)[axis]
+
+
+def masked_fill(inputs, mask, value):
+    """Keep ``inputs`` where ``mask`` is true and fill ``value`` elsewhere.
+
+    ``mask`` only needs to be broadcastable to ``inputs``, so no padding tensor of the full input shape is built.
+    """
+    mask = tf.cast(mask, inputs.dtype)
+    return inputs * mask + (1 - mask) * value
+
+
+def masked_softmax(logits, mask, dim=-1):
+    """Softmax over ``dim`` in which the positions where ``mask`` is false get (almost) zero weight."""
+    return softmax(masked_fill(logits, mask, -2 ** 32 + 1), dim=dim)
+
+
+class BroadcastToBatch(Layer):
+    """Repeats a tensor with batch size 1 along the batch axis to the batch size of a reference tensor.
+    Tensors which already have the batch size of the reference tensor are returned unchanged.
+
+      Input shape
+        - A list of two tensors ``[inputs, reference]`` where ``inputs`` has a batch size of 1 or the same batch size as ``reference``.
+
+      Output shape
+        - Tensor with the shape of ``inputs`` and the batch size of ``reference``.
+    """
+
+    def __init__(self, **kwargs):
+        super(BroadcastToBatch, self).__init__(**kwargs)
+
+    def call(self, inputs, **kwargs):
+        x, reference = inputs
+        multiples = tf.concat([tf.shape(reference)[:1] // tf.shape(x)[:1],
+                               tf.ones([tf.rank(x) - 1], dtype=tf.int32)], axis=0)
+        return tf.tile(x, multiples)
+
+    def compute_output_shape(self, input_shape):
+        return input_shape[0]
+
+    def compute_mask(self, inputs, mask=None):
+        return None
+
+
 class _Add(Layer):
     def __init__(self, **kwargs):
         super(_Add, self).__init__(**kwargs)
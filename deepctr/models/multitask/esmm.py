@@ -18,7 +18,7 @@ from ...layers.utils import combined_dnn_input
 
 def ESMM(dnn_feature_columns, tower_dnn_hidden_units=(256, 128, 64), l2_reg_embedding=0.00001, l2_reg_dnn=0,
          seed=1024, dnn_dropout=0, dnn_activation='relu', dnn_use_bn=False, task_types=('binary', 'binary'),
-         task_names=('ctr', 'ctcvr')):
+         task_names=('ctr', 'ctcvr'), output_task_names=None):
     """Instantiates the Entire Space Multi-Task Model architecture.
 
     :param dnn_feature_columns: An iterable containing all the features used by deep part of the model.
@@ -31,6 +31,7 @@ def ESMM(dnn_feature_columns, tower_dnn_hidden_units=(256, 128, 64), l2_reg_embe
     :param dnn_use_bn: bool. Whether use BatchNormalization before activation or not in DNN
     :param task_types:  str, indicating the loss of each tasks, ``"binary"`` for  binary logloss or  ``"regression"`` for regression loss.
     :param task_names: list of str, indicating the predict target of each tasks. default value is ['ctr', 'ctcvr']
+    :param output_task_names: list of str or None, a subset of ``task_names``. If set, the model only outputs these tasks, and the CVR tower is only computed for the CTCVR task. The weighted layers are named as in the model with all tasks, so its trained weights can be loaded with ``model.load_weights(filepath, by_name=True)`` .
 
     :return: A Keras model instance.
     """
@@ -40,6 +41,10 @@ def ESMM(dnn_feature_columns, tower_dnn_hidden_units=(256, 128, 64), l2_reg_embe
     for task_type in task_types:
         if task_type != 'binary':
             raise ValueError("task must be binary in ESMM, {} is illegal".format(task_type))
+    if output_task_names is None:
+        output_task_names = task_names
+    if not set(output_task_names) <= set(task_names):
+        raise ValueError("output_task_names must be a subset of task_names")
 
     features = build_input_features(dnn_feature_columns)
     inputs_list = list(features.values())
@@ -49,18 +54,21 @@ def ESMM(dnn_feature_columns, tower_dnn_hidden_units=(256, 128, 64), l2_reg_embe
 
     dnn_input = combined_dnn_input(sparse_embedding_list, dense_value_list)
 
-    ctr_output = DNN(tower_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn, seed=seed)(
-        dnn_input)
-    cvr_output = DNN(tower_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn, seed=seed)(
-        dnn_input)
-
-    ctr_logit = Dense(1, use_bias=False)(ctr_output)
-    cvr_logit = Dense(1, use_bias=False)(cvr_output)
-
+    ctr_output = DNN(tower_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn, seed=seed,
+                     name='tower_' + task_names[0])(dnn_input)
+    ctr_logit = Dense(1, use_bias=False, name='logit_' + task_names[0])(ctr_output)
     ctr_pred = PredictionLayer('binary', name=task_names[0])(ctr_logit)
-    cvr_pred = PredictionLayer('binary')(cvr_logit)
+    outputs = [ctr_pred] if task_names[0] in output_task_names else []
+
+    # the CTCVR task needs both towers, the CTR task only its own
+    if task_names[1] in output_task_names:
+        cvr_output = DNN(tower_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn, seed=seed,
+                         name='tower_' + task_names[1])(dnn_input)
+        cvr_logit = Dense(1, use_bias=False, name='logit_' + task_names[1])(cvr_output)
+        cvr_pred = PredictionLayer('binary', name='prediction_' + task_names[1])(cvr_logit)
 
-    ctcvr_pred = Multiply(name=task_names[1])([ctr_pred, cvr_pred])  # CTCVR = CTR * CVR
+        ctcvr_pred = Multiply(name=task_names[1])([ctr_pred, cvr_pred])  # CTCVR = CTR * CVR
+        outputs.append(ctcvr_pred)
 
-    model = Model(inputs=inputs_list, outputs=[ctr_pred, ctcvr_pred])
+    model = Model(inputs=inputs_list, outputs=outputs)
     return model
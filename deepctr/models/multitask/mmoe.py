@@ -13,14 +13,14 @@ from tensorflow.python.keras.models import Model
 from tensorflow.python.keras.layers import Dense, Lambda
 
 from ...feature_column import build_input_features, input_from_feature_columns
-from ...layers.core import PredictionLayer, DNN
+from ...layers.core import PredictionLayer, DNN, ExpertBank
 from ...layers.utils import combined_dnn_input, reduce_sum
 
 
 def MMOE(dnn_feature_columns, num_experts=3, expert_dnn_hidden_units=(256, 128), tower_dnn_hidden_units=(64,),
          gate_dnn_hidden_units=(), l2_reg_embedding=0.00001, l2_reg_dnn=0, seed=1024, dnn_dropout=0,
          dnn_activation='relu',
-         dnn_use_bn=False, task_types=('binary', 'binary'), task_names=('ctr', 'ctcvr')):
+         dnn_use_bn=False, task_types=('binary', 'binary'), task_names=('ctr', 'ctcvr'), output_task_names=None):
     """Instantiates the Multi-gate Mixture-of-Experts multi-task learning architecture.
 
     :param dnn_feature_columns: An iterable containing all the features used by deep part of the model.
@@ -36,6 +36,7 @@ def MMOE(dnn_feature_columns, num_experts=3, expert_dnn_hidden_units=(256, 128),
     :param dnn_use_bn: bool. Whether use BatchNormalization before activation or not in DNN
     :param task_types: list of str, indicating the loss of each tasks, ``"binary"`` for  binary logloss, ``"regression"`` for regression loss. e.g. ['binary', 'regression']
     :param task_names: list of str, indicating the predict target of each tasks
+    :param output_task_names: list of str or None, a subset of ``task_names``. If set, the model only outputs these tasks and does not compute the towers and gates only used by the other tasks. The weighted layers are named as in the model with all tasks, so its trained weights can be loaded with ``model.load_weights(filepath, by_name=True)`` .
 
     :return: a Keras model instance
     """
@@ -51,6 +52,10 @@ def MMOE(dnn_feature_columns, num_experts=3, expert_dnn_hidden_units=(256, 128),
     for task_type in task_types:
         if task_type not in ['binary', 'regression']:
             raise ValueError("task must be binary or regression, {} is illegal".format(task_type))
+    if output_task_names is None:
+        output_task_names = task_names
+    if not set(output_task_names) <= set(task_names):
+        raise ValueError("output_task_names must be a subset of task_names")
 
     features = build_input_features(dnn_feature_columns)
 
@@ -61,16 +66,12 @@ def MMOE(dnn_feature_columns, num_experts=3, expert_dnn_hidden_units=(256, 128),
     dnn_input = combined_dnn_input(sparse_embedding_list, dense_value_list)
 
     # build expert layer
-    expert_outs = []
-    for i in range(num_experts):
-        expert_network = DNN(expert_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn, seed=seed,
-                             name='expert_' + str(i))(dnn_input)
-        expert_outs.append(expert_network)
-
-    expert_concat = Lambda(lambda x: tf.stack(x, axis=1))(expert_outs)  # None,num_experts,dim
+    expert_concat = ExpertBank(num_experts, expert_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout,
+                               dnn_use_bn, seed=seed, name='experts')(dnn_input)  # None,num_experts,dim
 
+    output_tasks = [i for i in range(num_tasks) if task_names[i] in output_task_names]
     mmoe_outs = []
-    for i in range(num_tasks):  # one mmoe layer: nums_tasks = num_gates
+    for i in output_tasks:  # one mmoe layer: nums_tasks = num_gates
         # build gate layers
         gate_input = DNN(gate_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn, seed=seed,
                          name='gate_' + task_names[i])(dnn_input)
@@ -84,12 +85,13 @@ def MMOE(dnn_feature_columns, num_experts=3, expert_dnn_hidden_units=(256, 128),
         mmoe_outs.append(gate_mul_expert)
 
     task_outs = []
-    for task_type, task_name, mmoe_out in zip(task_types, task_names, mmoe_outs):
+    for i, mmoe_out in zip(output_tasks, mmoe_outs):
+        task_type, task_name = task_types[i], task_names[i]
         # build tower layer
         tower_output = DNN(tower_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn, seed=seed,
                            name='tower_' + task_name)(mmoe_out)
 
-        logit = Dense(1, use_bias=False)(tower_output)
+        logit = Dense(1, use_bias=False, name='logit_' + task_name)(tower_output)
         output = PredictionLayer(task_type, name=task_name)(logit)
         task_outs.append(output)
 
@@ -13,7 +13,7 @@ from tensorflow.python.keras.models import Model
 from tensorflow.python.keras.layers import Dense, Lambda
 
 from ...feature_column import build_input_features, input_from_feature_columns
-from ...layers.core import PredictionLayer, DNN
+from ...layers.core import PredictionLayer, DNN, ExpertBank
 from ...layers.utils import combined_dnn_input, reduce_sum
 
 
@@ -21,7 +21,7 @@ def PLE(dnn_feature_columns, shared_expert_num=1, specific_expert_num=1, num_lev
         expert_dnn_hidden_units=(256,), tower_dnn_hidden_units=(64,), gate_dnn_hidden_units=(),
         l2_reg_embedding=0.00001,
         l2_reg_dnn=0, seed=1024, dnn_dropout=0, dnn_activation='relu', dnn_use_bn=False,
-        task_types=('binary', 'binary'), task_names=('ctr', 'ctcvr')):
+        task_types=('binary', 'binary'), task_names=('ctr', 'ctcvr'), output_task_names=None):
     """Instantiates the multi level of Customized Gate Control of Progressive Layered Extraction architecture.
 
     :param dnn_feature_columns: An iterable containing all the features used by deep part of the model.
@@ -39,6 +39,7 @@ def PLE(dnn_feature_columns, shared_expert_num=1, specific_expert_num=1, num_lev
     :param dnn_use_bn: bool. Whether use BatchNormalization before activation or not in DNN.
     :param task_types: list of str, indicating the loss of each tasks, ``"binary"`` for  binary logloss, ``"regression"`` for regression loss. e.g. ['binary', 'regression']
     :param task_names: list of str, indicating the predict target of each tasks
+    :param output_task_names: list of str or None, a subset of ``task_names``. If set, the model only outputs these tasks and does not compute the towers, gates and task-specific experts only used by the other tasks. The weighted layers are named as in the model with all tasks, so its trained weights can be loaded with ``model.load_weights(filepath, by_name=True)`` .
 
     :return: a Keras model instance.
     """
@@ -52,6 +53,10 @@ def PLE(dnn_feature_columns, shared_expert_num=1, specific_expert_num=1, num_lev
     for task_type in task_types:
         if task_type not in ['binary', 'regression']:
             raise ValueError("task must be binary or regression, {} is illegal".format(task_type))
+    if output_task_names is None:
+        output_task_names = task_names
+    if not set(output_task_names) <= set(task_names):
+        raise ValueError("output_task_names must be a subset of task_names")
 
     features = build_input_features(dnn_feature_columns)
 
@@ -62,36 +67,35 @@ def PLE(dnn_feature_columns, shared_expert_num=1, specific_expert_num=1, num_lev
     dnn_input = combined_dnn_input(sparse_embedding_list, dense_value_list)
 
     # single Extraction Layer
-    def cgc_net(inputs, level_name, is_last=False):
-        # inputs: [task1, task2, ... taskn, shared task]
-        specific_expert_outputs = []
-        # build task-specific expert layer
-        for i in range(num_tasks):
-            for j in range(specific_expert_num):
-                expert_network = DNN(expert_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn,
-                                     seed=seed,
-                                     name=level_name + 'task_' + task_names[i] + '_expert_specific_' + str(j))(
-                    inputs[i])
-                specific_expert_outputs.append(expert_network)
-
-        # build task-shared expert layer
-        shared_expert_outputs = []
-        for k in range(shared_expert_num):
-            expert_network = DNN(expert_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn,
-                                 seed=seed,
-                                 name=level_name + 'expert_shared_' + str(k))(inputs[-1])
-            shared_expert_outputs.append(expert_network)
+    def cgc_net(inputs, level_name, gate_tasks, expert_tasks, is_last=False):
+        # inputs: [task1, task2, ... taskn, shared task], None for the tasks not in gate_tasks of the previous level
+        # all experts of the level are in one bank: [task1 specific experts, ... taskn specific experts, shared experts]
+        num_experts = num_tasks * specific_expert_num + shared_expert_num
+        shared_experts = list(range(num_tasks * specific_expert_num, num_experts))
+        expert_index = [i * specific_expert_num + j for i in expert_tasks for j in
+                        range(specific_expert_num)] + shared_experts
+        expert_position = {expert: position for position, expert in enumerate(expert_index)}
+        if all(inputs[i] is inputs[-1] for i in expert_tasks):
+            expert_input = inputs[-1]
+        else:
+            expert_inputs = [inputs[i] for i in expert_tasks for _ in range(specific_expert_num)] + [
+                inputs[-1]] * shared_expert_num
+            expert_input = Lambda(lambda x: tf.stack(x, axis=1))(expert_inputs)
+        expert_outputs = ExpertBank(num_experts, expert_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout,
+                                    dnn_use_bn, seed=seed,
+                                    expert_index=expert_index if len(expert_index) < num_experts else None,
+                                    name=level_name + 'experts')(expert_input)
 
         # task_specific gate (count = num_tasks)
-        cgc_outs = []
-        for i in range(num_tasks):
+        cgc_outs = [None] * num_tasks
+        for i in gate_tasks:
             # concat task-specific expert and task-shared expert
             cur_expert_num = specific_expert_num + shared_expert_num
             # task_specific + task_shared
-            cur_experts = specific_expert_outputs[
-                          i * specific_expert_num:(i + 1) * specific_expert_num] + shared_expert_outputs
+            cur_expert_index = [expert_position[expert] for expert in
+                                list(range(i * specific_expert_num, (i + 1) * specific_expert_num)) + shared_experts]
 
-            expert_concat = Lambda(lambda x: tf.stack(x, axis=1))(cur_experts)
+            expert_concat = Lambda(lambda x, index=cur_expert_index: tf.gather(x, index, axis=1))(expert_outputs)
 
             # build gate layers
             gate_input = DNN(gate_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn,
@@ -106,14 +110,12 @@ def PLE(dnn_feature_columns, shared_expert_num=1, specific_expert_num=1, num_lev
             gate_mul_expert = Lambda(lambda x: reduce_sum(x[0] * x[1], axis=1, keep_dims=False),
                                                      name=level_name + 'gate_mul_expert_specific_' + task_names[i])(
                 [expert_concat, gate_out])
-            cgc_outs.append(gate_mul_expert)
+            cgc_outs[i] = gate_mul_expert
 
         # task_shared gate, if the level not in last, add one shared gate
         if not is_last:
-            cur_expert_num = num_tasks * specific_expert_num + shared_expert_num
-            cur_experts = specific_expert_outputs + shared_expert_outputs  # all the expert include task-specific expert and task-shared expert
-
-            expert_concat = Lambda(lambda x: tf.stack(x, axis=1))(cur_experts)
+            cur_expert_num = num_experts
+            expert_concat = expert_outputs  # all the expert include task-specific expert and task-shared expert
 
             # build gate layers
             gate_input = DNN(gate_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn,
@@ -132,22 +134,35 @@ def PLE(dnn_feature_columns, shared_expert_num=1, specific_expert_num=1, num_lev
             cgc_outs.append(gate_mul_expert)
         return cgc_outs
 
+    # the tasks whose gates and specific experts each level computes, the last level only those of the output tasks,
+    # the levels before it the ones the next level takes as input, and all specific experts for the shared gate
+    output_tasks = [i for i in range(num_tasks) if task_names[i] in output_task_names]
+    level_tasks = []
+    gate_tasks, expert_tasks = output_tasks, output_tasks
+    for _ in range(num_levels):
+        level_tasks.insert(0, (gate_tasks, expert_tasks))
+        gate_tasks, expert_tasks = sorted(set(gate_tasks) | set(expert_tasks)), list(range(num_tasks))
+
     # build Progressive Layered Extraction
     ple_inputs = [dnn_input] * (num_tasks + 1)  # [task1, task2, ... taskn, shared task]
     ple_outputs = []
     for i in range(num_levels):
+        gate_tasks, expert_tasks = level_tasks[i]
         if i == num_levels - 1:  # the last level
-            ple_outputs = cgc_net(inputs=ple_inputs, level_name='level_' + str(i) + '_', is_last=True)
+            ple_outputs = cgc_net(inputs=ple_inputs, level_name='level_' + str(i) + '_', gate_tasks=gate_tasks,
+                                  expert_tasks=expert_tasks, is_last=True)
         else:
-            ple_outputs = cgc_net(inputs=ple_inputs, level_name='level_' + str(i) + '_', is_last=False)
+            ple_outputs = cgc_net(inputs=ple_inputs, level_name='level_' + str(i) + '_', gate_tasks=gate_tasks,
+                                  expert_tasks=expert_tasks, is_last=False)
             ple_inputs = ple_outputs
 
     task_outs = []
-    for task_type, task_name, ple_out in zip(task_types, task_names, ple_outputs):
+    for i in output_tasks:
+        task_type, task_name = task_types[i], task_names[i]
         # build tower layer
         tower_output = DNN(tower_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn, seed=seed,
-                           name='tower_' + task_name)(ple_out)
-        logit = Dense(1, use_bias=False)(tower_output)
+                           name='tower_' + task_name)(ple_outputs[i])
+        logit = Dense(1, use_bias=False, name='logit_' + task_name)(tower_output)
         output = PredictionLayer(task_type, name=task_name)(logit)
         task_outs.append(output)
 
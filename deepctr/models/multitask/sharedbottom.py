@@ -9,10 +9,10 @@ Reference:
 """
 
 from tensorflow.python.keras.models import Model
-from tensorflow.python.keras.layers import Dense
+from tensorflow.python.keras.layers import Dense, Lambda
 
 from ...feature_column import build_input_features, input_from_feature_columns
-from ...layers.core import PredictionLayer, DNN
+from ...layers.core import PredictionLayer, DNN, ExpertBank
 from ...layers.utils import combined_dnn_input
 
 
@@ -55,10 +55,13 @@ def SharedBottom(dnn_feature_columns, bottom_dnn_hidden_units=(256, 128), tower_
     shared_bottom_output = DNN(bottom_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn, seed=seed)(
         dnn_input)
 
+    # the towers of all tasks share their input, so they are computed together
+    towers_output = ExpertBank(num_tasks, tower_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn,
+                               seed=seed, name='towers')(shared_bottom_output)
+
     tasks_output = []
-    for task_type, task_name in zip(task_types, task_names):
-        tower_output = DNN(tower_dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, dnn_use_bn, seed=seed,
-                           name='tower_' + task_name)(shared_bottom_output)
+    for i, (task_type, task_name) in enumerate(zip(task_types, task_names)):
+        tower_output = Lambda(lambda x, i=i: x[:, i], name='tower_' + task_name)(towers_output)
 
         logit = Dense(1, use_bias=False)(tower_output)
         output = PredictionLayer(task_type, name=task_name)(logit)
@@ -8,11 +8,11 @@ Reference:
 """
 
 from tensorflow.python.keras.models import Model
-from tensorflow.python.keras.layers import (Dense, Flatten)
+from tensorflow.python.keras.layers import (Dense, Flatten, Input)
 
 from ...feature_column import SparseFeat, VarLenSparseFeat, DenseFeat, build_input_features
 from ...inputs import get_varlen_pooling_list, create_embedding_matrix, embedding_lookup, varlen_embedding_lookup, \
-    get_dense_input
+    get_dense_input, get_candidate_scoring_features
 from ...layers.core import DNN, PredictionLayer
 from ...layers.sequence import Transformer, AttentionSequencePoolingLayer
 from ...layers.utils import concat_func, combined_dnn_input
@@ -20,7 +20,8 @@ from ...layers.utils import concat_func, combined_dnn_input
 
 def BST(dnn_feature_columns, history_feature_list, transformer_num=1, att_head_num=8,
         use_bn=False, dnn_hidden_units=(256, 128, 64), dnn_activation='relu', l2_reg_dnn=0,
-        l2_reg_embedding=1e-6, dnn_dropout=0.0, seed=1024, task='binary'):
+        l2_reg_embedding=1e-6, dnn_dropout=0.0, seed=1024, task='binary', candidate_scoring=False,
+        att_type='scaled_dot_product', att_window_size=32, att_memory_size=32, incremental_serving=False):
     """Instantiates the BST architecture.
 
      :param dnn_feature_columns: An iterable containing all the features used by deep part of the model.
@@ -35,10 +36,17 @@ def BST(dnn_feature_columns, history_feature_list, transformer_num=1, att_head_n
      :param dnn_dropout: float in [0,1), the probability we will drop out a given DNN coordinate.
      :param seed: integer ,to use as random seed.
      :param task: str, ``"binary"`` for  binary logloss or ``"regression"`` for regression loss
+     :param candidate_scoring: bool. If True, build a model that scores many candidate items for one user. The features in ``history_feature_list`` are fed with ``n_candidates`` rows and all other features with a single row, so the Transformer runs once over the user's history for all candidates. It creates the same weights in the same order as the model built with ``candidate_scoring=False``, so trained weights can be loaded into it.
+     :param att_type: str, the ``attention_type`` of the Transformer, one of ``'scaled_dot_product'`` , ``'cos'`` , ``'ln'`` , ``'additive'`` , ``'local'`` , ``'linear'`` or ``'memory'`` . The last three scale linearly with the length of the behavior sequence.
+     :param att_window_size: int, the number of positions on each side a behavior attends to if ``att_type='local'``.
+     :param att_memory_size: int, the number of memory slots the behaviors are pooled into if ``att_type='memory'``.
+     :param incremental_serving: bool. If True, build the serving model of ``deepctr.serving.BSTStateCache`` with two outputs. The first is the prediction scored from the cached Transformer output of the behavior sequence, fed as ``history_states`` with shape ``(batch_size, maxlen, embedding_size)`` and its length ``seq_length`` . The second is the Transformer output of the ``hist_`` features. The weighted layers have the same names as in the model built with ``incremental_serving=False``, so trained weights can be loaded with ``model.load_weights(filepath, by_name=True)`` .
      :return: A Keras model instance.
 
      """
 
+    if incremental_serving and candidate_scoring:
+        raise ValueError("incremental_serving can not be used with candidate_scoring")
     features = build_input_features(dnn_feature_columns)
     inputs_list = list(features.values())
 
@@ -62,6 +70,9 @@ def BST(dnn_feature_columns, history_feature_list, transformer_num=1, att_head_n
         else:
             sparse_varlen_feature_columns.append(fc)
 
+    if candidate_scoring:
+        features = get_candidate_scoring_features(features, history_feature_list, history_feature_columns)
+
     embedding_dict = create_embedding_matrix(dnn_feature_columns, l2_reg_embedding, seed, prefix="",
                                              seq_mask_zero=True)
 
@@ -82,26 +93,38 @@ def BST(dnn_feature_columns, history_feature_list, transformer_num=1, att_head_n
     hist_emb = concat_func(hist_emb_list)
 
     transformer_output = hist_emb
-    for _ in range(transformer_num):
+    for i in range(transformer_num):
         att_embedding_size = transformer_output.get_shape().as_list()[-1] // att_head_num
         transformer_layer = Transformer(att_embedding_size=att_embedding_size, head_num=att_head_num,
                                         dropout_rate=dnn_dropout, use_positional_encoding=True, use_res=True,
                                         use_feed_forward=True, use_layer_norm=True, blinding=False, seed=seed,
-                                        supports_masking=False, output_type=None)
+                                        supports_masking=False, attention_type=att_type,
+                                        window_size=att_window_size, memory_size=att_memory_size, output_type=None,
+                                        name="transformer_" + str(i))
         transformer_output = transformer_layer([transformer_output, transformer_output,
                                                 user_behavior_length, user_behavior_length])
 
+    if incremental_serving:
+        # the Transformer output does not depend on the candidate, so it is computed once per behavior sequence
+        new_history_states = transformer_output
+        transformer_output = Input(shape=tuple(transformer_output.get_shape().as_list()[1:]), name="history_states")
+        inputs_list.append(transformer_output)
+
     attn_output = AttentionSequencePoolingLayer(att_hidden_units=(64, 16), weight_normalization=True,
-                                                supports_masking=False)([query_emb, transformer_output,
-                                                                         user_behavior_length])
+                                                supports_masking=False, decompose_input=True,
+                                                name="interest_attention")([query_emb, transformer_output,
+                                                                            user_behavior_length])
     deep_input_emb = concat_func([deep_input_emb, attn_output], axis=-1)
     deep_input_emb = Flatten()(deep_input_emb)
 
     dnn_input = combined_dnn_input([deep_input_emb], dense_value_list)
-    output = DNN(dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, use_bn, seed=seed)(dnn_input)
-    final_logit = Dense(1, use_bias=False)(output)
-    output = PredictionLayer(task)(final_logit)
+    output = DNN(dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, use_bn, seed=seed, name="dnn_tower")(
+        dnn_input)
+    final_logit = Dense(1, use_bias=False, name="dnn_logit")(output)
+    output = PredictionLayer(task, name="prediction")(final_logit)
 
+    if incremental_serving:
+        output = [output, new_history_states]
     model = Model(inputs=inputs_list, outputs=output)
 
     return model
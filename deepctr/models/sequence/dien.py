@@ -7,16 +7,17 @@ Reference:
     [1] Zhou G, Mou N, Fan Y, et al. Deep Interest Evolution Network for Click-Through Rate Prediction[J]. arXiv preprint arXiv:1809.03672, 2018. (https://arxiv.org/pdf/1809.03672.pdf)
 """
 
+import numpy as np
 import tensorflow as tf
 from tensorflow.python.keras.models import Model
-from tensorflow.python.keras.layers import (Concatenate, Dense, Permute, multiply, Flatten)
+from tensorflow.python.keras.layers import (Concatenate, Dense, Permute, multiply, Flatten, Input)
 
 from ...feature_column import SparseFeat, VarLenSparseFeat, DenseFeat, build_input_features
 from ...inputs import get_varlen_pooling_list, create_embedding_matrix, embedding_lookup, varlen_embedding_lookup, \
-    get_dense_input
+    get_dense_input, get_candidate_scoring_features
 from ...layers.core import DNN, PredictionLayer
 from ...layers.sequence import AttentionSequencePoolingLayer, DynamicGRU
-from ...layers.utils import concat_func, reduce_mean, combined_dnn_input
+from ...layers.utils import concat_func, reduce_mean, combined_dnn_input, BroadcastToBatch, get_dim
 
 
 def auxiliary_loss(h_states, click_seq, noclick_seq, mask, stag=None):
@@ -26,8 +27,7 @@ def auxiliary_loss(h_states, click_seq, noclick_seq, mask, stag=None):
     #:param mask:#[B,1]
     #:param stag:
     #:return:
-    hist_len, _ = click_seq.get_shape().as_list()[1:]
-    mask = tf.sequence_mask(mask, hist_len)
+    mask = tf.sequence_mask(mask, get_dim(click_seq))
     mask = mask[:, 0, :]
 
     mask = tf.cast(mask, tf.float32)
@@ -38,10 +38,9 @@ def auxiliary_loss(h_states, click_seq, noclick_seq, mask, stag=None):
 
     auxiliary_nn = DNN([100, 50, 1], activation='sigmoid')
 
-    click_prop_ = auxiliary_nn(click_input_, stag=stag)[:, :, 0]
-
-    noclick_prop_ = auxiliary_nn(noclick_input_, stag=stag)[
-                    :, :, 0]  # [B,T-1]
+    # the click and non-click inputs go through the auxiliary net in one call
+    prop_ = auxiliary_nn(tf.concat([click_input_, noclick_input_], axis=0), stag=stag)[:, :, 0]
+    click_prop_, noclick_prop_ = tf.split(prop_, 2, axis=0)  # [B,T-1]
 
     try:
         click_loss_ = - tf.reshape(tf.log(click_prop_),
@@ -63,15 +62,65 @@ def auxiliary_loss(h_states, click_seq, noclick_seq, mask, stag=None):
     return loss_
 
 
+def _categorical(logits, num_samples):
+    try:
+        return tf.random.categorical(logits, num_samples)
+    except AttributeError:
+        return tf.multinomial(logits, num_samples)
+
+
+def sample_negative_behavior(keys_emb, user_behavior_length, neg_sampler, embedding_dict=None,
+                             history_feature_columns=None, item_feature_name=None, neg_sampling_counts=None,
+                             neg_sampling_side_features=None):
+    #:param keys_emb: [B,T,E] the embeddings of the clicked behaviors
+    #:param user_behavior_length: [B,1]
+    #:param neg_sampler: 'in_batch' or 'frequency'
+    #:param history_feature_columns: the columns of keys_emb
+    #:param item_feature_name: the feature of history_feature_list which is sampled with neg_sampling_counts
+    #:return: [B,T,E] the embeddings of the non-clicked behaviors
+    batch_size, seq_len = tf.shape(keys_emb)[0], get_dim(keys_emb)
+    num_samples = batch_size * seq_len
+    if neg_sampler == "in_batch":
+        # draws one of the other clicked behaviors of the batch for every position, all features of a behavior stay
+        # together. A valid position of rank r among the n valid positions draws k in [0, n - 1) and skips itself
+        # by taking k + 1 if k >= r.
+        flat_mask = tf.reshape(tf.sequence_mask(user_behavior_length, seq_len), [-1])
+        valid_index = tf.cast(tf.where(flat_mask)[:, 0], tf.int32)
+        num_valid = tf.size(valid_index)
+        rank = tf.cumsum(tf.cast(flat_mask, tf.int32), exclusive=True)
+        k = tf.random.uniform([num_samples], 0, tf.maximum(num_valid - 1, 1), dtype=tf.int32)
+        k += tf.cast(tf.logical_and(k >= rank, flat_mask), tf.int32)
+        # a batch with a single valid behavior can only draw it, one without any draws the padding at index 0
+        k = tf.minimum(k, tf.maximum(num_valid - 1, 0))
+        index = tf.gather(tf.concat([valid_index, tf.zeros([1], tf.int32)], axis=0), k)
+        flat_keys_emb = tf.reshape(keys_emb, [-1, int(keys_emb.get_shape()[-1])])
+        return tf.reshape(tf.gather(flat_keys_emb, index), tf.shape(keys_emb))
+    if neg_sampler == "frequency":
+        # draws the item ids, then looks up the side features of the drawn items
+        neg_ids = _categorical(tf.math.log(tf.constant(neg_sampling_counts, dtype=tf.float32))[None, :], num_samples)
+        neg_ids = tf.reshape(tf.cast(neg_ids, tf.int32), [batch_size, seq_len])
+        neg_emb_list = []
+        for fc in history_feature_columns:
+            feature_name = fc.name[len("hist_"):]
+            if feature_name == item_feature_name:
+                ids = neg_ids
+            else:
+                ids = tf.gather(tf.constant(neg_sampling_side_features[feature_name], dtype=tf.int32), neg_ids)
+            neg_emb_list.append(embedding_dict[fc.embedding_name](ids))
+        return concat_func(neg_emb_list)
+    raise ValueError("neg_sampler must be None, 'in_batch' or 'frequency'")
+
+
 def interest_evolution(concat_behavior, deep_input_item, user_behavior_length, gru_type="GRU", use_neg=False,
                        neg_concat_behavior=None, att_hidden_size=(64, 16), att_activation='sigmoid',
-                       att_weight_normalization=False, ):
+                       att_weight_normalization=False, candidate_scoring=False, rnn_outputs=None):
     if gru_type not in ["GRU", "AIGRU", "AGRU", "AUGRU"]:
         raise ValueError("gru_type error ")
     aux_loss_1 = None
     embedding_size = None
-    rnn_outputs = DynamicGRU(embedding_size, return_sequence=True,
-                             name="gru1")([concat_behavior, user_behavior_length])
+    if rnn_outputs is None:
+        rnn_outputs = DynamicGRU(embedding_size, return_sequence=True,
+                                 name="gru1")([concat_behavior, user_behavior_length])
 
     if gru_type == "AUGRU" and use_neg:
         aux_loss_1 = auxiliary_loss(rnn_outputs[:, :-1, :], concat_behavior[:, 1:, :],
@@ -89,15 +138,21 @@ def interest_evolution(concat_behavior, deep_input_item, user_behavior_length, g
         #     [attention_score, rnn_outputs2])
         # hist = outputs
         hist = AttentionSequencePoolingLayer(att_hidden_units=att_hidden_size, att_activation=att_activation,
-                                             weight_normalization=att_weight_normalization, return_score=False)([
+                                             weight_normalization=att_weight_normalization, return_score=False,
+                                             decompose_input=True, name="interest_attention")([
             deep_input_item, rnn_outputs2, user_behavior_length])
 
     else:  # AIGRU AGRU AUGRU
 
         scores = AttentionSequencePoolingLayer(att_hidden_units=att_hidden_size, att_activation=att_activation,
-                                               weight_normalization=att_weight_normalization, return_score=True)([
+                                               weight_normalization=att_weight_normalization, return_score=True,
+                                               decompose_input=True, name="interest_attention")([
             deep_input_item, rnn_outputs, user_behavior_length])
 
+        if candidate_scoring:
+            rnn_outputs = BroadcastToBatch()([rnn_outputs, deep_input_item])
+            user_behavior_length = BroadcastToBatch()([user_behavior_length, deep_input_item])
+
         if gru_type == "AIGRU":
             hist = multiply([rnn_outputs, Permute([2, 1])(scores)])
             final_state2 = DynamicGRU(embedding_size, gru_type="GRU", return_sequence=False, name='gru2')(
@@ -113,7 +168,8 @@ def DIEN(dnn_feature_columns, history_feature_list,
          gru_type="GRU", use_negsampling=False, alpha=1.0, use_bn=False, dnn_hidden_units=(256, 128, 64),
          dnn_activation='relu',
          att_hidden_units=(64, 16), att_activation="dice", att_weight_normalization=True,
-         l2_reg_dnn=0, l2_reg_embedding=1e-6, dnn_dropout=0, seed=1024, task='binary'):
+         l2_reg_dnn=0, l2_reg_embedding=1e-6, dnn_dropout=0, seed=1024, task='binary', candidate_scoring=False,
+         incremental_serving=False, neg_sampler=None, neg_sampling_counts=None, neg_sampling_side_features=None):
     """Instantiates the Deep Interest Evolution Network architecture.
 
     :param dnn_feature_columns: An iterable containing all the features used by deep part of the model.
@@ -133,9 +189,24 @@ def DIEN(dnn_feature_columns, history_feature_list,
     :param init_std: float,to use as the initialize std of embedding vector
     :param seed: integer ,to use as random seed.
     :param task: str, ``"binary"`` for  binary logloss or  ``"regression"`` for regression loss
+    :param candidate_scoring: bool. If True, build a model that scores many candidate items for one user. The features in ``history_feature_list`` are fed with ``n_candidates`` rows and all other features with a single row, so the interest extractor GRU runs once over the user's history for all candidates. It creates the same weights in the same order as the model built with ``candidate_scoring=False``, so trained weights can be loaded into it.
+    :param incremental_serving: bool. If True, build the serving model of ``deepctr.serving.DIENStateCache`` with two outputs. The first is the prediction scored from the cached per-step states of the interest extractor GRU, fed as ``interest_states`` with shape ``(batch_size, maxlen, embedding_size)`` and their number ``interest_states_length`` . The second is the per-step states over the user's new events, fed as the history features with ``seq_length`` new events, starting from the last cached state ``interest_initial_state`` . The weighted layers have the same names as in the model built with ``incremental_serving=False``, so trained weights can be loaded with ``model.load_weights(filepath, by_name=True)`` .
+    :param neg_sampler: ``None`` , ``'in_batch'`` or ``'frequency'`` , where the non-clicked behaviors of the auxiliary loss come from, only with ``use_negsampling=True`` . ``None`` feeds them as the ``neg_hist_`` features. ``'in_batch'`` draws them in-graph from the other clicked behaviors of the whole batch, and ``'frequency'`` draws the item ids from ``neg_sampling_counts`` , then no ``neg_hist_`` features are needed.
+    :param neg_sampling_counts: list, the sampling weight of each id in the vocabulary of the first feature in ``history_feature_list`` , the item id, e.g. its frequency, if ``neg_sampler='frequency'`` .
+    :param neg_sampling_side_features: dict, maps every other feature in ``history_feature_list`` to a list with its id for each item id, e.g. the category of each item, if ``neg_sampler='frequency'`` . The side features of the sampled items are looked up in it, so that they belong to the items.
     :return: A Keras model instance.
 
     """
+    if incremental_serving and candidate_scoring:
+        raise ValueError("incremental_serving can not be used with candidate_scoring")
+    if neg_sampler is not None and not use_negsampling:
+        raise ValueError("neg_sampler is only used with use_negsampling=True")
+    if neg_sampler == "frequency":
+        if neg_sampling_counts is None or np.sum(neg_sampling_counts) <= 0:
+            raise ValueError("neg_sampler='frequency' needs neg_sampling_counts with a positive sum")
+        missing = [name for name in history_feature_list[1:] if name not in (neg_sampling_side_features or {})]
+        if missing:
+            raise ValueError("neg_sampling_side_features has no ids of %s" % ", ".join(missing))
     features = build_input_features(dnn_feature_columns)
 
     user_behavior_length = features["seq_length"]
@@ -162,6 +233,11 @@ def DIEN(dnn_feature_columns, history_feature_list,
             sparse_varlen_feature_columns.append(fc)
 
     inputs_list = list(features.values())
+    # the negative behaviors are only fed if the auxiliary loss does not sample them in-graph
+    clicked_inputs_list = [features[name] for name in features if name not in neg_history_fc_names]
+    if candidate_scoring:
+        features = get_candidate_scoring_features(features, history_feature_list,
+                                                  history_feature_columns + neg_history_feature_columns)
 
     embedding_dict = create_embedding_matrix(dnn_feature_columns, l2_reg_embedding, seed, prefix="",
                                              seq_mask_zero=False)
@@ -183,7 +259,12 @@ def DIEN(dnn_feature_columns, history_feature_list,
     deep_input_emb = concat_func(dnn_input_emb_list)
     query_emb = concat_func(query_emb_list)
 
-    if use_negsampling:
+    if use_negsampling and not incremental_serving and neg_sampler is not None:
+        neg_concat_behavior = sample_negative_behavior(keys_emb, user_behavior_length, neg_sampler, embedding_dict,
+                                                       history_feature_columns, history_feature_list[0],
+                                                       neg_sampling_counts, neg_sampling_side_features)
+        inputs_list = clicked_inputs_list
+    elif use_negsampling and not incremental_serving:
 
         neg_uiseq_embed_list = embedding_lookup(embedding_dict, features, neg_history_feature_columns,
                                                 neg_history_fc_names, to_list=True)
@@ -192,21 +273,40 @@ def DIEN(dnn_feature_columns, history_feature_list,
 
     else:
         neg_concat_behavior = None
-    hist, aux_loss_1 = interest_evolution(keys_emb, query_emb, user_behavior_length, gru_type=gru_type,
-                                          use_neg=use_negsampling, neg_concat_behavior=neg_concat_behavior,
-                                          att_hidden_size=att_hidden_units,
-                                          att_activation=att_activation,
-                                          att_weight_normalization=att_weight_normalization, )
+
+    if incremental_serving:
+        embedding_size = int(keys_emb.get_shape()[-1])
+        initial_state = Input(shape=(embedding_size,), name="interest_initial_state")
+        interest_states = Input(shape=(history_feature_columns[0].maxlen, embedding_size), name="interest_states")
+        interest_states_length = Input(shape=(1,), name="interest_states_length", dtype='int32')
+        new_interest_states = DynamicGRU(None, return_sequence=True, name="gru1")(
+            [keys_emb, user_behavior_length, initial_state])
+        hist, _ = interest_evolution(None, query_emb, interest_states_length, gru_type=gru_type,
+                                     att_hidden_size=att_hidden_units, att_activation=att_activation,
+                                     att_weight_normalization=att_weight_normalization, rnn_outputs=interest_states)
+        inputs_list = clicked_inputs_list + [initial_state, interest_states, interest_states_length]
+        use_negsampling = False
+    else:
+        hist, aux_loss_1 = interest_evolution(keys_emb, query_emb, user_behavior_length, gru_type=gru_type,
+                                              use_neg=use_negsampling, neg_concat_behavior=neg_concat_behavior,
+                                              att_hidden_size=att_hidden_units,
+                                              att_activation=att_activation,
+                                              att_weight_normalization=att_weight_normalization,
+                                              candidate_scoring=candidate_scoring)
 
     deep_input_emb = Concatenate()([deep_input_emb, hist])
 
     deep_input_emb = Flatten()(deep_input_emb)
 
     dnn_input = combined_dnn_input([deep_input_emb], dense_value_list)
-    output = DNN(dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, use_bn, seed=seed)(dnn_input)
-    final_logit = Dense(1, use_bias=False, kernel_initializer=tf.keras.initializers.glorot_normal(seed))(output)
-    output = PredictionLayer(task)(final_logit)
-
+    output = DNN(dnn_hidden_units, dnn_activation, l2_reg_dnn, dnn_dropout, use_bn, seed=seed, name="dnn_tower")(
+        dnn_input)
+    final_logit = Dense(1, use_bias=False, kernel_initializer=tf.keras.initializers.glorot_normal(seed),
+                        name="dnn_logit")(output)
+    output = PredictionLayer(task, name="prediction")(final_logit)
+
+    if incremental_serving:
+        output = [output, new_interest_states]
     model = Model(inputs=inputs_list, outputs=output)
 
     if use_negsampling:
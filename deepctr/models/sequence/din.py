@@ -11,7 +11,7 @@ from tensorflow.python.keras.models import Model
 
 from ...feature_column import SparseFeat, VarLenSparseFeat, DenseFeat, build_input_features
 from ...inputs import create_embedding_matrix, embedding_lookup, get_dense_input, varlen_embedding_lookup, \
-    get_varlen_pooling_list
+    get_varlen_pooling_list, get_candidate_scoring_features
 from ...layers.core import DNN, PredictionLayer
 from ...layers.sequence import AttentionSequencePoolingLayer
 from ...layers.utils import concat_func, combined_dnn_input
@@ -20,7 +20,7 @@ from ...layers.utils import concat_func, combined_dnn_input
 def DIN(dnn_feature_columns, history_feature_list, dnn_use_bn=False,
         dnn_hidden_units=(256, 128, 64), dnn_activation='relu', att_hidden_size=(80, 40), att_activation="dice",
         att_weight_normalization=False, l2_reg_dnn=0, l2_reg_embedding=1e-6, dnn_dropout=0, seed=1024,
-        task='binary'):
+        task='binary', candidate_scoring=False):
     """Instantiates the Deep Interest Network architecture.
 
     :param dnn_feature_columns: An iterable containing all the features used by deep part of the model.
@@ -36,6 +36,7 @@ def DIN(dnn_feature_columns, history_feature_list, dnn_use_bn=False,
     :param dnn_dropout: float in [0,1), the probability we will drop out a given DNN coordinate.
     :param seed: integer ,to use as random seed.
     :param task: str, ``"binary"`` for  binary logloss or  ``"regression"`` for regression loss
+    :param candidate_scoring: bool. If True, build a model that scores many candidate items for one user. The features in ``history_feature_list`` are fed with ``n_candidates`` rows and all other features with a single row, so the attention keys are computed once for all candidates. It creates the same weights in the same order as the model built with ``candidate_scoring=False``, so trained weights can be loaded into it.
     :return: A Keras model instance.
 
     """
@@ -60,6 +61,8 @@ def DIN(dnn_feature_columns, history_feature_list, dnn_use_bn=False,
             sparse_varlen_feature_columns.append(fc)
 
     inputs_list = list(features.values())
+    if candidate_scoring:
+        features = get_candidate_scoring_features(features, history_feature_list, history_feature_columns)
 
     embedding_dict = create_embedding_matrix(dnn_feature_columns, l2_reg_embedding, seed, prefix="")
 
@@ -81,7 +84,8 @@ def DIN(dnn_feature_columns, history_feature_list, dnn_use_bn=False,
     deep_input_emb = concat_func(dnn_input_emb_list)
     query_emb = concat_func(query_emb_list, mask=True)
     hist = AttentionSequencePoolingLayer(att_hidden_size, att_activation,
-                                         weight_normalization=att_weight_normalization, supports_masking=True)([
+                                         weight_normalization=att_weight_normalization, supports_masking=True,
+                                         decompose_input=True)([
         query_emb, keys_emb])
 
     deep_input_emb = concat_func([deep_input_emb, hist])
@@ -12,11 +12,11 @@ from collections import OrderedDict
 
 from tensorflow.python.keras.models import Model
 from tensorflow.python.keras.layers import (Concatenate, Dense, Embedding,
-                                            Flatten, Input)
+                                            Flatten, Input, Reshape)
 from tensorflow.python.keras.regularizers import l2
 
 from ...feature_column import SparseFeat, VarLenSparseFeat, DenseFeat, build_input_features
-from ...inputs import (get_embedding_vec_list, get_inputs_list, embedding_lookup, get_dense_input)
+from ...inputs import (get_embedding_vec_list, embedding_lookup, get_dense_input)
 from ...layers.core import DNN, PredictionLayer
 from ...layers.sequence import (AttentionSequencePoolingLayer, BiasEncoding,
                                 BiLSTM, Transformer)
@@ -26,7 +26,7 @@ from ...layers.utils import concat_func, combined_dnn_input
 def DSIN(dnn_feature_columns, sess_feature_list, sess_max_count=5, bias_encoding=False,
          att_embedding_size=1, att_head_num=8, dnn_hidden_units=(256, 128, 64), dnn_activation='relu', dnn_dropout=0,
          dnn_use_bn=False, l2_reg_dnn=0, l2_reg_embedding=1e-6, seed=1024, task='binary',
-         ):
+         att_type='scaled_dot_product', att_window_size=32, att_memory_size=32, packed_sessions=False):
     """Instantiates the Deep Session Interest Network architecture.
 
     :param dnn_feature_columns: An iterable containing all the features used by deep part of the model.
@@ -44,6 +44,10 @@ def DSIN(dnn_feature_columns, sess_feature_list, sess_max_count=5, bias_encoding
     :param l2_reg_embedding: float. L2 regularizer strength applied to embedding vector
     :param seed: integer ,to use as random seed.
     :param task: str, ``"binary"`` for  binary logloss or  ``"regression"`` for regression loss
+    :param att_type: str, the ``attention_type`` of the Transformer, one of ``'scaled_dot_product'`` , ``'cos'`` , ``'ln'`` , ``'additive'`` , ``'local'`` , ``'linear'`` or ``'memory'`` . The last three scale linearly with the length of the session sequence.
+    :param att_window_size: int, the number of positions on each side a session attends to if ``att_type='local'``.
+    :param att_memory_size: int, the number of memory slots the sessions are pooled into if ``att_type='memory'``.
+    :param packed_sessions: bool. If True, each feature in ``sess_feature_list`` is fed as one ``(batch_size, sess_max_count, sess_len_max)`` tensor declared as ``VarLenSparseFeat(SparseFeat("sess_" + feature, ...), maxlen=sess_len_max)`` instead of one ``"sess_" + str(i) + "_" + feature`` input per session, and the self-attention runs once over all sessions.
     :return: A Keras model instance.
 
     """
@@ -57,6 +61,10 @@ def DSIN(dnn_feature_columns, sess_feature_list, sess_max_count=5, bias_encoding
                 hist_emb_size, att_embedding_size, att_head_num))
 
     features = build_input_features(dnn_feature_columns)
+    if packed_sessions:
+        for fc in dnn_feature_columns:
+            if isinstance(fc, VarLenSparseFeat) and fc.name in ["sess_" + feat for feat in sess_feature_list]:
+                features[fc.name] = Input(shape=(sess_max_count, fc.maxlen), name=fc.name, dtype=fc.dtype)
 
     sparse_feature_columns = list(
         filter(lambda x: isinstance(x, SparseFeat), dnn_feature_columns)) if dnn_feature_columns else []
@@ -77,12 +85,15 @@ def DSIN(dnn_feature_columns, sess_feature_list, sess_max_count=5, bias_encoding
     inputs_list = list(features.values())
 
     user_behavior_input_dict = {}
-    for idx in range(sess_max_count):
-        sess_input = OrderedDict()
-        for i, feat in enumerate(sess_feature_list):
-            sess_input[feat] = features["sess_" + str(idx) + "_" + feat]
+    if packed_sessions:
+        user_behavior_input_dict["sess"] = OrderedDict((feat, features["sess_" + feat]) for feat in sess_feature_list)
+    else:
+        for idx in range(sess_max_count):
+            sess_input = OrderedDict()
+            for i, feat in enumerate(sess_feature_list):
+                sess_input[feat] = features["sess_" + str(idx) + "_" + feat]
 
-        user_behavior_input_dict["sess_" + str(idx)] = sess_input
+            user_behavior_input_dict["sess_" + str(idx)] = sess_input
 
     user_sess_length = Input(shape=(1,), name='sess_length')
 
@@ -106,21 +117,24 @@ def DSIN(dnn_feature_columns, sess_feature_list, sess_max_count=5, bias_encoding
     dnn_input_emb = Flatten()(concat_func(dnn_input_emb_list))
 
     tr_input = sess_interest_division(embedding_dict, user_behavior_input_dict, sparse_feature_columns,
-                                      sess_feature_list, sess_max_count, bias_encoding=bias_encoding)
+                                      sess_feature_list, sess_max_count, bias_encoding=bias_encoding,
+                                      packed_sessions=packed_sessions)
 
     Self_Attention = Transformer(att_embedding_size, att_head_num, dropout_rate=0, use_layer_norm=False,
                                  use_positional_encoding=(not bias_encoding), seed=seed, supports_masking=True,
-                                 blinding=True)
+                                 blinding=True, attention_type=att_type, window_size=att_window_size,
+                                 memory_size=att_memory_size)
     sess_fea = sess_interest_extractor(
-        tr_input, sess_max_count, Self_Attention)
+        tr_input, sess_max_count, Self_Attention, packed_sessions=packed_sessions)
 
     interest_attention_layer = AttentionSequencePoolingLayer(att_hidden_units=(64, 16), weight_normalization=True,
-                                                             supports_masking=False)(
+                                                             supports_masking=False, decompose_input=True)(
         [query_emb, sess_fea, user_sess_length])
 
     lstm_outputs = BiLSTM(hist_emb_size,
-                          layers=2, res_layers=0, dropout_rate=0.2, )(sess_fea)
-    lstm_attention_layer = AttentionSequencePoolingLayer(att_hidden_units=(64, 16), weight_normalization=True)(
+                          layers=2, res_layers=0, dropout_rate=0.2, )([sess_fea, user_sess_length])
+    lstm_attention_layer = AttentionSequencePoolingLayer(att_hidden_units=(64, 16), weight_normalization=True,
+                                                         decompose_input=True)(
         [query_emb, lstm_outputs, user_sess_length])
 
     dnn_input_emb = Concatenate()(
@@ -131,12 +145,6 @@ def DSIN(dnn_feature_columns, sess_feature_list, sess_max_count=5, bias_encoding
     output = Dense(1, use_bias=False)(output)
     output = PredictionLayer(task)(output)
 
-    sess_input_list = []
-    for i in range(sess_max_count):
-        sess_name = "sess_" + str(i)
-        sess_input_list.extend(get_inputs_list(
-            [user_behavior_input_dict[sess_name]]))
-
     model = Model(inputs=inputs_list + [user_sess_length], outputs=output)
 
     return model
@@ -144,7 +152,15 @@ def DSIN(dnn_feature_columns, sess_feature_list, sess_max_count=5, bias_encoding
 
 def sess_interest_division(sparse_embedding_dict, user_behavior_input_dict, sparse_fg_list, sess_feture_list,
                            sess_max_count,
-                           bias_encoding=True):
+                           bias_encoding=True, packed_sessions=False):
+    if packed_sessions:
+        # (batch_size, sess_max_count, sess_len_max, hist_emb_size)
+        keys_emb_list = get_embedding_vec_list(sparse_embedding_dict, user_behavior_input_dict["sess"],
+                                               sparse_fg_list, sess_feture_list, sess_feture_list)
+        tr_input = concat_func(keys_emb_list, mask=True)
+        if bias_encoding:
+            tr_input = BiasEncoding(sess_max_count)(tr_input)
+        return tr_input
     tr_input = []
     for i in range(sess_max_count):
         sess_name = "sess_" + str(i)
@@ -158,7 +174,11 @@ def sess_interest_division(sparse_embedding_dict, user_behavior_input_dict, spar
     return tr_input
 
 
-def sess_interest_extractor(tr_input, sess_max_count, TR):
+def sess_interest_extractor(tr_input, sess_max_count, TR, packed_sessions=False):
+    if packed_sessions:
+        # one call for all sessions, (batch_size, sess_max_count, 1, hist_emb_size)
+        tr_out = TR([tr_input, tr_input])
+        return Reshape((sess_max_count, int(tr_input.get_shape()[-1])))(tr_out)
     tr_out = []
     for i in range(sess_max_count):
         tr_out.append(TR(
@@ -0,0 +1,107 @@
+# -*- coding:utf-8 -*-
+"""
+Search-based retrieval of long-term user behaviors.
+
+Attention models such as DIN and BST score a candidate against a behavior sequence of at most a few hundred steps.
+``BehaviorIndex`` keeps the whole lifetime behavior sequence of every user and retrieves the ``k`` behaviors most
+relevant to a candidate, which are then fed to the model as its ``hist_`` features with ``maxlen=k``.
+
+Reference:
+    [1] Pi Q, Zhou G, Zhang Y, et al. Search-based User Interest Modeling with Lifelong Sequential Behavior Data for Click-Through Rate Prediction[J]. arXiv preprint arXiv:2006.05639, 2020. (https://arxiv.org/abs/2006.05639)
+"""
+
+import numpy as np
+
+
+class BehaviorIndex(object):
+    """Per-user index of lifetime behaviors with the hard and soft search of SIM.
+
+    The hard search returns the latest ``k`` behaviors in the category of the candidate, looked up in a per-user
+    category index. The soft search returns the ``k`` behaviors whose embeddings have the largest inner product with the
+    embedding of the candidate. In both cases the retrieved behaviors keep their chronological order.
+
+      Arguments
+        - **behavior_feature_list**: list of str, the names of the behavior features, e.g. ``["item_id", "cate_id"]`` . Like ``history_feature_list`` of DIN, the retrieved behaviors are returned as ``"hist_" + name`` .
+        - **category_name**: str, the name of the behavior feature the hard search matches on. It must be in ``behavior_feature_list`` .
+        - **length_name**: str, the name the number of retrieved behaviors is returned as.
+    """
+
+    def __init__(self, behavior_feature_list, category_name, length_name="seq_length"):
+        if category_name not in behavior_feature_list:
+            raise ValueError("category_name must be in behavior_feature_list")
+        self.behavior_feature_list = list(behavior_feature_list)
+        self.category_name = category_name
+        self.length_name = length_name
+        self.behaviors = {}
+        self.category_index = {}
+
+    def add(self, user_id, behaviors):
+        """Appends behaviors to the sequence of a user.
+
+        :param user_id: hashable user key.
+        :param behaviors: dict of 1D numpy arrays, the values of every feature in ``behavior_feature_list`` for the new behaviors in the order they happened.
+        """
+        new = {name: np.asarray(behaviors[name]) for name in self.behavior_feature_list}
+        old = self.behaviors.get(user_id)
+        offset = 0 if old is None else len(old[self.category_name])
+        if old is not None:
+            new = {name: np.concatenate([old[name], new[name]]) for name in self.behavior_feature_list}
+        self.behaviors[user_id] = new
+
+        index = self.category_index.setdefault(user_id, {})
+        categories = new[self.category_name][offset:]
+        for category in np.unique(categories):
+            positions = offset + np.flatnonzero(categories == category)
+            index[category] = np.concatenate([index[category], positions]) if category in index else positions
+
+    def hard_search(self, user_ids, categories, k):
+        """Retrieves the latest ``k`` behaviors of each user in the category of the candidate.
+
+        :param user_ids: list of hashable user keys.
+        :param categories: 1D array, the category of the candidate of each user.
+        :param k: int, the number of behaviors to retrieve.
+        :return: dict of numpy arrays with the ``hist_`` features with shape ``(len(user_ids), k)`` , padded with 0 at the end, and the number of retrieved behaviors with shape ``(len(user_ids),)`` .
+        """
+        positions = []
+        for user_id, category in zip(user_ids, np.reshape(categories, (-1,))):
+            positions.append(self.category_index.get(user_id, {}).get(category, np.zeros((0,), dtype=np.int64))[-k:])
+        return self._gather(user_ids, positions, k)
+
+    def soft_search(self, user_ids, candidates, embeddings, k):
+        """Retrieves the ``k`` behaviors of each user whose embeddings have the largest inner product with the embedding
+        of the candidate.
+
+        :param user_ids: list of hashable user keys.
+        :param candidates: dict of 1D arrays, the candidate value of every feature in ``behavior_feature_list`` .
+        :param embeddings: dict of 2D numpy arrays, the embedding table of every feature in ``behavior_feature_list`` , e.g. the weights of the embedding layers of a trained model. A behavior and a candidate are embedded as the concatenation of their feature embeddings.
+        :param k: int, the number of behaviors to retrieve.
+        :return: dict of numpy arrays with the ``hist_`` features with shape ``(len(user_ids), k)`` , padded with 0 at the end, and the number of retrieved behaviors with shape ``(len(user_ids),)`` .
+        """
+        queries = np.concatenate([embeddings[name][np.reshape(candidates[name], (-1,))]
+                                  for name in self.behavior_feature_list], axis=-1)
+        positions = []
+        for user_id, query in zip(user_ids, queries):
+            behaviors = self.behaviors.get(user_id)
+            if behaviors is None:
+                positions.append(np.zeros((0,), dtype=np.int64))
+                continue
+            keys = np.concatenate([embeddings[name][behaviors[name]] for name in self.behavior_feature_list], axis=-1)
+            scores = np.dot(keys, query)
+            if len(scores) > k:
+                positions.append(np.sort(np.argpartition(-scores, k - 1)[:k]))
+            else:
+                positions.append(np.arange(len(scores)))
+        return self._gather(user_ids, positions, k)
+
+    def _gather(self, user_ids, positions, k):
+        result = {"hist_" + name: np.zeros((len(user_ids), k), dtype=np.int64) for name in self.behavior_feature_list}
+        lengths = np.zeros((len(user_ids),), dtype=np.int64)
+        for i, (user_id, position) in enumerate(zip(user_ids, positions)):
+            lengths[i] = len(position)
+            if lengths[i] == 0:
+                continue
+            behaviors = self.behaviors[user_id]
+            for name in self.behavior_feature_list:
+                result["hist_" + name][i, :lengths[i]] = behaviors[name][position]
+        result[self.length_name] = lengths
+        return result
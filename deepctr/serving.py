@@ -0,0 +1,185 @@
+# -*- coding:utf-8 -*-
+"""
+Online serving helpers for DeepCTR models.
+
+``DIENStateCache`` keeps the per-step states of the DIEN interest extractor GRU of every user in a key-value store.
+When a user has new behaviors, only the new steps are computed from the last cached state, and requests are scored
+from the cached states instead of running the interest extractor over the whole behavior history. ``BSTStateCache``
+does the same for the Transformer output of the BST behavior sequence.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from tensorflow.python.keras.models import Model
+
+
+class LRUStore(object):
+    """In-memory key-value store that drops the least recently used key when it holds more than ``max_size`` keys.
+
+    Any object with the same ``get`` and ``put`` methods, e.g. a wrapper around a local on-disk key-value store, can be
+    used in its place.
+
+      Arguments
+        - **max_size**: int, the maximum number of keys.
+    """
+
+    def __init__(self, max_size=100000):
+        if max_size <= 0:
+            raise ValueError("max_size must be a positive integer")
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        value = self._data.pop(key)
+        self._data[key] = value
+        return value
+
+    def put(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = value
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DIENStateCache(object):
+    """Serves a DIEN model from cached interest extractor states.
+
+    For every user the store keeps a numpy array with shape ``(n, embedding_size)`` , the states of the interest
+    extractor GRU after each of the user's last ``n <= maxlen`` behaviors. ``update`` advances them over new behaviors
+    and ``predict`` scores requests from them. As long as a user has at most ``maxlen`` behaviors the predictions equal
+    the ones of the trained model fed with the whole history. Afterwards the cached states keep the GRU state carried
+    over from the dropped behaviors, while the trained model restarts from a zero state at the first kept behavior.
+
+      Arguments
+        - **model**: the model built with ``DIEN(..., incremental_serving=True)`` with the trained weights loaded.
+        - **store**: the key-value store of the states, an object with ``get(key, default)`` and ``put(key, value)`` methods. ``LRUStore()`` by default.
+    """
+
+    def __init__(self, model, store=None):
+        self.store = LRUStore() if store is None else store
+        inputs = dict(zip(model.input_names, model.inputs))
+        self.state_input_names = [name for name in model.input_names if name.startswith("hist_")] + [
+            "seq_length", "interest_initial_state"]
+        self.score_input_names = [name for name in model.input_names if
+                                  name not in self.state_input_names and not name.startswith("interest_")]
+        self.state_model = Model([inputs[name] for name in self.state_input_names], model.outputs[1])
+        self.score_model = Model([inputs[name] for name in self.score_input_names] + [
+            inputs["interest_states"], inputs["interest_states_length"]], model.outputs[0])
+        self.maxlen = model.get_layer("interest_states").output.get_shape()[1]
+        self.maxlen = None if self.maxlen is None else int(self.maxlen)
+        self.embedding_size = int(model.get_layer("interest_initial_state").output.get_shape()[-1])
+
+    def _get_states(self, user_id):
+        return self.store.get(user_id, np.zeros((0, self.embedding_size), dtype=np.float32))
+
+    def update(self, user_ids, x, batch_size=256):
+        """Advances the cached states of the users over their new behaviors.
+
+        :param user_ids: list of hashable user keys, without duplicates.
+        :param x: dict of numpy arrays with the ``hist_`` features of the new behaviors of each user, in the order they happened and padded with 0 at the end, and their number ``seq_length`` .
+        :param batch_size: int, the batch size of the state model.
+        """
+        states = [self._get_states(user_id) for user_id in user_ids]
+        initial_state = np.stack(
+            [s[-1] if len(s) else np.zeros((self.embedding_size,), dtype=np.float32) for s in states])
+        feed = [x[name] for name in self.state_input_names[:-1]] + [initial_state]
+        new_states = self.state_model.predict(feed, batch_size=batch_size)
+        for user_id, s, new_s, length in zip(user_ids, states, new_states, np.reshape(x["seq_length"], (-1,))):
+            s = np.concatenate([s, new_s[:length]], axis=0)
+            if self.maxlen is not None:
+                s = s[-self.maxlen:]
+            self.store.put(user_id, s)
+
+    def predict(self, user_ids, x, batch_size=256):
+        """Scores requests from the cached states of the users. Users without cached states have no behaviors.
+
+        :param user_ids: list of hashable user keys, one for each row of ``x`` .
+        :param x: dict of numpy arrays with the model inputs other than the ``hist_`` features and ``seq_length`` .
+        :param batch_size: int, the batch size of the scoring model.
+        :return: numpy array of predictions.
+        """
+        states = [self._get_states(user_id) for user_id in user_ids]
+        lengths = np.array([len(s) for s in states], dtype=np.int32)
+        maxlen = self.maxlen if self.maxlen is not None else max(int(lengths.max()), 1)
+        interest_states = np.zeros((len(states), maxlen, self.embedding_size), dtype=np.float32)
+        for i, s in enumerate(states):
+            interest_states[i, :len(s)] = s
+        feed = [x[name] for name in self.score_input_names] + [interest_states, lengths[:, None]]
+        return self.score_model.predict(feed, batch_size=batch_size)
+
+
+class BSTStateCache(object):
+    """Serves a BST model from cached Transformer outputs of the behavior sequences.
+
+    The Transformer of BST attends over the behavior sequence only, so its output does not depend on the candidate
+    item. The store keeps it for every ``(user_id, version)`` key as a numpy array with shape ``(n, embedding_size)`` ,
+    where ``n`` is the length of the sequence. The version identifies the behavior sequence of the user, e.g. the
+    number of behaviors or the time of the last one. The self-attention is bidirectional, so a new behavior changes the
+    output at every position: ``update`` recomputes the sequences whose version is not cached yet and skips all others,
+    and ``predict`` only runs the candidate attention and the DNN.
+
+      Arguments
+        - **model**: the model built with ``BST(..., incremental_serving=True)`` with the trained weights loaded.
+        - **store**: the key-value store of the Transformer outputs, an object with ``get(key, default)`` and ``put(key, value)`` methods. ``LRUStore()`` by default.
+    """
+
+    def __init__(self, model, store=None):
+        self.store = LRUStore() if store is None else store
+        inputs = dict(zip(model.input_names, model.inputs))
+        self.state_input_names = [name for name in model.input_names if name.startswith("hist_")] + ["seq_length"]
+        self.score_input_names = [name for name in model.input_names if
+                                  name not in self.state_input_names and name != "history_states"]
+        self.state_model = Model([inputs[name] for name in self.state_input_names], model.outputs[1])
+        self.score_model = Model([inputs[name] for name in self.score_input_names] + [
+            inputs["seq_length"], inputs["history_states"]], model.outputs[0])
+        self.maxlen, self.embedding_size = model.get_layer("history_states").output.get_shape().as_list()[1:]
+
+    def update(self, user_ids, versions, x, batch_size=256):
+        """Computes the Transformer output of the behavior sequences that are not cached yet.
+
+        :param user_ids: list of hashable user keys.
+        :param versions: list of hashable versions of the behavior sequences, one for each user.
+        :param x: dict of numpy arrays with the ``hist_`` features of the whole behavior sequences, padded with 0 at the end, and their length ``seq_length`` .
+        :param batch_size: int, the batch size of the state model.
+        """
+        keys = list(zip(user_ids, versions))
+        index = [i for i, key in enumerate(keys) if self.store.get(key) is None]
+        if not index:
+            return
+        lengths = np.reshape(x["seq_length"], (-1,))
+        states = self.state_model.predict([np.asarray(x[name])[index] for name in self.state_input_names],
+                                          batch_size=batch_size)
+        for i, s in zip(index, states):
+            self.store.put(keys[i], s[:lengths[i]])
+
+    def predict(self, user_ids, versions, x, batch_size=256):
+        """Scores requests from the cached Transformer outputs, which must have been computed by ``update`` .
+
+        :param user_ids: list of hashable user keys, one for each row of ``x`` .
+        :param versions: list of hashable versions of the behavior sequences, one for each row of ``x`` .
+        :param x: dict of numpy arrays with the model inputs other than the ``hist_`` features and ``seq_length`` .
+        :param batch_size: int, the batch size of the scoring model.
+        :return: numpy array of predictions.
+        """
+        states = []
+        for key in zip(user_ids, versions):
+            s = self.store.get(key)
+            if s is None:
+                raise KeyError("the behavior sequence %s is not cached, call update first" % (key,))
+            states.append(s)
+        lengths = np.array([len(s) for s in states], dtype=np.int32)
+        maxlen = self.maxlen if self.maxlen is not None else max(int(lengths.max()), 1)
+        history_states = np.zeros((len(states), maxlen, self.embedding_size), dtype=np.float32)
+        for i, s in enumerate(states):
+            history_states[i, :len(s)] = s
+        feed = [x[name] for name in self.score_input_names] + [lengths[:, None], history_states]
+        return self.score_model.predict(feed, batch_size=batch_size)
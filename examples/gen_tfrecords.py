@@ -1,20 +1,19 @@
-import tensorflow as tf
+import pandas as pd
 
-def make_example(line, sparse_feature_name, dense_feature_name, label_name):
-    features = {feat: tf.train.Feature(int64_list=tf.train.Int64List(value=[int(line[1][feat])])) for feat in
-                sparse_feature_name}
-    features.update(
-        {feat: tf.train.Feature(float_list=tf.train.FloatList(value=[line[1][feat]])) for feat in dense_feature_name})
-    features[label_name] = tf.train.Feature(float_list=tf.train.FloatList(value=[line[1][label_name]]))
-    return tf.train.Example(features=tf.train.Features(feature=features))
+from deepctr.data import write_tfrecords
+from deepctr.feature_column import SparseFeat, DenseFeat
 
+if __name__ == "__main__":
+    sparse_features = ['C' + str(i) for i in range(1, 27)]
+    dense_features = ['I' + str(i) for i in range(1, 14)]
+    # the raw categorical values are kept as strings and hashed by the model
+    feature_columns = [SparseFeat(feat, vocabulary_size=1000, use_hash=True, dtype='string')
+                       for feat in sparse_features] + [DenseFeat(feat, 1) for feat in dense_features]
 
-def write_tfrecord(filename, df, sparse_feature_names, dense_feature_names, label_name):
-    writer = tf.python_io.TFRecordWriter(filename)
-    for line in df.iterrows():
-        ex = make_example(line, sparse_feature_names, dense_feature_names, label_name)
-        writer.write(ex.SerializeToString())
-    writer.close()
-
-# write_tfrecord('./criteo_sample.tr.tfrecords',train,sparse_features,dense_features,'label')
-# write_tfrecord('./criteo_sample.te.tfrecords',test,sparse_features,dense_features,'label')
+    # a CSV file larger than memory is read in chunks, which a pool of 2 processes serializes into 4 files
+    chunks = (chunk.fillna({**{feat: '-1' for feat in sparse_features}, **{feat: 0 for feat in dense_features}})
+              for chunk in pd.read_csv('./criteo_sample.txt', chunksize=100000))
+    filenames, feature_description = write_tfrecords(chunks, feature_columns, './criteo_sample', label='label',
+                                                     num_shards=4, num_workers=2)
+    print(filenames)
+    # read them with deepctr.estimator.inputs.input_fn_tfrecord(filenames, feature_description, 'label')
@@ -2,8 +2,8 @@ import pandas as pd
 from sklearn.metrics import log_loss, roc_auc_score
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, MinMaxScaler
-from tensorflow.python.keras.utils import multi_gpu_model
 
+from deepctr.distribute import get_strategy
 from deepctr.feature_column import SparseFeat, DenseFeat,get_feature_names
 from deepctr.models import DeepFM
 
@@ -43,11 +43,12 @@ if __name__ == "__main__":
     test_model_input = {name: test[name] for name in feature_names}
 
     # 4.Define Model,train,predict and evaluate
-    model = DeepFM(linear_feature_columns, dnn_feature_columns, task='binary')
-    model = multi_gpu_model(model, gpus=2)
-
-    model.compile("adam", "binary_crossentropy",
-                  metrics=['binary_crossentropy'], )
+    # the model is replicated on all local GPUs, set TF_CONFIG to train on a cluster
+    strategy = get_strategy()
+    with strategy.scope():
+        model = DeepFM(linear_feature_columns, dnn_feature_columns, task='binary')
+        model.compile("adam", "binary_crossentropy",
+                      metrics=['binary_crossentropy'], )
 
     history = model.fit(train_model_input, train[target].values,
                         batch_size=256, epochs=10, verbose=2, validation_split=0.2, )
@@ -50,8 +50,9 @@ if __name__ == "__main__":
     model = DeepFMEstimator(linear_feature_columns, dnn_feature_columns, task='binary',
                             config=tf.estimator.RunConfig(tf_random_seed=2021))
 
-    model.train(train_model_input)
-    pred_ans_iter = model.predict(test_model_input)
+    # the hooks feed the DataFrames to the graph of the Estimator
+    model.train(train_model_input, hooks=[train_model_input.hook])
+    pred_ans_iter = model.predict(test_model_input, hooks=[test_model_input.hook])
     pred_ans = list(map(lambda x: x['pred'], pred_ans_iter))
     #
     print("test LogLoss", round(log_loss(test[target].values, pred_ans), 4))
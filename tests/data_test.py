@@ -0,0 +1,256 @@
+import numpy as np
+import pandas as pd
+import pytest
+import tensorflow as tf
+from tensorflow.python.keras.models import load_model
+
+from deepctr.data import BucketedSequence, DenseFeatureStatistics, add_dense_normalization, \
+    bucket_by_sequence_length, get_sequence_lengths, make_csv_dataset, write_tfrecords
+from deepctr.layers import custom_objects
+from deepctr.feature_column import SparseFeat, VarLenSparseFeat, DenseFeat, get_feature_names
+from deepctr.models import DIN, BST, DeepFM
+
+
+def get_xy_variable_length(sample_size=20, max_len=12):
+    feature_columns = [SparseFeat('user', 3, embedding_dim=8), SparseFeat('item_id', 4, embedding_dim=8),
+                       SparseFeat('cate_id', 3, embedding_dim=4), DenseFeat('pay_score', 1)]
+    feature_columns += [
+        VarLenSparseFeat(SparseFeat('hist_item_id', vocabulary_size=4, embedding_dim=8, embedding_name='item_id'),
+                         maxlen=None, length_name="seq_length"),
+        VarLenSparseFeat(SparseFeat('hist_cate_id', 3, embedding_dim=4, embedding_name='cate_id'), maxlen=None,
+                         length_name="seq_length")]
+    seq_length = np.random.randint(1, max_len + 1, sample_size)
+    mask = np.arange(max_len) < seq_length[:, None]
+    feature_dict = {'user': np.random.randint(0, 3, sample_size), 'item_id': np.random.randint(1, 4, sample_size),
+                    'cate_id': np.random.randint(1, 3, sample_size), 'pay_score': np.random.random(sample_size),
+                    'hist_item_id': np.random.randint(1, 4, (sample_size, max_len)) * mask,
+                    'hist_cate_id': np.random.randint(1, 3, (sample_size, max_len)) * mask,
+                    'seq_length': seq_length}
+    x = {name: feature_dict[name] for name in get_feature_names(feature_columns)}
+    y = np.random.randint(0, 2, sample_size)
+    return x, y, feature_columns, ["item_id", "cate_id"]
+
+
+def test_get_sequence_lengths():
+    x, _, feature_columns, _ = get_xy_variable_length()
+    assert np.array_equal(get_sequence_lengths(x, feature_columns), x['seq_length'])
+    feature_columns = [fc._replace(length_name=None) if isinstance(fc, VarLenSparseFeat) else fc
+                       for fc in feature_columns]
+    assert np.array_equal(get_sequence_lengths(x, feature_columns), x['seq_length'])
+
+
+def test_BucketedSequence():
+    x, y, feature_columns, _ = get_xy_variable_length()
+    sequence = BucketedSequence(x, y, feature_columns, batch_size=3, bucket_boundaries=(4, 8))
+    seen = []
+    for i in range(len(sequence)):
+        batch_x, batch_y = sequence[i]
+        max_len = batch_x['seq_length'].max()
+        assert batch_x['hist_item_id'].shape[1] == max_len and batch_x['hist_cate_id'].shape[1] == max_len
+        assert len(np.unique(np.searchsorted([4, 8], batch_x['seq_length'], side='right'))) == 1
+        assert len(batch_y) == len(batch_x['user']) <= 3
+        seen.extend(sequence.batches[i])
+    assert sorted(seen) == list(range(len(y)))
+
+
+@pytest.mark.parametrize(
+    'model_class',
+    [DIN, BST]
+)
+def test_variable_length_model(model_class):
+    if tf.__version__ < '2.0.0':
+        return
+    x, y, feature_columns, behavior_feature_list = get_xy_variable_length()
+    if model_class is BST:
+        model = BST(feature_columns, behavior_feature_list, att_head_num=4)
+    else:
+        model = DIN(feature_columns, behavior_feature_list)
+    model.compile('adam', 'binary_crossentropy')
+    sequence = BucketedSequence(x, y, feature_columns, batch_size=4, bucket_boundaries=(4, 8))
+    model.fit(sequence, epochs=1, verbose=0)
+
+    batch_x, _ = sequence[0]
+    batch_pred = model.predict(batch_x)
+    full_pred = model.predict(x)
+    assert np.allclose(batch_pred, full_pred[sequence.batches[0]], atol=1e-5)
+
+
+def test_bucket_by_sequence_length():
+    x, y, feature_columns, _ = get_xy_variable_length()
+
+    def generator():
+        for i in range(len(y)):
+            length = x['seq_length'][i]
+            yield {'hist_item_id': x['hist_item_id'][i][:length], 'hist_cate_id': x['hist_cate_id'][i][:length],
+                   'seq_length': x['seq_length'][i:i + 1]}, y[i]
+
+    dataset = tf.data.Dataset.from_generator(
+        generator, ({'hist_item_id': tf.int64, 'hist_cate_id': tf.int64, 'seq_length': tf.int64}, tf.int64),
+        ({'hist_item_id': [None], 'hist_cate_id': [None], 'seq_length': [1]}, []))
+    dataset = dataset.apply(bucket_by_sequence_length(feature_columns, batch_size=3, bucket_boundaries=(4, 8)))
+    if tf.__version__ < '2.0.0':
+        return
+    count = 0
+    for features, label in dataset:
+        assert features['hist_item_id'].shape[1] == features['seq_length'].numpy().max()
+        count += len(label)
+    assert count == len(y)
+
+
+@pytest.mark.parametrize(
+    'num_workers',
+    [0, 2]
+)
+def test_write_tfrecords(num_workers, tmpdir):
+    feature_columns = [SparseFeat('user', 10), SparseFeat('city', 3, dtype='string'), DenseFeat('price', 2),
+                       DenseFeat('score', 1),
+                       VarLenSparseFeat(SparseFeat('hist_item', 10), maxlen=3, length_name='hist_len',
+                                        weight_name='hist_weight'),
+                       VarLenSparseFeat(SparseFeat('tags', 3, dtype='string'), maxlen=None)]
+    df = pd.DataFrame({'user': np.arange(10), 'city': ['c%d' % (i % 3) for i in range(10)],
+                       'price': [[i, -i] for i in range(10)], 'score': np.arange(10) * 0.5,
+                       'hist_item': [list(range(i % 5)) for i in range(10)],
+                       'hist_weight': [[0.5] * (i % 5) for i in range(10)],
+                       'tags': [['t'] * (i % 2) for i in range(10)], 'label': np.arange(10) % 2})
+    filenames, feature_description = write_tfrecords(df, feature_columns, str(tmpdir.join('train')), label='label',
+                                                     num_shards=2, chunk_size=4, num_workers=num_workers)
+    assert filenames == [str(tmpdir.join('train-00000-of-00002.tfrecords')),
+                         str(tmpdir.join('train-00001-of-00002.tfrecords'))]
+
+    records = [record.numpy() for record in tf.data.TFRecordDataset(filenames)]
+    assert len(records) == 10
+    for record in records:
+        example = tf.train.Example.FromString(record)
+        i = example.features.feature['user'].int64_list.value[0]
+        length = min(i % 5, 3)
+        expected = {'user': tf.train.Feature(int64_list=tf.train.Int64List(value=[i])),
+                    'city': tf.train.Feature(bytes_list=tf.train.BytesList(value=[b'c%d' % (i % 3)])),
+                    'price': tf.train.Feature(float_list=tf.train.FloatList(value=[i, -i])),
+                    'score': tf.train.Feature(float_list=tf.train.FloatList(value=[i * 0.5])),
+                    'hist_item': tf.train.Feature(
+                        int64_list=tf.train.Int64List(value=list(range(length)) + [0] * (3 - length))),
+                    'hist_weight': tf.train.Feature(
+                        float_list=tf.train.FloatList(value=[0.5] * length + [0.0] * (3 - length))),
+                    'hist_len': tf.train.Feature(int64_list=tf.train.Int64List(value=[length])),
+                    'tags': tf.train.Feature(bytes_list=tf.train.BytesList(value=[b't'] * (i % 2))),
+                    'label': tf.train.Feature(float_list=tf.train.FloatList(value=[i % 2]))}
+        # the same bytes as protobuf gives
+        assert record == tf.train.Example(features=tf.train.Features(feature=expected)).SerializeToString(
+            deterministic=True)
+
+    # the returned spec parses the records
+    features = tf.io.parse_example(records, feature_description)
+    assert features['hist_weight'].shape == (10, 3, 1)
+    assert features['tags'].shape == (10, 1)
+
+
+def test_write_tfrecords_missing_ids(tmpdir):
+    feature_columns = [SparseFeat('user', 10), VarLenSparseFeat(SparseFeat('hist_item', 10), maxlen=2)]
+    # the integer columns read by pd.read_csv are floats when a value is missing
+    df = pd.DataFrame({'user': [1.0, 2.0], 'hist_item': [[3.0], [4.0, 5.0]]})
+    filenames, _ = write_tfrecords(df, feature_columns, str(tmpdir.join('train')))
+    example = tf.train.Example.FromString(next(iter(tf.data.TFRecordDataset(filenames))).numpy())
+    assert example.features.feature['user'].int64_list.value == [1]
+    assert example.features.feature['hist_item'].int64_list.value == [3, 0]
+
+    for column, value in [('user', [1.0, np.nan]), ('hist_item', [[3.0], [np.nan, 5.0]])]:
+        with pytest.raises(ValueError, match=column):
+            write_tfrecords(df.assign(**{column: value}), feature_columns, str(tmpdir.join('missing')))
+
+
+def test_make_csv_dataset(tmpdir):
+    feature_columns = [SparseFeat('user', 10), SparseFeat('city', 3, dtype='string', use_hash=True), DenseFeat('price', 2),
+                       DenseFeat('score', 1),
+                       VarLenSparseFeat(SparseFeat('hist_item', 10), maxlen=3, length_name='hist_len',
+                                        weight_name='hist_weight'),
+                       VarLenSparseFeat(SparseFeat('tags', 3, dtype='string', use_hash=True), maxlen=2)]
+    df = pd.DataFrame({'user': np.arange(10), 'city': ['c%d' % (i % 3) for i in range(10)],
+                       'price': ['%d|%d' % (i, -i) for i in range(10)], 'score': np.arange(10) * 0.5,
+                       'hist_item': ['|'.join(str(j) for j in range(i % 5)) for i in range(10)],
+                       'hist_weight': ['|'.join(['0.5'] * (i % 5)) for i in range(10)],
+                       'tags': ['|'.join(['t'] * (i % 2)) for i in range(10)], 'unused': 'u',
+                       'label': np.arange(10) % 2})
+    filenames = [str(tmpdir.join('train-%d.tsv' % i)) for i in range(2)]
+    df.iloc[:6].to_csv(filenames[0], sep='\t', index=False)
+    df.iloc[6:].to_csv(filenames[1], sep='\t', index=False)
+
+    dataset = make_csv_dataset(str(tmpdir.join('train-*.tsv')), feature_columns, label='label', batch_size=4,
+                               field_delim='\t', shuffle=False)
+    batches = list(dataset.as_numpy_iterator())
+    assert [len(y) for _, y in batches] == [4, 4, 2]
+    x = {name: np.concatenate([batch[name] for batch, _ in batches]) for name in batches[0][0]}
+    y = np.concatenate([y for _, y in batches])
+    lengths = np.minimum(np.arange(10) % 5, 3)
+    mask = np.arange(3) < lengths[:, None]
+    np.testing.assert_array_equal(x['user'], np.arange(10)[:, None])
+    np.testing.assert_array_equal(x['city'], [[b'c%d' % (i % 3)] for i in range(10)])
+    np.testing.assert_allclose(x['price'], [[i, -i] for i in range(10)])
+    np.testing.assert_allclose(x['score'], np.arange(10)[:, None] * 0.5)
+    np.testing.assert_array_equal(x['hist_item'], np.where(mask, np.arange(3), 0))
+    np.testing.assert_allclose(x['hist_weight'], np.where(mask, 0.5, 0)[:, :, None])
+    np.testing.assert_array_equal(x['hist_len'], lengths[:, None])
+    np.testing.assert_array_equal(x['tags'], [[b't' if i % 2 else b'0', b'0'] for i in range(10)])
+    np.testing.assert_allclose(y, np.arange(10) % 2)
+
+    # the batches are exactly the model input
+    model = DeepFM(feature_columns, feature_columns)
+    assert set(x) == set(model.input_names)
+    model.compile('adam', 'binary_crossentropy')
+    model.fit(make_csv_dataset(filenames, feature_columns, label='label', batch_size=4, field_delim='\t', seed=0),
+              verbose=0)
+
+
+@pytest.mark.parametrize(
+    'method',
+    ['standard', 'minmax', 'quantile']
+)
+def test_add_dense_normalization(method, tmpdir):
+    feature_columns = [SparseFeat('user', 10), DenseFeat('price', 2), DenseFeat('score', 1)]
+    df = pd.DataFrame({'user': np.arange(100) % 10, 'price': list(np.random.random((100, 2)) * [10, 100]),
+                       'score': np.random.normal(5, 2, 100)})
+    statistics = DenseFeatureStatistics(feature_columns, num_quantiles=4, sample_size=30)
+    for i in range(0, 100, 30):
+        statistics.update(df.iloc[i:i + 30])
+    values = np.concatenate([np.stack(df['price']), df[['score']].values], axis=1)
+    np.testing.assert_allclose(statistics.mean, values.mean(axis=0))
+    np.testing.assert_allclose(statistics.std, values.std(axis=0))
+    np.testing.assert_allclose(statistics.min, values.min(axis=0))
+    assert statistics.sample.shape == (30, 3)
+
+    model = DeepFM(feature_columns, feature_columns)
+    normalized_model = add_dense_normalization(model, statistics, method)
+    assert normalized_model.input_names == model.input_names
+    x = {'user': df['user'].values, 'price': np.stack(df['price']), 'score': df['score'].values}
+    layer = normalized_model.get_layer('dense_normalization')
+    normalized = np.concatenate(layer([tf.constant(x['price'], tf.float32),
+                                       tf.constant(x['score'][:, None], tf.float32)]), axis=1)
+    if method == 'standard':
+        np.testing.assert_allclose(normalized, (values - values.mean(axis=0)) / values.std(axis=0), atol=1e-4)
+    elif method == 'minmax':
+        np.testing.assert_allclose(normalized.min(axis=0), 0, atol=1e-6)
+        np.testing.assert_allclose(normalized.max(axis=0), 1, atol=1e-6)
+    else:
+        # the fraction of the 3 quantile boundaries below the value
+        np.testing.assert_allclose(normalized * 3, np.round(normalized * 3), atol=1e-5)
+        assert normalized.min() == 0 and normalized.max() == 1
+
+    normalized_model.compile('adam', 'binary_crossentropy')
+    normalized_model.fit(x, np.arange(100) % 2, verbose=0)
+    # the statistics are saved with the model
+    normalized_model.save(str(tmpdir.join('model.h5')))
+    loaded = load_model(str(tmpdir.join('model.h5')), custom_objects)
+    np.testing.assert_allclose(loaded.predict(x), normalized_model.predict(x), rtol=1e-5)
+
+
+def test_add_dense_normalization_dtype():
+    feature_columns = [DenseFeat('price', 1, dtype='float64'), DenseFeat('score', 1)]
+    x = {'price': np.arange(10, dtype=np.float64), 'score': np.arange(10, dtype=np.float32)}
+    statistics = DenseFeatureStatistics(feature_columns)
+    statistics.update(x)
+    model = DeepFM(feature_columns, feature_columns)
+    normalized_model = add_dense_normalization(model, statistics)
+    assert normalized_model.predict(x).shape == (10, 1)
+
+    with pytest.raises(ValueError, match='transform_fn'):
+        add_dense_normalization(model, DenseFeatureStatistics(
+            [DenseFeat('price', 1, transform_fn=lambda x: x / 10), DenseFeat('score', 1)]))
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from deepctr.distribute import DatasetCreator, create_local_cluster, get_strategy, create_dataset
+from deepctr.feature_column import SparseFeat, DenseFeat, get_feature_names
+from deepctr.models import DeepFM
+
+pytestmark = pytest.mark.skipif(DatasetCreator is None or not hasattr(tf.distribute.experimental,
+                                                                      'ParameterServerStrategy'),
+                                reason="deepctr.distribute needs TensorFlow 2.5 or later")
+
+
+def get_test_data(sample_size=256):
+    feature_columns = [SparseFeat('item', 1000, embedding_dim=8), SparseFeat('cate', 10, embedding_dim=8),
+                       DenseFeat('price', 1)]
+    x = {'item': np.random.randint(0, 1000, sample_size), 'cate': np.random.randint(0, 10, sample_size),
+         'price': np.random.random(sample_size).astype(np.float32)}
+    y = np.random.randint(0, 2, sample_size)
+    return x, y, feature_columns
+
+
+def test_mirrored_training():
+    x, y, feature_columns = get_test_data()
+    strategy = get_strategy(tf.distribute.cluster_resolver.SimpleClusterResolver(tf.train.ClusterSpec({})))
+    assert isinstance(strategy, tf.distribute.MirroredStrategy)
+    with strategy.scope():
+        model = DeepFM(feature_columns, feature_columns, dnn_hidden_units=(8,))
+        model.compile('adam', 'binary_crossentropy')
+    model.fit(create_dataset(x, y, strategy, batch_size=64), epochs=1, verbose=0)
+    assert model.predict({name: x[name] for name in get_feature_names(feature_columns)}).shape == (256, 1)
+
+
+def test_parameter_server_training():
+    x, y, feature_columns = get_test_data()
+    strategy = get_strategy(create_local_cluster(num_workers=2, num_ps=2), min_shard_bytes=1024)
+    assert isinstance(strategy, tf.distribute.experimental.ParameterServerStrategy)
+    with strategy.scope():
+        model = DeepFM(feature_columns, feature_columns, dnn_hidden_units=(8,))
+        model.compile('adam', 'binary_crossentropy')
+
+    # the 1000 x 8 item table is split by rows over both parameter servers, the 10 x 8 cate table is not
+    item_table = model.get_layer('sparse_emb_item').embeddings
+    assert len(item_table.variables) == 2
+    assert [v.shape[0] for v in item_table.variables] == [500, 500]
+    assert {v.device for v in item_table.variables} == {'/job:ps/replica:0/task:0/device:CPU:0',
+                                                        '/job:ps/replica:0/task:1/device:CPU:0'}
+    assert not hasattr(model.get_layer('sparse_emb_cate').embeddings, 'variables')
+
+    before = np.concatenate([v.numpy() for v in item_table.variables])
+    model.fit(create_dataset(x, y, strategy, batch_size=64), epochs=2, steps_per_epoch=3, verbose=0)
+    assert not np.allclose(before, np.concatenate([v.numpy() for v in item_table.variables]))
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+import tensorflow as tf
+
+from deepctr.estimator.inputs import input_fn_pandas, input_fn_tfrecord, build_feature_description
+from deepctr.feature_column import SparseFeat, DenseFeat, VarLenSparseFeat
+
+
+def write_tfrecords(path_prefix, num_shards=3, shard_size=10):
+    """Writes records with the ids 0, 1, ... over num_shards files, sequences of length id % 4."""
+    filenames = []
+    for shard in range(num_shards):
+        filename = '%s-%d.tfrecords' % (path_prefix, shard)
+        with tf.io.TFRecordWriter(filename) as writer:
+            for i in range(shard * shard_size, (shard + 1) * shard_size):
+                feature = {'item': tf.train.Feature(int64_list=tf.train.Int64List(value=[i])),
+                           'price': tf.train.Feature(float_list=tf.train.FloatList(value=[i, -i])),
+                           'hist_item': tf.train.Feature(int64_list=tf.train.Int64List(value=[i] * (i % 4))),
+                           'label': tf.train.Feature(float_list=tf.train.FloatList(value=[i % 2]))}
+                writer.write(tf.train.Example(features=tf.train.Features(feature=feature)).SerializeToString())
+        filenames.append(filename)
+    return filenames
+
+
+def get_feature_columns():
+    return [SparseFeat('item', 100), DenseFeat('price', 2),
+            VarLenSparseFeat(SparseFeat('hist_item', 100, embedding_name='item'), maxlen=None)]
+
+
+def test_build_feature_description():
+    feature_description = build_feature_description(
+        get_feature_columns() + [tf.feature_column.numeric_column('age')], label='label')
+    assert feature_description['item'] == tf.io.FixedLenFeature((1,), tf.int64)
+    assert feature_description['price'] == tf.io.FixedLenFeature((2,), tf.float32)
+    assert feature_description['hist_item'] == tf.io.FixedLenSequenceFeature((), tf.int64, allow_missing=True)
+    assert feature_description['age'] == tf.io.FixedLenFeature((1,), tf.float32)
+    assert feature_description['label'] == tf.io.FixedLenFeature((1,), tf.float32)
+
+
+@pytest.mark.parametrize(
+    'cache',
+    [False, True, 'disk']
+)
+def test_input_fn_tfrecord(cache, tmpdir):
+    filenames = write_tfrecords(str(tmpdir.join('train')))
+    if cache == 'disk':
+        cache = str(tmpdir.join('cache'))
+    input_fn = input_fn_tfrecord(str(tmpdir.join('train-*.tfrecords')), get_feature_columns(), 'label', batch_size=4,
+                                 num_epochs=2, shuffle_factor=2, cache=cache)
+    ids = []
+    for features, labels in input_fn():
+        item = features['item'].numpy()[:, 0]
+        np.testing.assert_allclose(features['price'].numpy(), np.stack([item, -item], axis=1))
+        np.testing.assert_allclose(labels.numpy()[:, 0], item % 2)
+        # the sequences are padded to the longest one of the batch
+        hist_item = features['hist_item'].numpy()
+        assert hist_item.shape[1] == np.max(item % 4)
+        np.testing.assert_array_equal(hist_item, (np.arange(hist_item.shape[1]) < (item % 4)[:, None]) * item[:, None])
+        ids.extend(item)
+    assert sorted(ids) == sorted(list(range(30)) * 2)
+
+    # the records of the list of files in order without shuffling
+    input_fn = input_fn_tfrecord(filenames, build_feature_description(get_feature_columns()), batch_size=7,
+                                 shuffle_factor=0, cycle_length=1)
+    np.testing.assert_array_equal(np.concatenate([features['item'].numpy()[:, 0] for features in input_fn()]),
+                                  np.arange(30))
+
+
+@pytest.mark.parametrize(
+    'shuffle',
+    [True, False]
+)
+def test_input_fn_pandas(shuffle):
+    df = pd.DataFrame({'item': np.arange(10), 'price': np.arange(10) * 0.5, 'city': [str(i) for i in range(10)],
+                       'label': np.arange(10) % 2})
+    input_fn = input_fn_pandas(df, ['item', 'price', 'city'], 'label', batch_size=4, num_epochs=2, shuffle=shuffle)
+    ids = []
+    for features, labels in input_fn():
+        item = features['item'].numpy()
+        assert item.shape in [(4,), (2,)]
+        np.testing.assert_allclose(features['price'].numpy(), item * 0.5)
+        np.testing.assert_array_equal(features['city'].numpy(), [str(i).encode() for i in item])
+        np.testing.assert_array_equal(labels.numpy(), item % 2)
+        ids.append(item)
+    ids = np.concatenate(ids)
+    # every epoch goes over all the rows once
+    assert sorted(ids[:10]) == sorted(ids[10:]) == list(range(10))
+    assert (list(ids) != list(range(10)) * 2) == shuffle
+
+    assert set(next(iter(input_fn_pandas(df, ['item'])())).keys()) == {'item'}
+
+
+def test_input_fn_pandas_graph():
+    graph_sizes = []
+    for num_rows in [10, 100000]:
+        df = pd.DataFrame({'item': np.arange(num_rows), 'city': [str(i) for i in range(num_rows)],
+                           'label': np.arange(num_rows) % 2})
+        input_fn = input_fn_pandas(df, ['item', 'city'], 'label', batch_size=4)
+        # the Estimator calls input_fn in its own graph, the arrays are fed by the hook when the session is created
+        with tf.Graph().as_default() as graph:
+            features, labels = input_fn()
+            with tf.compat.v1.train.MonitoredSession(hooks=[input_fn.hook]) as sess:
+                item, city, label = sess.run([features['item'], features['city'], labels])
+        np.testing.assert_array_equal(item, np.arange(4))
+        np.testing.assert_array_equal(city, [str(i).encode() for i in range(4)])
+        np.testing.assert_array_equal(label, np.arange(4) % 2)
+
+        graph_def = graph.as_graph_def()
+        graph_sizes.append(graph_def.ByteSize())
+        # the batches are gathered without a Python function
+        op_types = {node.op for node in graph_def.node}
+        op_types.update(node.op for function in graph_def.library.function for node in function.node_def)
+        assert not op_types & {'PyFunc', 'EagerPyFunc', 'PyFuncStateless'}
+    # the rows are not stored in the graph, only the number of rows
+    assert graph_sizes[1] - graph_sizes[0] < 16
@@ -1,6 +1,9 @@
 from deepctr.models import DeepFM
 from deepctr.feature_column import SparseFeat, DenseFeat, VarLenSparseFeat, get_feature_names
 import numpy as np
+import tensorflow as tf
+
+from .utils import TEST_Estimator
 
 
 def test_long_dense_vector():
@@ -28,3 +31,60 @@ def test_feature_column_sparsefeat_vocabulary_path():
     vlsf = VarLenSparseFeat(sf, 6)
     if vlsf.vocabulary_path != vocab_path:
         raise ValueError("vlsf.vocabulary_path is invalid")
+
+
+def test_estimator_input_from_feature_columns():
+    if not TEST_Estimator:
+        return
+    from deepctr.estimator.feature_column import input_from_feature_columns
+    feature_columns = [tf.feature_column.numeric_column('price', shape=(2,)),
+                       tf.feature_column.embedding_column(
+                           tf.feature_column.categorical_column_with_identity('item', 4), 3),
+                       tf.feature_column.embedding_column(
+                           tf.feature_column.categorical_column_with_identity('cate', 4), 2),
+                       tf.feature_column.numeric_column('age')]
+    x = {'price': np.random.random((5, 2)).astype(np.float32), 'item': np.random.randint(0, 4, (5, 1)),
+         'cate': np.random.randint(0, 4, (5, 1)), 'age': np.random.random((5, 1)).astype(np.float32)}
+    with tf.Graph().as_default():
+        sparse_embedding_list, dense_value_list = input_from_feature_columns(
+            {name: tf.constant(value) for name, value in x.items()}, feature_columns, l2_reg_embedding=1.0)
+        reg_loss = tf.compat.v1.losses.get_regularization_loss()
+        # all the columns are transformed by a single input_layer
+        assert {v.name.split('/')[0] for v in tf.compat.v1.global_variables()} == {'input_layer'}
+        with tf.compat.v1.Session() as sess:
+            sess.run(tf.compat.v1.global_variables_initializer())
+            sparse_embeddings, dense_values, reg_loss = sess.run([sparse_embedding_list, dense_value_list, reg_loss])
+
+    # the outputs keep the order of feature_columns
+    assert [e.shape for e in sparse_embeddings] == [(5, 1, 3), (5, 1, 2)]
+    np.testing.assert_allclose(dense_values[0], x['price'])
+    np.testing.assert_allclose(dense_values[1], x['age'])
+    np.testing.assert_allclose(reg_loss, sum(np.sum(e ** 2) / 2 for e in sparse_embeddings), rtol=1e-5)
+
+
+def test_pack_model_inputs():
+    from deepctr.feature_column import pack_model_inputs, pack_input_data
+    feature_columns = [SparseFeat('user', 4), SparseFeat('item', 5, dtype='int64'),
+                       SparseFeat('city', 3, dtype='string', use_hash=True), DenseFeat('price', 2),
+                       DenseFeat('age', 1),
+                       VarLenSparseFeat(SparseFeat('hist_item', 5, embedding_name='item'), maxlen=3,
+                                        length_name='hist_len', weight_name='hist_weight')]
+    x = {'user': np.array([[1], [0], [3]]), 'item': np.array([[3], [2], [1]]), 'city': np.array([['a'], ['b'], ['a']]),
+         'price': np.random.random((3, 2)), 'age': np.random.random((3, 1)),
+         'hist_item': np.array([[1, 2, 0], [3, 0, 0], [4, 4, 4]]), 'hist_len': np.array([[2], [1], [3]]),
+         'hist_weight': np.random.random((3, 3, 1))}
+    model = DeepFM(feature_columns, feature_columns)
+    packed_model, column_map = pack_model_inputs(model)
+    assert column_map == {'user': ('packed_sparse', 0, 1), 'item': ('packed_sparse', 1, 2),
+                          'price': ('packed_dense', 0, 2), 'age': ('packed_dense', 2, 3),
+                          'hist_len': ('packed_sparse', 2, 3)}
+    assert packed_model.input_names == ['packed_sparse', 'packed_dense', 'city', 'hist_item', 'hist_weight']
+
+    packed_x = pack_input_data(x, column_map)
+    np.testing.assert_array_equal(packed_x['packed_sparse'], np.concatenate([x['user'], x['item'], x['hist_len']], 1))
+    np.testing.assert_allclose(packed_x['packed_dense'], np.concatenate([x['price'], x['age']], 1))
+    # the packed model shares the weights of the model
+    np.testing.assert_allclose(packed_model.predict(packed_x), model.predict(x), rtol=1e-6)
+    packed_model.compile('adagrad', 'binary_crossentropy')
+    packed_model.fit(packed_x, np.array([1, 0, 1]), verbose=0)
+    np.testing.assert_allclose(packed_model.predict(packed_x), model.predict(x), rtol=1e-6)
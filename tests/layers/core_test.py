@@ -1,6 +1,9 @@
+import numpy as np
 import pytest
 import tensorflow as tf
-from tensorflow.python.keras.layers import PReLU
+from numpy.testing import assert_allclose
+from tensorflow.python.keras.layers import Input, PReLU
+from tensorflow.python.keras.models import Model
 
 try:
     from tensorflow.python.keras.utils.generic_utils import CustomObjectScope
@@ -13,22 +16,40 @@ from tests.utils import layer_test
 
 
 @pytest.mark.parametrize(
-    'hidden_units,activation',
-    [(hidden_units, activation)
+    'hidden_units,activation,decompose_input',
+    [(hidden_units, activation, decompose_input)
      for hidden_units in [(), (10,)]
      for activation in ['sigmoid', Dice, PReLU]
+     for decompose_input in [False, True]
      ]
 )
-def test_LocalActivationUnit(hidden_units, activation):
+def test_LocalActivationUnit(hidden_units, activation, decompose_input):
     if tf.__version__ >= '1.13.0' and activation != 'sigmoid':
         return
 
     with CustomObjectScope({'LocalActivationUnit': layers.LocalActivationUnit}):
         layer_test(layers.LocalActivationUnit,
-                   kwargs={'hidden_units': hidden_units, 'activation': activation, 'dropout_rate': 0.5},
+                   kwargs={'hidden_units': hidden_units, 'activation': activation, 'dropout_rate': 0.5,
+                           'decompose_input': decompose_input},
                    input_shape=[(BATCH_SIZE, 1, EMBEDDING_SIZE), (BATCH_SIZE, SEQ_LENGTH, EMBEDDING_SIZE)])
 
 
+@pytest.mark.parametrize(
+    'hidden_units',
+    [(), (10,), (10, 6)]
+)
+def test_LocalActivationUnit_decompose_input(hidden_units):
+    query = Input((1, EMBEDDING_SIZE))
+    keys = Input((SEQ_LENGTH, EMBEDDING_SIZE))
+    model = Model([query, keys], layers.LocalActivationUnit(hidden_units)([query, keys]))
+    decomposed_model = Model([query, keys],
+                             layers.LocalActivationUnit(hidden_units, decompose_input=True)([query, keys]))
+    decomposed_model.set_weights(model.get_weights())
+
+    x = [np.random.random((BATCH_SIZE, 1, EMBEDDING_SIZE)), np.random.random((BATCH_SIZE, SEQ_LENGTH, EMBEDDING_SIZE))]
+    assert_allclose(decomposed_model.predict(x), model.predict(x), rtol=1e-5, atol=1e-6)
+
+
 @pytest.mark.parametrize(
     'hidden_units,use_bn',
     [(hidden_units, use_bn)
@@ -43,6 +64,103 @@ def test_DNN(hidden_units, use_bn):
                        BATCH_SIZE, EMBEDDING_SIZE))
 
 
+@pytest.mark.parametrize(
+    'hidden_units,use_bn,input_shape',
+    [(hidden_units, use_bn, input_shape)
+     for hidden_units in [(), (10, 4)]
+     for use_bn in [True, False]
+     for input_shape in [(BATCH_SIZE, EMBEDDING_SIZE), (BATCH_SIZE, 3, EMBEDDING_SIZE)]
+     ]
+)
+def test_ExpertBank(hidden_units, use_bn, input_shape):
+    with CustomObjectScope({'ExpertBank': layers.ExpertBank}):
+        layer_test(layers.ExpertBank, kwargs={'num_experts': 3, 'hidden_units': hidden_units, 'use_bn': use_bn,
+                                              'dropout_rate': 0.5}, input_shape=input_shape)
+
+
+def test_ExpertBank_matches_DNN():
+    bank = layers.ExpertBank(3, (10, 4))
+    dnn = layers.DNN((10, 4))
+    x = tf.constant(np.random.random((BATCH_SIZE, 3, EMBEDDING_SIZE)).astype(np.float32))
+    output = bank(x)
+    dnn(x[:, 0])
+    for i in range(3):
+        dnn.set_weights([w[i] for w in bank.get_weights()])
+        assert_allclose(output[:, i], dnn(x[:, i]), rtol=1e-5, atol=1e-6)
+        assert_allclose(bank(x[:, 0])[:, i], dnn(x[:, 0]), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    'use_bn',
+    [True, False]
+)
+def test_ExpertBank_expert_index(use_bn):
+    bank = layers.ExpertBank(4, (10, 4), use_bn=use_bn)
+    sub_bank = layers.ExpertBank(4, (10, 4), use_bn=use_bn, expert_index=[3, 1])
+    x = tf.constant(np.random.random((BATCH_SIZE, EMBEDDING_SIZE)).astype(np.float32))
+    output = bank(x)
+    sub_bank(x)
+    sub_bank.set_weights(bank.get_weights())
+    assert sub_bank.compute_output_shape((BATCH_SIZE, EMBEDDING_SIZE)) == (BATCH_SIZE, 2, 4)
+    assert_allclose(sub_bank(x), tf.gather(output, [3, 1], axis=1), rtol=1e-5, atol=1e-6)
+    assert_allclose(sub_bank(tf.gather(tf.stack([x] * 4, axis=1), [3, 1], axis=1)), tf.gather(output, [3, 1], axis=1),
+                    rtol=1e-5, atol=1e-6)
+
+
+def test_ExpertBank_expert_index_training():
+    bank = layers.ExpertBank(4, (10, 4), use_bn=True)
+    sub_bank = layers.ExpertBank(4, (10, 4), use_bn=True, expert_index=[3, 1])
+    x = tf.constant(np.random.random((BATCH_SIZE, EMBEDDING_SIZE)).astype(np.float32))
+    bank(x, training=False)
+    sub_bank(x, training=False)
+    sub_bank.set_weights(bank.get_weights())
+    # in training the batch statistics of the computed experts are used, and only their moving statistics updated
+    assert_allclose(sub_bank(x, training=True), tf.gather(bank(x, training=True), [3, 1], axis=1), rtol=1e-5,
+                    atol=1e-6)
+    for sub_weight, weight in zip(sub_bank.bn_layers[0].weights, bank.bn_layers[0].weights):
+        assert_allclose(tf.gather(sub_weight, [3, 1], axis=1), tf.gather(weight, [3, 1], axis=1), rtol=1e-5,
+                        atol=1e-6)
+    assert_allclose(sub_bank.bn_layers[0].moving_mean[:, 0], 0)
+    assert_allclose(sub_bank.bn_layers[0].moving_variance[:, 2], 1)
+    assert not np.allclose(sub_bank.bn_layers[0].moving_mean[:, 3], 0)
+
+
+@pytest.mark.parametrize(
+    'learning_phase',
+    [0, 1]
+)
+def test_ExpertBank_expert_index_learning_phase(learning_phase):
+    bank = layers.ExpertBank(4, (10, 4), use_bn=True)
+    sub_bank = layers.ExpertBank(4, (10, 4), use_bn=True, expert_index=[3, 1])
+    x = tf.constant(np.random.random((BATCH_SIZE, EMBEDDING_SIZE)).astype(np.float32))
+    bank(x, training=False)
+    sub_bank(x, training=False)
+    sub_bank.set_weights(bank.get_weights())
+    # without training, both follow the global learning phase of the public Keras backend, which other tests set
+    with tf.keras.backend.learning_phase_scope(learning_phase):
+        assert_allclose(sub_bank(x), tf.gather(bank(x), [3, 1], axis=1), rtol=1e-5, atol=1e-6)
+    assert np.allclose(sub_bank.bn_layers[0].moving_mean[:, 3], 0) != learning_phase
+
+
+@pytest.mark.parametrize(
+    'use_bn',
+    [True, False]
+)
+def test_ExpertBank_set_dnn_weights(use_bn):
+    x = tf.constant(np.random.random((BATCH_SIZE, EMBEDDING_SIZE)).astype(np.float32))
+    dnns = [layers.DNN((10, 4), use_bn=use_bn, seed=i) for i in range(3)]
+    for dnn in dnns:
+        # moves the BatchNormalization statistics away from their initial values
+        dnn(x, training=True)
+    bank = layers.ExpertBank(3, (10, 4), use_bn=use_bn)
+    bank(x, training=False)
+    bank.set_dnn_weights([dnn.get_weights() for dnn in dnns])
+    assert_allclose(bank(x, training=False), tf.stack([dnn(x, training=False) for dnn in dnns], axis=1), rtol=1e-5,
+                    atol=1e-6)
+    with pytest.raises(ValueError):
+        bank.set_dnn_weights([dnn.get_weights() for dnn in dnns[:2]])
+
+
 @pytest.mark.parametrize(
     'task,use_bias',
     [(task, use_bias)
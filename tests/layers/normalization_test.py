@@ -1,4 +1,6 @@
+import numpy as np
 import pytest
+import tensorflow as tf
 
 try:
     from tensorflow.python.keras.utils.generic_utils import CustomObjectScope
@@ -18,3 +20,27 @@ def test_LayerNormalization(axis):
     with CustomObjectScope({'LayerNormalization': layers.LayerNormalization}):
         layer_test(layers.LayerNormalization, kwargs={"axis": axis, }, input_shape=(
             BATCH_SIZE, FIELD_SIZE, EMBEDDING_SIZE))
+
+
+@pytest.mark.parametrize(
+    'kwargs',
+    [{'offset': [0.5] * EMBEDDING_SIZE, 'scale': [2.0] * EMBEDDING_SIZE},
+     {'boundaries': [[-1.0, 0.0, 1.0]] * EMBEDDING_SIZE, 'clip': (0.0, 0.5)}
+     ]
+)
+def test_DenseNormalization(kwargs):
+    with CustomObjectScope({'DenseNormalization': layers.DenseNormalization}):
+        layer_test(layers.DenseNormalization, kwargs=kwargs, input_shape=(BATCH_SIZE, EMBEDDING_SIZE))
+
+
+def test_DenseNormalization_values():
+    x = np.array([[-2.0, 3.0], [0.5, 1.0], [1.0, -1.0]], dtype=np.float32)
+    layer = layers.DenseNormalization(offset=[1.0, -1.0], scale=[2.0, 4.0])
+    # the list inputs are normalized together and split back
+    outputs = layer([tf.constant(x[:, :1]), tf.constant(x[:, 1:])])
+    np.testing.assert_allclose(np.concatenate(outputs, axis=1), (x - [1.0, -1.0]) / [2.0, 4.0])
+    # float64 inputs, also without the cast of the inputs by Keras
+    outputs = layer.call([tf.constant(x[:, :1], dtype=tf.float64), tf.constant(x[:, 1:])])
+    np.testing.assert_allclose(np.concatenate(outputs, axis=1), (x - [1.0, -1.0]) / [2.0, 4.0])
+    layer = layers.DenseNormalization(boundaries=[[-1.0, 0.0, 1.0], [0.0, 1.0, 2.0]])
+    np.testing.assert_allclose(layer(tf.constant(x)), [[0.0, 1.0], [2 / 3.0, 2 / 3.0], [1.0, 0.0]])
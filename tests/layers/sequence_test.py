@@ -1,4 +1,6 @@
+import numpy as np
 import pytest
+from numpy.testing import assert_allclose
 from packaging import version
 
 try:
@@ -6,6 +8,9 @@ try:
 except ImportError:
     from tensorflow.python.keras.utils import CustomObjectScope
 import tensorflow as tf
+from tensorflow.python.keras.layers import Input, LSTM
+from tensorflow.python.keras.models import Model
+
 from deepctr.layers import sequence
 
 from tests.utils import layer_test
@@ -81,9 +86,45 @@ def test_BiLSTM(merge_mode):
                    input_shape=(BATCH_SIZE, SEQ_LENGTH, EMBEDDING_SIZE))
 
 
+def test_BiLSTM_sequence_length():
+    layer = sequence.BiLSTM(EMBEDDING_SIZE, res_layers=1, dropout_rate=0.0, merge_mode='concat')
+    x = np.random.random((2, SEQ_LENGTH, EMBEDDING_SIZE)).astype(np.float32)
+    output = layer([tf.constant(x), tf.constant([[2], [SEQ_LENGTH - 1]])])
+    for i, length in enumerate([2, SEQ_LENGTH - 1]):
+        assert_allclose(output[i, :length], layer(tf.constant(x[i:i + 1, :length]))[0], rtol=1e-5, atol=1e-6)
+        np.testing.assert_array_equal(output[i, length:], 0)
+
+
+@pytest.mark.parametrize(
+    'merge_mode',
+    ['concat', 'bw']
+)
+def test_BiLSTM_matches_unrolled(merge_mode):
+    # on full length sequences the loop gives the outputs of the former unrolled implementation with go_backwards
+    layer = sequence.BiLSTM(EMBEDDING_SIZE, layers=2, res_layers=1, dropout_rate=0.0, merge_mode=merge_mode)
+    x = tf.constant(np.random.random((BATCH_SIZE, SEQ_LENGTH, EMBEDDING_SIZE)).astype(np.float32))
+    output = layer(x)
+
+    input_fw, input_bw = x, x
+    for i in range(2):
+        fw_lstm = LSTM(EMBEDDING_SIZE, return_sequences=True, unroll=True)
+        bw_lstm = LSTM(EMBEDDING_SIZE, return_sequences=True, go_backwards=True, unroll=True)
+        fw_lstm(input_fw)
+        bw_lstm(input_bw)
+        fw_lstm.set_weights(layer.fw_lstm[i].get_weights())
+        bw_lstm.set_weights(layer.bw_lstm[i].get_weights())
+        output_fw, output_bw = fw_lstm(input_fw), tf.reverse(bw_lstm(input_bw), [1])
+        if i == 1:
+            output_fw += input_fw
+            output_bw += input_bw
+        input_fw, input_bw = output_fw, output_bw
+    expected = tf.concat([input_fw, input_bw], axis=-1) if merge_mode == 'concat' else input_bw
+    assert_allclose(output, expected, rtol=1e-5, atol=1e-5)
+
+
 @pytest.mark.parametrize(
     'attention_type',
-    ['scaled_dot_product', 'cos', 'ln', 'additive']
+    ['scaled_dot_product', 'cos', 'ln', 'additive', 'local', 'linear', 'memory']
 )
 def test_Transformer(attention_type):
     with CustomObjectScope({'Transformer': sequence.Transformer}):
@@ -94,6 +135,51 @@ def test_Transformer(attention_type):
                                 (BATCH_SIZE, 1), (BATCH_SIZE, 1)])
 
 
+@pytest.mark.parametrize(
+    'attention_type,query_chunk_size',
+    [(attention_type, query_chunk_size)
+     for attention_type in ['scaled_dot_product', 'additive']
+     for query_chunk_size in [1, 3, SEQ_LENGTH]
+     ]
+)
+def test_Transformer_query_chunk_size(attention_type, query_chunk_size):
+    inputs = [Input((SEQ_LENGTH, EMBEDDING_SIZE)), Input((SEQ_LENGTH, EMBEDDING_SIZE)), Input((1,), dtype='int32'),
+              Input((1,), dtype='int32')]
+    kwargs = {'att_embedding_size': 2, 'head_num': 4, 'attention_type': attention_type, 'output_type': None}
+    model = Model(inputs, sequence.Transformer(**kwargs)(inputs))
+    chunked_model = Model(inputs, sequence.Transformer(query_chunk_size=query_chunk_size, **kwargs)(inputs))
+    chunked_model.set_weights(model.get_weights())
+
+    x = [np.random.random((BATCH_SIZE, SEQ_LENGTH, EMBEDDING_SIZE)),
+         np.random.random((BATCH_SIZE, SEQ_LENGTH, EMBEDDING_SIZE)),
+         np.random.randint(0, SEQ_LENGTH + 1, (BATCH_SIZE, 1)), np.random.randint(0, SEQ_LENGTH + 1, (BATCH_SIZE, 1))]
+    x[3] = x[2]
+    assert_allclose(chunked_model.predict(x), model.predict(x), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    'attention_type,blinding,kwargs',
+    [('local', True, {'window_size': SEQ_LENGTH}), ('local', False, {'window_size': SEQ_LENGTH, 'query_chunk_size': 3}),
+     ('memory', False, {'memory_size': SEQ_LENGTH})]
+)
+def test_Transformer_subquadratic_full_range(attention_type, blinding, kwargs):
+    # with a window or memory covering the whole sequence these modes reduce to scaled dot-product attention
+    inputs = [Input((SEQ_LENGTH, EMBEDDING_SIZE)), Input((SEQ_LENGTH, EMBEDDING_SIZE)), Input((1,), dtype='int32'),
+              Input((1,), dtype='int32')]
+    common = {'att_embedding_size': 2, 'head_num': 4, 'blinding': blinding, 'output_type': None}
+    model = Model(inputs, sequence.Transformer(**common)(inputs))
+    other_model = Model(inputs, sequence.Transformer(attention_type=attention_type, **dict(common, **kwargs))(inputs))
+    other_model.set_weights(model.get_weights())
+
+    x = [np.random.random((BATCH_SIZE, SEQ_LENGTH, EMBEDDING_SIZE)),
+         np.random.random((BATCH_SIZE, SEQ_LENGTH, EMBEDDING_SIZE)),
+         np.random.randint(2, SEQ_LENGTH + 1, (BATCH_SIZE, 1)), None]
+    # with blinding a sequence of length 1 has no key to attend to, which local attention maps to zeros while
+    # scaled dot-product attention spreads it uniformly, so the sequences have at least 2 steps
+    x[3] = x[2]
+    assert_allclose(other_model.predict(x), model.predict(x), rtol=1e-5, atol=1e-5)
+
+
 def test_KMaxPooling():
     with CustomObjectScope({'KMaxPooling': sequence.KMaxPooling}):
         layer_test(sequence.KMaxPooling, kwargs={'k': 3, 'axis': 1},
@@ -111,3 +197,65 @@ def test_PositionEncoding(pos_embedding_trainable, zero_pad):
         layer_test(sequence.PositionEncoding,
                    kwargs={'pos_embedding_trainable': pos_embedding_trainable, 'zero_pad': zero_pad},
                    input_shape=(BATCH_SIZE, SEQ_LENGTH, EMBEDDING_SIZE))
+
+
+def test_PositionEncoding_variable_length():
+    layer = sequence.PositionEncoding(pos_embedding_trainable=False)
+    outputs = layer(Input((None, EMBEDDING_SIZE)))
+    assert outputs.shape.as_list() == [None, None, EMBEDDING_SIZE]
+    # a trainable encoding needs a fixed length
+    with pytest.warns(UserWarning, match='pos_embedding_trainable'):
+        sequence.PositionEncoding(pos_embedding_trainable=True)(Input((None, EMBEDDING_SIZE)))
+
+
+@pytest.mark.parametrize(
+    'gru_type',
+    ['GRU', 'AGRU', 'AUGRU']
+)
+def test_DynamicGRU_matches_cells(gru_type):
+    # the projected cell of DynamicGRU computes the same recurrence as the original cells with the same weights
+    from deepctr.contrib.utils import QAAttGRUCell, VecAttGRUCell
+    num_units = 4
+    x = np.random.random((BATCH_SIZE, SEQ_LENGTH, EMBEDDING_SIZE)).astype(np.float32)
+    # includes an empty and a full sequence, the steps past the length are masked
+    lengths = np.array([[0], [3], [SEQ_LENGTH], [7]], dtype=np.int32)
+    att_scores = np.random.random((BATCH_SIZE, SEQ_LENGTH, 1)).astype(np.float32)
+    with tf.Graph().as_default():
+        inputs = [tf.constant(x), tf.constant(lengths)]
+        if gru_type != 'GRU':
+            inputs.append(tf.constant(att_scores))
+        layer = sequence.DynamicGRU(num_units, gru_type=gru_type, return_sequence=True)
+        outputs = layer(inputs)
+        state_layer = sequence.DynamicGRU(num_units, gru_type=gru_type, return_sequence=False)
+        final_state = state_layer(inputs)
+
+        with tf.compat.v1.variable_scope('reference'):
+            if gru_type == 'GRU':
+                cell = tf.compat.v1.nn.rnn_cell.GRUCell(num_units)
+            else:
+                cell = QAAttGRUCell(num_units) if gru_type == 'AGRU' else VecAttGRUCell(num_units)
+            state = tf.zeros((BATCH_SIZE, num_units))
+            expected_outputs = []
+            for t in range(SEQ_LENGTH):
+                if gru_type == 'GRU':
+                    new_state, _ = cell(inputs[0][:, t], state)
+                else:
+                    new_state, _ = cell(inputs[0][:, t], state, inputs[2][:, t])
+                valid = tf.constant(t < lengths)
+                state = tf.where(tf.tile(valid, [1, num_units]), new_state, state)
+                expected_outputs.append(tf.where(tf.tile(valid, [1, num_units]), new_state, tf.zeros_like(state)))
+            expected_outputs = tf.stack(expected_outputs, axis=1)
+        reference_weights = [v for v in tf.compat.v1.global_variables() if v.name.startswith('reference/')]
+
+        with tf.compat.v1.Session() as sess:
+            sess.run(tf.compat.v1.global_variables_initializer())
+            # gates/kernel, gates/bias, candidate/kernel, candidate/bias in both
+            weights = sess.run(reference_weights)
+            assert [w.shape for w in weights] == [tuple(w.shape) for w in layer.weights]
+            for v, w in zip(layer.weights + state_layer.weights, weights + weights):
+                v.load(w, sess)
+            outputs, final_state, expected_outputs, expected_state = sess.run(
+                [outputs, final_state, expected_outputs, state])
+    assert_allclose(outputs, expected_outputs, rtol=1e-5, atol=1e-6)
+    assert_allclose(final_state[:, 0], expected_state, rtol=1e-5, atol=1e-6)
+    assert_allclose(outputs[0], 0)
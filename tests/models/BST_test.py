@@ -1,20 +1,73 @@
+import numpy as np
+import pytest
+
+from deepctr.feature_column import VarLenSparseFeat
 from deepctr.models import BST
-from ..utils import check_model
+from deepctr.serving import BSTStateCache
+from ..utils import check_model, check_candidate_scoring
 from .DIN_test import get_xy_fd
 
 
-def test_BST():
+@pytest.mark.parametrize(
+    'att_type',
+    ['scaled_dot_product', 'local', 'linear', 'memory']
+)
+def test_BST(att_type):
     model_name = "BST"
 
     x, y, feature_columns, behavior_feature_list = get_xy_fd(hash_flag=True)
 
     model = BST(dnn_feature_columns=feature_columns,
                 history_feature_list=behavior_feature_list,
-                att_head_num=4)
+                att_head_num=4, att_type=att_type, att_window_size=1, att_memory_size=2)
 
     check_model(model, model_name, x, y,
                 check_model_io=True)
 
 
+def test_BST_candidate_scoring():
+    x, y, feature_columns, behavior_feature_list = get_xy_fd(hash_flag=True)
+
+    model = BST(dnn_feature_columns=feature_columns, history_feature_list=behavior_feature_list, att_head_num=4)
+    scoring_model = BST(dnn_feature_columns=feature_columns, history_feature_list=behavior_feature_list,
+                        att_head_num=4, candidate_scoring=True)
+
+    check_candidate_scoring(model, scoring_model, x,
+                            {'item_id': np.array([1, 2, 3, 2, 1]), 'cate_id': np.array([1, 2, 1, 2, 2])})
+
+
+@pytest.mark.parametrize(
+    'maxlen',
+    [4, None]
+)
+def test_BST_incremental_serving(maxlen):
+    x, y, feature_columns, behavior_feature_list = get_xy_fd(hash_flag=True)
+    if maxlen is None:
+        # the cached outputs are padded to the longest cached sequence of the request
+        feature_columns = [fc._replace(maxlen=None) if isinstance(fc, VarLenSparseFeat) else fc
+                           for fc in feature_columns]
+
+    model = BST(dnn_feature_columns=feature_columns, history_feature_list=behavior_feature_list, att_head_num=4,
+                transformer_num=2)
+    serving_model = BST(dnn_feature_columns=feature_columns, history_feature_list=behavior_feature_list,
+                        att_head_num=4, transformer_num=2, incremental_serving=True)
+    for layer in serving_model.layers:
+        if layer.weights:
+            layer.set_weights(model.get_layer(layer.name).get_weights())
+
+    cache = BSTStateCache(serving_model)
+    user_ids = list(x['user'])
+    versions = list(x['seq_length'])
+    cache.update(user_ids, versions, x)
+    assert len(cache.store) == 3
+    cache.update(user_ids, versions, x)
+    assert len(cache.store) == 3
+
+    request = {name: value for name, value in x.items() if not name.startswith('hist_') and name != 'seq_length'}
+    np.testing.assert_allclose(cache.predict(user_ids, versions, request), model.predict(x), rtol=1e-5, atol=1e-6)
+    with pytest.raises(KeyError):
+        cache.predict(user_ids, [version + 1 for version in versions], request)
+
+
 if __name__ == "__main__":
     pass
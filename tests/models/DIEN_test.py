@@ -5,7 +5,14 @@ from packaging import version
 
 from deepctr.feature_column import SparseFeat, VarLenSparseFeat, DenseFeat, get_feature_names
 from deepctr.models import DIEN
-from ..utils import check_model
+from deepctr.models.sequence.dien import sample_negative_behavior
+from deepctr.serving import DIENStateCache, LRUStore
+from ..utils import check_model, check_candidate_scoring
+
+# from TF 2.6 tf.keras is the separate keras package, the BatchNormalization of Dice falls back to it and DIEN mixes the
+# two Keras stacks, it fails to build with "Could not find variable"
+skip_mixed_keras = pytest.mark.skipif(version.parse(tf.__version__) >= version.parse('2.6.0'),
+                                      reason="DIEN mixes the Keras stacks from TF 2.6")
 
 
 def get_xy_fd(use_neg=False, hash_flag=False):
@@ -75,6 +82,24 @@ def test_DIEN(gru_type):
                 check_model_io=(gru_type == "GRU"))  # TODO:fix bugs when load model in other type
 
 
+@skip_mixed_keras
+@pytest.mark.parametrize(
+    'gru_type',
+    ['GRU', 'AIGRU', 'AGRU', 'AUGRU']
+)
+def test_DIEN_candidate_scoring(gru_type):
+    x, y, feature_columns, behavior_feature_list = get_xy_fd(hash_flag=True)
+
+    # DIEN initializes its variables in the session of the default graph, so on TF 2.0 - 2.5 it is built in graph mode
+    with tf.Graph().as_default():
+        model = DIEN(feature_columns, behavior_feature_list, dnn_hidden_units=[4, 4, 4], gru_type=gru_type)
+        scoring_model = DIEN(feature_columns, behavior_feature_list, dnn_hidden_units=[4, 4, 4], gru_type=gru_type,
+                             candidate_scoring=True)
+
+        check_candidate_scoring(model, scoring_model, x,
+                                {'item': np.array([1, 2, 3, 2, 1]), 'item_gender': np.array([1, 2, 1, 2, 2])})
+
+
 def test_DIEN_neg():
     model_name = "DIEN_neg"
     if version.parse(tf.__version__) >= version.parse("1.14.0"):
@@ -87,5 +112,108 @@ def test_DIEN_neg():
     check_model(model, model_name, x, y)
 
 
+@skip_mixed_keras
+@pytest.mark.parametrize(
+    'neg_sampler',
+    ['in_batch', 'frequency']
+)
+def test_DIEN_neg_sampler(neg_sampler):
+    model_name = "DIEN_neg_" + neg_sampler
+
+    x, y, feature_columns, behavior_feature_list = get_xy_fd(hash_flag=True)
+
+    # DIEN initializes its variables in the session of the default graph, so on TF 2.0 - 2.5 it is built in graph mode
+    with tf.Graph().as_default():
+        model = DIEN(feature_columns, behavior_feature_list, dnn_hidden_units=[4, 4, 4], gru_type="AUGRU",
+                     use_negsampling=True, neg_sampler=neg_sampler, neg_sampling_counts=[0, 10, 5, 1],
+                     neg_sampling_side_features={'item_gender': [0, 1, 2, 1]})
+        assert not any(name.startswith('neg_') for name in model.input_names)
+        check_model(model, model_name, x, y, check_model_io=False)
+
+
+def test_DIEN_neg_sampler_arguments():
+    x, y, feature_columns, behavior_feature_list = get_xy_fd(hash_flag=True)
+    with pytest.raises(ValueError):
+        DIEN(feature_columns, behavior_feature_list, neg_sampler='in_batch')
+    with pytest.raises(ValueError):
+        DIEN(feature_columns, behavior_feature_list, gru_type="AUGRU", use_negsampling=True, neg_sampler='frequency',
+             neg_sampling_counts=[0, 10, 5, 1])
+
+
+def test_sample_negative_behavior():
+    batch_size, seq_len = 4, 3
+    valid = np.arange(seq_len)[None, :] < np.array([[3], [1], [0], [2]])
+    history_feature_columns = [VarLenSparseFeat(SparseFeat('hist_item', 4, embedding_name='item'), maxlen=seq_len),
+                               VarLenSparseFeat(SparseFeat('hist_cate', 3, embedding_name='cate'), maxlen=seq_len)]
+    # graph mode, as the model, also when eager execution has been disabled by another test
+    with tf.Graph().as_default(), tf.compat.v1.Session() as sess:
+        # the embedding of every behavior is its flat position in the batch, the one of an id is the id
+        keys_emb = tf.reshape(tf.range(batch_size * seq_len, dtype=tf.float32), [batch_size, seq_len, 1])
+        embedding_dict = {name: tf.keras.layers.Embedding(
+            size, 1, embeddings_initializer=tf.keras.initializers.Constant(np.arange(size)[:, None]))
+            for name, size in [('item', 4), ('cate', 3)]}
+        in_batch = sample_negative_behavior(keys_emb, tf.constant(valid.sum(axis=1)[:, None]), 'in_batch')
+        empty = sample_negative_behavior(keys_emb, tf.zeros((batch_size, 1), tf.int32), 'in_batch')
+        frequency = sample_negative_behavior(keys_emb, tf.constant(valid.sum(axis=1)[:, None]), 'frequency',
+                                             embedding_dict, history_feature_columns, 'item', [0, 10, 5, 1],
+                                             {'cate': [0, 2, 1, 2]})
+        sess.run(tf.compat.v1.global_variables_initializer())
+
+        for _ in range(20):
+            neg = sess.run(in_batch)[:, :, 0].astype(int)
+            # only the other clicked behaviors of the batch are drawn
+            assert valid.reshape(-1)[neg[valid]].all()
+            assert (neg[valid] != np.arange(batch_size * seq_len).reshape(batch_size, seq_len)[valid]).all()
+        # a batch without any behavior does not fail
+        assert np.isfinite(sess.run(empty)).all()
+
+        # the side features of the drawn items are the ones of the items
+        neg = sess.run(frequency).astype(int)
+    items, cates = neg[:, :, 0], neg[:, :, 1]
+    assert (items > 0).all()
+    np.testing.assert_array_equal(cates, np.array([0, 2, 1, 2])[items])
+
+
+@skip_mixed_keras
+@pytest.mark.parametrize(
+    'gru_type',
+    ['GRU', 'AIGRU', 'AGRU', 'AUGRU']
+)
+def test_DIEN_incremental_serving(gru_type):
+    x, y, feature_columns, behavior_feature_list = get_xy_fd(hash_flag=True)
+
+    # DIEN initializes its variables in the session of the default graph, so on TF 2.0 - 2.5 it is built in graph mode
+    with tf.Graph().as_default():
+        model = DIEN(feature_columns, behavior_feature_list, dnn_hidden_units=[4, 4, 4], gru_type=gru_type)
+        serving_model = DIEN(feature_columns, behavior_feature_list, dnn_hidden_units=[4, 4, 4], gru_type=gru_type,
+                             incremental_serving=True)
+        for layer in serving_model.layers:
+            if layer.weights:
+                layer.set_weights(model.get_layer(layer.name).get_weights())
+
+        cache = DIENStateCache(serving_model, LRUStore(max_size=3))
+        user_ids = list(x['user'])
+        request = {name: value for name, value in x.items() if not name.startswith('hist_') and name != 'seq_length'}
+        # the history arrives in two parts, the second one is empty for the last user
+        for start, end in [(0, 2), (2, 4)]:
+            new_events = {name: np.zeros_like(x[name]) for name in ['hist_item', 'hist_item_gender']}
+            for name in new_events:
+                new_events[name][:, :end - start] = x[name][:, start:end]
+            new_events['seq_length'] = np.clip(x['seq_length'] - start, 0, end - start)
+            cache.update(user_ids, new_events)
+
+        np.testing.assert_allclose(cache.predict(user_ids, request), model.predict(x), rtol=1e-5, atol=1e-6)
+
+
+def test_LRUStore():
+    store = LRUStore(max_size=2)
+    store.put('a', 1)
+    store.put('b', 2)
+    assert store.get('a') == 1
+    store.put('c', 3)
+    assert 'b' not in store and len(store) == 2
+    assert store.get('b', 0) == 0 and store.get('c') == 3
+
+
 if __name__ == "__main__":
     pass
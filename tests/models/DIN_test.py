@@ -4,7 +4,7 @@ from packaging import version
 
 from deepctr.feature_column import SparseFeat, VarLenSparseFeat, DenseFeat, get_feature_names
 from deepctr.models.sequence.din import DIN
-from ..utils import check_model
+from ..utils import check_model, check_candidate_scoring
 
 
 def get_xy_fd(hash_flag=False):
@@ -57,5 +57,16 @@ def test_DIN():
     check_model(model, model_name, x, y)
 
 
+def test_DIN_candidate_scoring():
+    x, y, feature_columns, behavior_feature_list = get_xy_fd()
+
+    model = DIN(feature_columns, behavior_feature_list, dnn_hidden_units=[4, 4, 4], att_activation='sigmoid')
+    scoring_model = DIN(feature_columns, behavior_feature_list, dnn_hidden_units=[4, 4, 4],
+                        att_activation='sigmoid', candidate_scoring=True)
+
+    check_candidate_scoring(model, scoring_model, x,
+                            {'item_id': np.array([1, 2, 3, 2, 1]), 'cate_id': np.array([1, 2, 1, 2, 2])})
+
+
 if __name__ == "__main__":
     pass
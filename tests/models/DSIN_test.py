@@ -50,18 +50,44 @@ def get_xy_fd(hash_flag=False):
 
 
 @pytest.mark.parametrize(
-    'bias_encoding',
-    [True, False]
+    'bias_encoding,att_type',
+    [(True, 'scaled_dot_product'), (False, 'scaled_dot_product'), (False, 'local'), (False, 'linear'),
+     (False, 'memory')]
 )
-def test_DSIN(bias_encoding):
+def test_DSIN(bias_encoding, att_type):
     model_name = "DSIN"
 
     x, y, feature_columns, behavior_feature_list = get_xy_fd(True)
 
     model = DSIN(feature_columns, behavior_feature_list, sess_max_count=2, bias_encoding=bias_encoding,
-                 dnn_hidden_units=[4, 4], dnn_dropout=0.5, )
+                 dnn_hidden_units=[4, 4], dnn_dropout=0.5, att_type=att_type, att_window_size=1, att_memory_size=1)
     check_model(model, model_name, x, y)
 
 
+@pytest.mark.parametrize(
+    'bias_encoding',
+    [True, False]
+)
+def test_DSIN_packed_sessions(bias_encoding):
+    x, y, feature_columns, behavior_feature_list = get_xy_fd(True)
+    model = DSIN(feature_columns, behavior_feature_list, sess_max_count=2, bias_encoding=bias_encoding,
+                 dnn_hidden_units=[4, 4])
+
+    packed_feature_columns = [fc for fc in feature_columns if not fc.name.startswith('sess_')]
+    packed_feature_columns += [
+        VarLenSparseFeat(SparseFeat('sess_item', 3 + 1, embedding_dim=4, use_hash=True, embedding_name='item'),
+                         maxlen=4), VarLenSparseFeat(
+            SparseFeat('sess_item_gender', 2 + 1, embedding_dim=4, use_hash=True, embedding_name='item_gender'),
+            maxlen=4)]
+    packed_model = DSIN(packed_feature_columns, behavior_feature_list, sess_max_count=2, bias_encoding=bias_encoding,
+                        dnn_hidden_units=[4, 4], packed_sessions=True)
+    packed_model.set_weights(model.get_weights())
+
+    packed_x = {name: value for name, value in x.items() if not name.startswith('sess_') or name == 'sess_length'}
+    for feat in behavior_feature_list:
+        packed_x['sess_' + feat] = np.stack([x['sess_0_' + feat], x['sess_1_' + feat]], axis=1)
+    np.testing.assert_allclose(packed_model.predict(packed_x), model.predict(x), rtol=1e-5, atol=1e-6)
+
+
 if __name__ == "__main__":
     pass
@@ -1,4 +1,5 @@
 import pytest
+import tensorflow as tf
 
 from deepctr.models import DeepFM
 from ..utils import check_model, get_test_data, SAMPLE_SIZE, get_test_data_estimator, check_estimator, TEST_Estimator
@@ -43,5 +44,46 @@ def test_DeepFMEstimator(hidden_size, sparse_feature_num):
     check_estimator(model, input_fn)
 
 
+def test_DeepFMEstimator_partitioner():
+    if not TEST_Estimator:
+        return
+    from deepctr.estimator import DeepFMEstimator
+
+    class VariableNameHook(tf.estimator.SessionRunHook):
+        def begin(self):
+            self.names = [v.name for v in tf.compat.v1.global_variables()]
+
+    linear_feature_columns, dnn_feature_columns, input_fn = get_test_data_estimator(SAMPLE_SIZE, sparse_feature_num=2,
+                                                                                    dense_feature_num=2)
+    hook = VariableNameHook()
+    model = DeepFMEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_units=(3,),
+                            training_chief_hooks=[hook], partitioner=tf.compat.v1.fixed_size_partitioner(2))
+    check_estimator(model, input_fn)
+    # the embedding and linear weights of the sparse features are split by rows, the DNN weights are not
+    assert 'dnn/input_layer/s_0_embedding/embedding_weights/part_1:0' in hook.names
+    assert 'linear/linear_model/s_0/weights/part_1:0' in hook.names
+    assert not [name for name in hook.names if name.startswith('dnn/dnn') and 'part_' in name]
+
+
+def test_DeepFMEstimator_single_backward_pass():
+    if not TEST_Estimator:
+        return
+    from deepctr.estimator import DeepFMEstimator
+
+    class GradientScopeHook(tf.estimator.SessionRunHook):
+        def begin(self):
+            self.scopes = {op.name.split('/')[0] for op in tf.compat.v1.get_default_graph().get_operations() if
+                           op.name.startswith('gradients')}
+
+    linear_feature_columns, dnn_feature_columns, input_fn = get_test_data_estimator(SAMPLE_SIZE, sparse_feature_num=2,
+                                                                                    dense_feature_num=2)
+    hook = GradientScopeHook()
+    model = DeepFMEstimator(linear_feature_columns, dnn_feature_columns, dnn_hidden_units=(3,),
+                            training_chief_hooks=[hook])
+    model.train(input_fn)
+    # the linear and the dnn optimizer share the gradients of one backward pass
+    assert hook.scopes == {'gradients'}
+
+
 if __name__ == "__main__":
     pass
@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 import tensorflow as tf
 
@@ -57,5 +58,36 @@ def test_PLE(num_levels, gate_dnn_hidden_units):
     check_mtl_model(model, model_name, x, y_list, task_types=['binary', 'binary'])
 
 
+@pytest.mark.parametrize(
+    'model_fn,kwargs',
+    [(ESMM, {}),
+     (MMOE, {'num_experts': 3, 'expert_dnn_hidden_units': (8,)}),
+     (PLE, {'num_levels': 1, 'expert_dnn_hidden_units': (8,)}),
+     (PLE, {'num_levels': 2, 'expert_dnn_hidden_units': (8,), 'dnn_use_bn': True}),
+     ]
+)
+def test_MTL_output_task_names(model_fn, kwargs, tmpdir):
+    x, y_list, dnn_feature_columns = get_mtl_test_data()
+    task_names = ['income', 'marital']
+    model = model_fn(dnn_feature_columns, tower_dnn_hidden_units=(8,), task_types=['binary', 'binary'],
+                     task_names=task_names, **kwargs)
+    model.compile('adam', 'binary_crossentropy')
+    model.fit(x, y_list, batch_size=100, epochs=1, verbose=0)
+    y_pred_list = model.predict(x, batch_size=100)
+    weights_path = str(tmpdir.join('model.h5'))
+    model.save_weights(weights_path)
+
+    for y_pred, task_name in zip(y_pred_list, task_names):
+        sub_model = model_fn(dnn_feature_columns, tower_dnn_hidden_units=(8,), task_types=['binary', 'binary'],
+                             task_names=task_names, output_task_names=[task_name], **kwargs)
+        assert len(sub_model.outputs) == 1
+        if model_fn is not ESMM:
+            assert sub_model.count_params() < model.count_params()
+        sub_model.load_weights(weights_path, by_name=True)
+        np.testing.assert_allclose(sub_model.predict(x, batch_size=100), y_pred, rtol=1e-5, atol=1e-6)
+
+    with pytest.raises(ValueError):
+        model_fn(dnn_feature_columns, task_names=task_names, output_task_names=['unknown'])
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from deepctr.feature_column import SparseFeat, VarLenSparseFeat, DenseFeat, get_feature_names
+from deepctr.models import DIN
+from deepctr.retrieval import BehaviorIndex
+
+
+def get_index():
+    index = BehaviorIndex(["item_id", "cate_id"], "cate_id")
+    index.add(0, {"item_id": np.array([1, 2, 3, 4]), "cate_id": np.array([1, 2, 1, 2])})
+    index.add(0, {"item_id": np.array([5, 6]), "cate_id": np.array([1, 1])})
+    index.add(1, {"item_id": np.array([7]), "cate_id": np.array([2])})
+    return index
+
+
+def test_BehaviorIndex_hard_search():
+    result = get_index().hard_search([0, 1, 2], np.array([1, 1, 2]), k=3)
+    assert np.array_equal(result["hist_item_id"], [[3, 5, 6], [0, 0, 0], [0, 0, 0]])
+    assert np.array_equal(result["hist_cate_id"], [[1, 1, 1], [0, 0, 0], [0, 0, 0]])
+    assert np.array_equal(result["seq_length"], [3, 0, 0])
+
+
+def test_BehaviorIndex_soft_search():
+    embeddings = {"item_id": np.eye(8)[:, :2] + np.arange(8)[:, None] * [[0.1, -0.1]],
+                  "cate_id": np.zeros((3, 1))}
+    candidates = {"item_id": np.array([0, 1]), "cate_id": np.array([1, 2])}
+    result = get_index().soft_search([0, 1], candidates, embeddings, k=2)
+    # item i scores 0.1 * i for the first query, so the two latest items win and keep their order
+    assert np.array_equal(result["hist_item_id"], [[5, 6], [7, 0]])
+    assert np.array_equal(result["seq_length"], [2, 1])
+
+    with pytest.raises(ValueError):
+        BehaviorIndex(["item_id"], "cate_id")
+
+
+def test_BehaviorIndex_DIN():
+    k = 3
+    feature_columns = [SparseFeat('user', 3, embedding_dim=4), SparseFeat('item_id', 8, embedding_dim=4),
+                       SparseFeat('cate_id', 3, embedding_dim=4), DenseFeat('pay_score', 1)]
+    feature_columns += [
+        VarLenSparseFeat(SparseFeat('hist_item_id', 8, embedding_dim=4, embedding_name='item_id'), maxlen=k,
+                         length_name="seq_length"),
+        VarLenSparseFeat(SparseFeat('hist_cate_id', 3, embedding_dim=4, embedding_name='cate_id'), maxlen=k,
+                         length_name="seq_length")]
+    model = DIN(feature_columns, ["item_id", "cate_id"], dnn_hidden_units=[4], att_hidden_size=[4])
+
+    x = {'user': np.array([0, 1]), 'item_id': np.array([6, 7]), 'cate_id': np.array([1, 2]),
+         'pay_score': np.array([0.1, 0.2])}
+    x.update(get_index().hard_search([0, 1], x['cate_id'], k))
+    assert model.predict({name: x[name] for name in get_feature_names(feature_columns)}).shape == (2, 1)
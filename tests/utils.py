@@ -381,6 +381,32 @@ def check_model(model, model_name, x, y, check_model_io=True):
     print(model_name + " test pass!")
 
 
+def check_candidate_scoring(model, scoring_model, x, candidate_x):
+    """
+    score a block of candidates for the first user in x with a model built with candidate_scoring=True,
+    and compare it with the original model on the tiled inputs.
+    :param model:
+    :param scoring_model:
+    :param x:
+    :param candidate_x: dict of candidate feature arrays, each with n_candidates rows
+    :return:
+    """
+    scoring_model.set_weights(model.get_weights())
+    n_candidates = len(list(candidate_x.values())[0])
+
+    scoring_input = {name: value[:1] for name, value in x.items()}
+    scoring_input.update(candidate_x)
+    tiled_input = {name: np.repeat(value[:1], n_candidates, axis=0) for name, value in x.items()}
+    tiled_input.update(candidate_x)
+
+    score_fn = K.function(scoring_model.inputs, scoring_model.outputs)
+    scores = score_fn([np.expand_dims(scoring_input[name], -1) if np.ndim(scoring_input[name]) == 1 else
+                       scoring_input[name] for name in scoring_model.input_names])[0]
+
+    assert scores.shape == (n_candidates, 1)
+    assert_allclose(scores, model.predict(tiled_input, batch_size=n_candidates), rtol=1e-5, atol=1e-6)
+
+
 def get_test_data_estimator(sample_size=1000, embedding_size=4, sparse_feature_num=1, dense_feature_num=1,
                             classification=True):
     x = {}